@@ -1,12 +1,16 @@
 # analyze_surface_code.py
 import pickle
-import matplotlib.pyplot as plt
-import networkx as nx
 import numpy as np
 from collections import defaultdict
 from tqdm import tqdm
 
+import profiling
+from profiling import profiled
+
+@profiled(counter=lambda result: {'matched_pairs': len(result[0])})
 def apply_mwpm(G):
+    import networkx as nx
+
     # Invert weights for max weight matching
     inverted_G = nx.Graph()
     for u, v, data in G.edges(data=True):
@@ -17,6 +21,7 @@ def apply_mwpm(G):
 
     return list(matching), total_weight
 
+@profiled(counter=lambda events: {'events': len(events)})
 def process_detection_events(counts, distance, n_rounds=4):
     """Process measurement outcomes for 3-column surface code"""
     n_rows = 2 * distance + 1
@@ -48,8 +53,11 @@ def process_detection_events(counts, distance, n_rounds=4):
 
     return detection_events
 
+@profiled(counter=lambda G: {'nodes': G.number_of_nodes(), 'edges': G.number_of_edges()})
 def build_mwpm_graph(detection_events, distance):
     """Build matching graph for 3-column architecture"""
+    import networkx as nx
+
     G = nx.Graph()
     G.add_node('boundary')
 
@@ -85,6 +93,7 @@ def build_mwpm_graph(detection_events, distance):
 
     return G
 
+@profiled()
 def calculate_logical_error(counts, logical_chain, corrections, initial_state=0):
     """
     Calculate logical error rate using parity of corrections along the logical chain.
@@ -103,6 +112,7 @@ def calculate_logical_error(counts, logical_chain, corrections, initial_state=0)
 
     return logical_errors / total_shots
 
+@profiled(counter=lambda corrections: {'corrected_qubits': sum(corrections.values())})
 def determine_corrections(matching, detection_events, distance):
     corrections = defaultdict(int)  # key: qubit index, value: number of corrections (mod 2)
 
@@ -223,6 +233,8 @@ def analyze_results(results):
 
 def plot_logical_errors(avg_errors):
     """Plot logical error rate vs code distance"""
+    import matplotlib.pyplot as plt
+
     distances = sorted(avg_errors.keys())
     rates = [avg_errors[d] for d in distances]
 
@@ -236,6 +248,8 @@ def plot_logical_errors(avg_errors):
     plt.close()
 
 if __name__ == "__main__":
+    profile_path = profiling.enable_from_env()
+
     # Load recovered results
     with open("stats/optimized/recovered_results.pkl", "rb") as f:
         results = pickle.load(f)
@@ -245,4 +259,8 @@ if __name__ == "__main__":
 
     # Plot results
     plot_logical_errors(avg_errors)
-    print("Analysis complete. Plot saved as logical_error_rates.png")
\ No newline at end of file
+    print("Analysis complete. Plot saved as logical_error_rates.png")
+
+    if profile_path:
+        profiling.export(profile_path)
+        print(f"Stage profile saved to {profile_path}")
\ No newline at end of file
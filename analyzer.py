@@ -1,9 +1,12 @@
+import os
 import pickle
-import matplotlib.pyplot as plt
-import networkx as nx
 
-from utils import apply_stabilizers, run_on_ibm, run_on_simulator, calculate_error_statistics, plot_error_stats
-from utils import process_detection_events, build_mwpm_graph, apply_mwpm, inject_random_errors
+import profiling
+import utils
+from incremental import ResultStore, hash_config, hash_source
+from plotting import PlotQueue
+
+from utils import calculate_error_statistics, process_detection_events, build_mwpm_graph, apply_mwpm
 
 grids = [5, 7, 9, 11]
 
@@ -77,18 +80,8 @@ def calculate_stabilizer_map(grid):
 
     return stabilizer_map
 
-for grid in grids:
-    print("LOG - Loading stats")
-    stats = load_stats(f'stats/boundary/stats_grid_{grid}.pkl')
-    stats = stats[0]
-    stabilizer_map = calculate_stabilizer_map(grid)
-
-    logical_z_chain = [(i * grid) + 1 for i in range(grid) if i % 2 != 0]
-    print(f"LOG - Logical chain with d: {len(logical_z_chain)}")
-
-    n_rounds = 4
-    counts = stats['counts']
-
+def analyze_grid(grid, counts, n_rounds, stabilizer_map, logical_z_chain):
+    """Decode one dataset; returns the statistics with the matching graph and matching."""
     print("LOG - Processing detection events")
     detection_events = process_detection_events(counts, grid, n_rounds)
     G = build_mwpm_graph(detection_events, grid)
@@ -96,18 +89,52 @@ for grid in grids:
 
     new_stats = calculate_error_statistics(G, counts, grid, matching, stabilizer_map, detection_events, logical_z_chain)
     new_stats['total_shots'] = sum(counts.values())
-
-    new_stats['counts'] = counts
-
-
-    print("LOG - Dumping stats")
-    with open(f'stats/internal/stats_grid_{grid}.pkl', 'wb') as f:
-        pickle.dump(stats, f)
-
-    pos = nx.spring_layout(G)
-    nx.draw(G, pos, with_labels=True, node_color='lightblue')
-    labels = nx.get_edge_attributes(G, 'weight')
-    nx.draw_networkx_edge_labels(G, pos, edge_labels=labels)
-    plt.savefig(f"stats/internal/{grid}_matching_graph.png")
-    plt.close()
-    # print(f"Grid size: {grid}")
\ No newline at end of file
+    return {'stats': new_stats, 'graph': G, 'matching': matching}
+
+
+if __name__ == "__main__":
+    profile_path = profiling.enable_from_env()
+    plots = PlotQueue()
+    # results are reused until the dataset, the layout, the settings or utils.py change
+    store = ResultStore('stats/internal/cache')
+    decoder_source = hash_source(utils)
+
+    for grid in grids:
+        dataset = f'stats/boundary/stats_grid_{grid}.pkl'
+        output = f'stats/internal/stats_grid_{grid}.pkl'
+        stabilizer_map = calculate_stabilizer_map(grid)
+
+        logical_z_chain = [(i * grid) + 1 for i in range(grid) if i % 2 != 0]
+        print(f"LOG - Logical chain with d: {len(logical_z_chain)}")
+
+        n_rounds = 4
+        dependencies = {
+            'dataset': store.hash_file(dataset),
+            'layout': hash_config({'grid': grid, 'stabilizer_map': stabilizer_map, 'logical_z': logical_z_chain}),
+            'decoder': hash_config({'decoder': 'utils.mwpm', 'n_rounds': n_rounds}),
+            'source': decoder_source,
+        }
+        if store.is_fresh(f'grid_{grid}', dependencies) and os.path.exists(output):
+            print(f"LOG - Grid {grid} unchanged, reusing {output}")
+            continue
+
+        print("LOG - Loading stats")
+        stats = load_stats(dataset)
+        stats = stats[0]
+        result, _ = store.cached(f'grid_{grid}', dependencies,
+                                 lambda: analyze_grid(grid, stats['counts'], n_rounds, stabilizer_map, logical_z_chain))
+
+        print("LOG - Dumping stats")
+        with open(output, 'wb') as f:
+            pickle.dump(stats, f)
+
+        # rendered by a background worker, skipped with SURFACE_PLOTS=0
+        plots.matching_graph(result['graph'], f"stats/internal/{grid}_matching_graph.png",
+                             matching=result['matching'], title=f"Matching graph, grid {grid}")
+        # print(f"Grid size: {grid}")
+
+    plots.close()
+
+    if profile_path:
+        profiling.export(profile_path)
+        print(f"LOG - Stage profile saved to {profile_path}")
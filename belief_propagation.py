@@ -0,0 +1,220 @@
+"""
+Belief-propagation pre-pass for the matching decoder (BP + MWPM).
+
+The spacetime graph of a sector is read as a sparse check matrix: every edge is a fault
+mechanism (a data qubit error in one layer, a measurement error, a boundary fault) and every
+detector is a parity check on the edges touching it. Normalised min-sum belief propagation on
+this matrix turns the prior log-likelihood ratio of every edge into a per-shot posterior, and
+every shot is then matched on its own graph with edge weights -log P(faulty) from those
+posteriors: edges BP believes faulty get cheap, the others keep roughly their prior LLR. The
+shortest paths between the shot's fired detectors and the boundary are recomputed on that graph
+(Dijkstra from each fired detector), and the logical flip and correction are read off those
+paths. On the memory circuits of `circuits` this does not beat plain matching (4000 Stim shots,
+5 rounds: square d = 5 at p = 0.003, 1.5% vs 1.1% with uniform weights and 0.25% vs 0.20% with
+the detector error model; worse at every point tried), so it is not offered by `pipeline` and is
+only reachable through the `bp` argument of the decoders.
+
+Messages are (n_shots, n_checks, max_degree) arrays, so all shots of a chunk propagate together
+and the pre-pass costs a few NumPy passes per iteration instead of Python work per shot; shots
+leave the batch once BP explains their syndrome, so most iterations run on a small remainder.
+"""
+import numpy as np
+
+LLR_CLIP = 50.0
+
+
+def check_structure(graph):
+    """
+    Padded check/edge incidence of a spacetime graph (`decoder.build_spacetime_graph` format).
+
+    Returns:
+        dict: 'check_edges' (n_checks, max_degree) edges of every check, padded with n_edges,
+            and 'edge_sockets' (n_edges, 2) flat positions of every edge in 'check_edges',
+            padded with n_checks * max_degree.
+    """
+    edges = graph['edges']
+    n_checks = graph['boundary']
+    n_edges = len(edges)
+
+    checks = edges.ravel()
+    owners = np.repeat(np.arange(n_edges), 2)
+    inside = checks != graph['boundary']
+    checks, owners = checks[inside], owners[inside]
+    order = np.argsort(checks, kind='stable')
+    checks, owners = checks[order], owners[order]
+
+    degree = np.bincount(checks, minlength=n_checks)
+    first = np.concatenate([[0], np.cumsum(degree)[:-1]])
+    slot = np.arange(len(checks)) - first[checks]
+    max_degree = max(int(degree.max()), 1) if n_checks else 1
+
+    check_edges = np.full((n_checks, max_degree), n_edges, dtype=np.intp)
+    check_edges[checks, slot] = owners
+
+    # every edge has one or two sockets (detector endpoints), in edge order
+    sockets = checks * max_degree + slot
+    order = np.argsort(owners, kind='stable')
+    owners, sockets = owners[order], sockets[order]
+    rank = np.arange(len(owners)) - np.searchsorted(owners, owners)
+    edge_sockets = np.full((n_edges, 2), n_checks * max_degree, dtype=np.intp)
+    edge_sockets[owners, rank] = sockets
+    return {'check_edges': check_edges, 'edge_sockets': edge_sockets}
+
+
+def edge_priors(graph, p=None, p_meas=None):
+    """
+    Prior log-likelihood ratios log((1 - p) / p) of the edges.
+
+    Args:
+        p (float): Error probability of the space-like and boundary edges; None reads every
+            edge weight as -log(p), as in the detector error model graphs of `error_model`.
+        p_meas (float): Error probability of the time-like edges, defaults to `p`.
+    """
+    if p is None:
+        probability = np.clip(np.exp(-graph['weights']), 1e-12, 0.5 - 1e-9)
+    else:
+        probability = np.full(len(graph['edges']), p, dtype=float)
+        probability[graph['faults'] < 0] = p if p_meas is None else p_meas
+    return np.log((1 - probability) / probability)
+
+
+def bp_posteriors(syndrome, structure, priors, iterations=10, scale=0.75):
+    """
+    Normalised min-sum belief propagation, all shots at once.
+
+    Args:
+        syndrome (np.ndarray): (n_shots, n_checks) fired detectors.
+        structure (dict): Result of `check_structure`.
+        priors (np.ndarray): (n_edges,) prior log-likelihood ratios.
+        iterations (int): Maximum message passing rounds; a shot stops as soon as its hard
+            decision reproduces its syndrome.
+        scale (float): Min-sum normalisation factor of the check messages.
+
+    Returns:
+        np.ndarray: (n_shots, n_edges) posterior log-likelihood ratios, negative = likely faulty.
+    """
+    check_edges = structure['check_edges']
+    edge_sockets = structure['edge_sockets']
+    n_checks, max_degree = check_edges.shape
+    padding = check_edges == len(priors)
+    positions = np.arange(max_degree)
+
+    posterior = np.tile(priors, (len(syndrome), 1))
+    # shots still propagating; a shot leaves once its hard decision reproduces its syndrome
+    active = np.flatnonzero(syndrome.any(axis=1))
+    flip = np.where(syndrome[active], -1.0, 1.0)[:, :, None]
+    # check to edge messages, flat over (check, slot) plus one zero socket for the padding
+    messages = np.zeros((len(active), n_checks * max_degree + 1))
+    for _ in range(iterations):
+        if not len(active):
+            break
+        n_active = len(active)
+        extended = np.concatenate([posterior[active], np.full((n_active, 1), np.inf)], axis=1)
+        incoming = extended[:, check_edges] - messages[:, :-1].reshape(n_active, n_checks, max_degree)
+
+        signs = np.where(incoming < 0, -1.0, 1.0)
+        sign = signs.prod(axis=2, keepdims=True) * flip * signs
+        magnitude = np.abs(incoming)
+        smallest = magnitude.argmin(axis=2)[:, :, None]
+        first = np.take_along_axis(magnitude, smallest, axis=2)
+        second = np.where(positions == smallest, np.inf, magnitude).min(axis=2, keepdims=True)
+        excluded = np.minimum(np.where(positions == smallest, second, first), LLR_CLIP)
+
+        messages[:, :-1] = np.where(padding, 0.0, scale * sign * excluded).reshape(n_active, -1)
+        posterior[active] = priors + messages[:, edge_sockets].sum(axis=2)
+
+        faulty = np.concatenate([posterior[active] < 0, np.zeros((n_active, 1), dtype=bool)], axis=1)
+        pending = np.any(faulty[:, check_edges].sum(axis=2) % 2 != syndrome[active], axis=1)
+        active, flip, messages = active[pending], flip[pending], messages[pending]
+    return posterior
+
+
+def bp_weights(fired, tables, p=None, p_meas=None, iterations=10):
+    """
+    Per-shot edge weights for `reweighted_match` from a BP pre-pass.
+
+    The weight of edge e in a shot is -log of its posterior fault probability,
+    log(1 + exp(posterior LLR)): close to the LLR for edges BP believes clean and close to zero
+    for edges it believes faulty, so a shot's likely faults become cheap paths and no weight
+    goes negative.
+
+    Args:
+        fired (list): Fired detector nodes of every shot.
+        tables (dict): Tables of the sector (with 'graph').
+        p, p_meas (float): Edge priors, see `edge_priors`.
+
+    Returns:
+        np.ndarray: (n_shots, n_edges) weights, indexed like `tables['graph']['edges']`.
+    """
+    graph = tables['graph']
+    syndrome = np.zeros((len(fired), graph['boundary']), dtype=np.uint8)
+    for n, nodes in enumerate(fired):
+        syndrome[n, nodes] = 1
+
+    priors = edge_priors(graph, p, p_meas)
+    posterior = bp_posteriors(syndrome, check_structure(graph), priors, iterations)
+    return np.logaddexp(0.0, posterior)
+
+
+def reweighted_match(fired, tables, weights, reweight=None):
+    """
+    Match one shot's fired detectors on the graph of the tables with its own edge weights.
+
+    Parallel edges keep their cheapest one; shortest paths from every fired detector and the
+    boundary come from Dijkstra on that graph and the matching uses `decoder.match_detectors`
+    on their distances.
+
+    Args:
+        fired (np.ndarray): Fired detector nodes.
+        tables (dict): Tables of the sector (with 'graph' and 'edge_parity').
+        weights (np.ndarray): (n_edges,) edge weights of this shot (`bp_weights`).
+        reweight (dict): Optional data qubit -> weight change of the edges flipping that qubit.
+
+    Returns:
+        tuple: (matched pairs, logical flip, set of corrected data qubits)
+    """
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra
+
+    from decoder import match_detectors
+
+    fired = np.asarray(fired, dtype=np.intp)
+    if not len(fired):
+        return [], 0, set()
+    graph = tables['graph']
+    boundary = tables['boundary']
+    n = boundary + 1
+    weights = np.array(weights, dtype=float)
+    if reweight:
+        for q, delta in reweight.items():
+            weights[graph['faults'] == q] += delta
+    # csgraph drops stored zeros, keep every edge strictly positive
+    weights = np.maximum(weights, 1e-9)
+
+    low, high = graph['edges'].min(axis=1), graph['edges'].max(axis=1)
+    keys = low * n + high
+    order = np.lexsort((weights, keys))
+    cheapest = order[np.concatenate([[True], keys[order][1:] != keys[order][:-1]])]
+    matrix = csr_matrix((weights[cheapest], (low[cheapest], high[cheapest])), shape=(n, n))
+    edge_of = dict(zip(keys[cheapest].tolist(), cheapest.tolist()))
+
+    sources = np.append(fired, boundary)
+    dist, predecessors = dijkstra(matrix, directed=False, indices=sources, return_predecessors=True)
+    k = len(fired)
+    local = {'dist': dist[:, sources], 'boundary': k}
+
+    pairs = []
+    flip = 0
+    corrected = set()
+    for i, j in match_detectors(np.arange(k), local):
+        u, v = int(sources[i]), int(sources[j])
+        pairs.append((u, v))
+        # walk back from v to u along the shortest-path tree of u
+        while v != u:
+            step = int(predecessors[i, v])
+            e = edge_of[min(step, v) * n + max(step, v)]
+            flip ^= int(tables['edge_parity'][e])
+            if graph['faults'][e] >= 0:
+                corrected ^= {int(graph['faults'][e])}
+            v = step
+    return pairs, flip, corrected
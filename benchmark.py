@@ -0,0 +1,127 @@
+import argparse
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from decoder import (build_spacetime_graph, memory_layers, shortest_path_tables, sector_detectors,
+                     match_detectors, correction_qubits, logical_flip)
+from layout import get_layout
+from synthetic import synthetic_counts
+
+STAGES = ['extraction', 'graph_build', 'matching', 'correction', 'parity']
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark_point(kind, size, n_rounds, shots, p, seed=0):
+    """
+    Time every decoding stage for one layout on synthetic data.
+
+    Returns:
+        dict: Point description, seconds spent per stage and a few size counters.
+    """
+    layout = get_layout(kind, size)
+    counts = synthetic_counts(layout, n_rounds, shots, p, seed=seed)
+    timings = dict.fromkeys(STAGES, 0.0)
+
+    start = time.perf_counter()
+    _, freqs, fired, _ = sector_detectors(counts, layout, n_rounds)
+    timings['extraction'] = time.perf_counter() - start
+
+    logical_errors = 0
+    n_detectors = 0
+    n_pairs = 0
+    n_edges = 0
+    for stab_type in ('Z', 'X'):
+        logical_chain = layout['logical_z'] if stab_type == 'Z' else layout['logical_x']
+
+        start = time.perf_counter()
+        graph = build_spacetime_graph(layout, stab_type, n_rounds, **memory_layers(stab_type))
+        tables = shortest_path_tables(graph, logical_chain)
+        tables['graph'] = graph
+        tables['boundary'] = graph['boundary']
+        timings['graph_build'] += time.perf_counter() - start
+        n_edges += len(graph['edges'])
+
+        for nodes, freq in zip(fired[stab_type], freqs):
+            start = time.perf_counter()
+            pairs = match_detectors(nodes, tables)
+            timings['matching'] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            correction_qubits(pairs, tables)
+            timings['correction'] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            logical_errors += freq * logical_flip(pairs, tables)
+            timings['parity'] += time.perf_counter() - start
+
+            n_detectors += freq * len(nodes)
+            n_pairs += freq * len(pairs)
+
+    total = sum(timings.values())
+    return {
+        'layout': kind,
+        'size': size,
+        'n_rounds': n_rounds,
+        'shots': shots,
+        'distinct_shots': len(counts),
+        'p': p,
+        'stages': timings,
+        'total': total,
+        'per_shot_us': 1e6 * total / shots,
+        'graph_edges': n_edges,
+        'detectors_per_shot': n_detectors / shots,
+        'matched_pairs_per_shot': n_pairs / shots,
+        'logical_errors': int(logical_errors),
+    }
+
+
+def run_suite(layouts, sizes, shot_counts, n_rounds=4, p=0.01, seed=0):
+    results = []
+    for kind in layouts:
+        for size in sizes:
+            for shots in shot_counts:
+                point = benchmark_point(kind, size, n_rounds, shots, p, seed)
+                print(f"{kind:>6} size {size:>2} shots {shots:>6}: " +
+                      ", ".join(f"{stage} {point['stages'][stage]:.3f}s" for stage in STAGES))
+                results.append(point)
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the decoding pipeline on synthetic syndrome data.")
+    parser.add_argument('--layouts', nargs='+', default=['square', 'strip'], choices=['square', 'strip'])
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(range(3, 26, 2)),
+                        help="grid sizes for 'square', code distances for 'strip'")
+    parser.add_argument('--shots', nargs='+', type=int, default=[256, 1024])
+    parser.add_argument('--rounds', type=int, default=4)
+    parser.add_argument('--p', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.json')
+    args = parser.parse_args()
+
+    report = run_suite(args.layouts, args.sizes, args.shots, args.rounds, args.p, args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
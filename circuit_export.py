@@ -0,0 +1,318 @@
+"""
+Export the Qiskit circuits of this project as Stim text circuits with detectors and observables.
+
+The exporter walks the instructions of an existing `QuantumCircuit` (from `circuits`,
+`utils.apply_stabilizers` or `circuits.build_strip_circuit`), so the Stim circuit is
+gate-for-gate the same. Detectors compare each stabilizer between consecutive rounds; Z
+stabilizers, deterministic on the |0> preparation, also get an opening detector on their first
+round and, when the circuit measures the data qubits, a closing detector comparing their last
+round with the value recomputed from the readout. Detectors are ordered sector by sector exactly
+like the nodes of `decoder.sector_tables`; the observable is the data readout of
+`layout['logical_z']` when the circuit measures the data qubits.
+
+Noise is given as a dict with the probabilities
+    'p1'      depolarizing after single-qubit gates,
+    'p2'      two-qubit depolarizing after CX,
+    'p_reset' X flip after resets,
+    'p_meas'  X flip before measurements,
+missing keys meaning no noise. `aer_noise_model` builds the equivalent Aer noise model.
+"""
+import numpy as np
+
+from circuits import circuit_bit_map
+from decoder import memory_layers, observed_flips, sector_events, shots_readout
+
+GATES = {'h': 'H', 'x': 'X', 'cx': 'CX', 'reset': 'R', 'measure': 'M'}
+
+
+def uniform_noise(p):
+    """Noise dict with the same probability on every channel."""
+    return {'p1': p, 'p2': p, 'p_reset': p, 'p_meas': p}
+
+
+def detector_order(layout, n_rounds, closing=False):
+    """
+    Detectors in export order: (stabilizer type, round t, column in the syndrome rounds).
+
+    Detector (type, t, k) compares stabilizer k in round t with round t - 1: Z stabilizers start
+    at t = 0 (compared with the preparation) and, with `closing`, end at t = n_rounds (the value
+    recomputed from the data readout); X stabilizers run from t = 1 to n_rounds - 1. The Z
+    sector comes first, then the X sector, each layer by layer as the nodes of the decoder's
+    graphs (`decoder.memory_layers`).
+    """
+    order = []
+    for stab_type in ('Z', 'X'):
+        layers = memory_layers(stab_type, closing)
+        columns = [k for k, s in enumerate(layout['syndrome_qubits'])
+                   if layout['stabilizer_type'][s] == stab_type]
+        first = 0 if layers['opening'] else 1
+        last = n_rounds + 1 if layers['closing'] else n_rounds
+        for t in range(first, last):
+            order.extend((stab_type, t, k) for k in columns)
+    return order
+
+
+def _instructions(qc):
+    """(name, qubits, clbits) of every instruction with plain integer indices."""
+    for instruction in qc.data:
+        operation = instruction.operation
+        qubits = tuple(qc.find_bit(q).index for q in instruction.qubits)
+        clbits = tuple(qc.find_bit(c).index for c in instruction.clbits)
+        name = operation.name
+        if name == 'initialize':
+            if not np.allclose(np.asarray(operation.params, dtype=complex), [1, 0]):
+                raise ValueError("Only initialization to |0> can be exported")
+            name = 'reset'
+        elif name not in GATES and name != 'barrier':
+            raise ValueError(f"Cannot export instruction '{name}'")
+        yield name, qubits, clbits
+
+
+def _layers(qc):
+    """Merge runs of the same instruction on disjoint qubits into parallel layers."""
+    layer = None
+    for name, qubits, clbits in _instructions(qc):
+        if name == 'barrier':
+            if layer:
+                yield layer
+            layer = None
+            yield {'name': 'barrier'}
+            continue
+        if layer and layer['name'] == name and not layer['used'].intersection(qubits):
+            layer['qubits'].extend(qubits)
+            layer['clbits'].extend(clbits)
+            layer['used'].update(qubits)
+            continue
+        if layer:
+            yield layer
+        layer = {'name': name, 'qubits': list(qubits), 'clbits': list(clbits), 'used': set(qubits)}
+    if layer:
+        yield layer
+
+
+def _noise(channel, p, qubits):
+    return [(channel, p, qubits)] if p else []
+
+
+def circuit_operations(qc, layout, n_rounds, noise=None):
+    """
+    Stim-level operations of a surface code circuit with its detectors and observable.
+
+    Args:
+        qc (QuantumCircuit): Circuit built on `layout`; its classical bits are located with
+            `circuits.circuit_bit_map`.
+        layout (dict): Layout returned by `layout.get_layout`.
+        n_rounds (int): Number of stabilizer measurement rounds.
+        noise (dict): Channel probabilities (see module docstring), None for a noiseless circuit.
+
+    Returns:
+        dict: 'operations' list of (Stim name, probability or None, qubits), 'n_measurements',
+            'clbits' the classical bit of every measurement, 'detectors' list of
+            ((row, col, round), measurement indices) in `detector_order`, 'closing' whether
+            the data readout closes the Z sector and 'observable' the measurement indices of
+            `layout['logical_z']` or None.
+    """
+    noise = noise or {}
+    bit_map = circuit_bit_map(qc, layout, n_rounds)
+    operations = []
+    measured = {}  # classical bit -> measurement record index
+    clbits = []
+    n_measurements = 0
+
+    for layer in _layers(qc):
+        name = layer['name']
+        if name == 'barrier':
+            operations.append(("TICK", None, []))
+            continue
+        qubits = layer['qubits']
+        if name == 'measure':
+            operations += _noise("X_ERROR", noise.get('p_meas'), qubits)
+        operations.append((GATES[name], None, qubits))
+        if name == 'measure':
+            for q, c in zip(qubits, layer['clbits']):
+                measured[c] = n_measurements
+                clbits.append(c)
+                n_measurements += 1
+        elif name == 'reset':
+            operations += _noise("X_ERROR", noise.get('p_reset'), qubits)
+        elif name == 'cx':
+            operations += _noise("DEPOLARIZE2", noise.get('p2'), qubits)
+        else:
+            operations += _noise("DEPOLARIZE1", noise.get('p1'), qubits)
+
+    def record(clbit):
+        if clbit not in measured:
+            raise ValueError(f"Classical bit {clbit} is never measured")
+        return measured[clbit]
+
+    syndrome = bit_map['syndrome']
+    closing = bit_map['data'] is not None
+    detectors = []
+    for _, t, k in detector_order(layout, n_rounds, closing):
+        s = layout['syndrome_qubits'][k]
+        r, c = divmod(s, layout['n_cols'])
+        if t < n_rounds:
+            records = [record(syndrome[t, k])]
+        else:
+            records = [record(bit_map['data'][q]) for q in layout['stabilizer_map'][s]]
+        if t > 0:
+            records.append(record(syndrome[t - 1, k]))
+        detectors.append(((r, c, t), tuple(records)))
+
+    observable = None
+    if bit_map['data'] is not None:
+        observable = [record(c) for c in bit_map['data'][layout['logical_z']]]
+
+    return {
+        'operations': operations,
+        'n_measurements': n_measurements,
+        'clbits': clbits,
+        'detectors': detectors,
+        'closing': closing,
+        'observable': observable,
+    }
+
+
+def to_stim(qc, layout, n_rounds, noise=None):
+    """
+    Stim text of a surface code circuit with DETECTOR and OBSERVABLE_INCLUDE annotations.
+
+    Arguments are those of `circuit_operations`.
+
+    Returns:
+        str: Stim circuit text.
+    """
+    return stim_text(circuit_operations(qc, layout, n_rounds, noise))
+
+
+def stim_text(circuit):
+    """Stim text of the result of `circuit_operations`."""
+    n_measurements = circuit['n_measurements']
+
+    def rec(m):
+        return f"rec[{m - n_measurements}]"
+
+    lines = []
+    for name, p, qubits in circuit['operations']:
+        head = f"{name}({p:g})" if p is not None else name
+        lines.append(" ".join([head, *map(str, qubits)]))
+    for coords, records in circuit['detectors']:
+        lines.append(f"DETECTOR({', '.join(map(str, coords))}) " + " ".join(rec(m) for m in records))
+    if circuit['observable'] is not None:
+        lines.append("OBSERVABLE_INCLUDE(0) " + " ".join(rec(m) for m in circuit['observable']))
+    return "\n".join(lines) + "\n"
+
+
+def sample_detectors(text, shots, seed=None):
+    """
+    Sample a Stim circuit with Stim's compiled detector sampler.
+
+    Returns:
+        tuple: (detectors, observables) boolean arrays of shape (shots, n_detectors) and
+            (shots, n_observables).
+    """
+    import stim
+
+    sampler = stim.Circuit(text).compile_detector_sampler(seed=seed)
+    return sampler.sample(shots, separate_observables=True)
+
+
+def sample_counts(qc, layout, n_rounds, noise, shots, seed=None):
+    """
+    Sample the measurements of `qc` with Stim and return them as Qiskit-style counts.
+
+    The counts use the classical bits of `qc`, so they can stand in for an Aer or IBM run.
+    """
+    import stim
+    from synthetic import rounds_to_counts
+
+    circuit = circuit_operations(qc, layout, n_rounds, noise)
+    records = stim.Circuit(stim_text(circuit)).compile_sampler(seed=seed).sample(shots)
+    bits = np.zeros((shots, qc.num_clbits), dtype=np.uint8)
+    bits[:, circuit['clbits']] = records
+    return rounds_to_counts(bits)
+
+
+def aer_noise_model(noise):
+    """Aer noise model with the same channels as the `noise` dict of `to_stim`."""
+    from qiskit_aer.noise import NoiseModel, ReadoutError, depolarizing_error, pauli_error
+
+    model = NoiseModel()
+    # Stim's DEPOLARIZEn(p) applies each non-identity Pauli with p / (4**n - 1), Aer's
+    # depolarizing_error(l, n) each of the 4**n Paulis with l / 4**n.
+    if noise.get('p1'):
+        model.add_all_qubit_quantum_error(depolarizing_error(4 * noise['p1'] / 3, 1), ['h', 'x'])
+    if noise.get('p2'):
+        model.add_all_qubit_quantum_error(depolarizing_error(16 * noise['p2'] / 15, 2), ['cx'])
+    if noise.get('p_reset'):
+        p = noise['p_reset']
+        # Aer keeps 'initialize' as its own instruction, exported as a reset
+        model.add_all_qubit_quantum_error(pauli_error([('X', p), ('I', 1 - p)]), ['reset', 'initialize'])
+    if noise.get('p_meas'):
+        p = noise['p_meas']
+        model.add_all_qubit_readout_error(ReadoutError([[1 - p, p], [p, 1 - p]]))
+    return model
+
+
+def counts_to_detectors(counts, layout, n_rounds, bit_map=None):
+    """
+    Detector and observable values of Aer/IBM counts, in the export order of `to_stim`.
+
+    Args:
+        bit_map (dict): Classical bit gather indices (`circuits.circuit_bit_map`), defaults to
+            `decoder.default_bit_map`, with the data readout when the shots are long enough.
+
+    Returns:
+        tuple: (detectors (n, n_detectors) bool, observables (n, 1) bool or None, freqs (n,)).
+    """
+    shots = list(counts.keys())
+    freqs = np.array([counts[shot] for shot in shots])
+    rounds, data = shots_readout(shots, layout, n_rounds, bit_map)
+    events = sector_events(rounds, layout, data)
+    detectors = np.concatenate([events[stab_type].reshape(len(shots), -1) for stab_type in ('Z', 'X')],
+                               axis=1).astype(bool)
+
+    observables = None
+    if data is not None:
+        observables = observed_flips(data, layout)['Z'].astype(bool)[:, None]
+    return detectors, observables, freqs
+
+
+def clifford_copy(qc):
+    """Copy of `qc` with |0> initializations replaced by resets, so Aer can use its stabilizer method."""
+    copy = qc.copy_empty_like()
+    for instruction in qc.data:
+        if instruction.operation.name == 'initialize':
+            copy.reset(instruction.qubits)
+        else:
+            copy.append(instruction)
+    return copy
+
+
+def cross_check(qc, layout, n_rounds, noise, shots=4096, seed=None):
+    """
+    Per-detector firing rates of the Stim export and of the Aer simulation of `qc`.
+
+    Aer runs the stabilizer method on `clifford_copy(qc)`, fast enough for small distances.
+
+    Returns:
+        dict: 'stim' and 'aer' firing rates (n_detectors,), plus the observable flip rates
+            'stim_observable' and 'aer_observable' when the circuit has an observable.
+    """
+    from qiskit import transpile
+    from qiskit_aer import AerSimulator
+
+    detectors, observables = sample_detectors(to_stim(qc, layout, n_rounds, noise), shots, seed)
+    simulator = AerSimulator(method='stabilizer', noise_model=aer_noise_model(noise), seed_simulator=seed)
+    counts = simulator.run(transpile(clifford_copy(qc), simulator, optimization_level=0), shots=shots).result().get_counts()
+    bit_map = circuit_bit_map(qc, layout, n_rounds)
+    aer_detectors, aer_observables, freqs = counts_to_detectors(counts, layout, n_rounds, bit_map)
+
+    result = {
+        'stim': detectors.mean(axis=0),
+        'aer': freqs @ aer_detectors / freqs.sum(),
+    }
+    if observables.shape[1] and aer_observables is not None:
+        result['stim_observable'] = float(observables[:, 0].mean())
+        result['aer_observable'] = float(freqs @ aer_observables[:, 0] / freqs.sum())
+    return result
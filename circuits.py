@@ -0,0 +1,355 @@
+import numpy as np
+
+from layout import get_layout
+
+# Neighbour visited by each stabilizer type in each of the four CX layers, as (d_row, d_col).
+# Every layer moves along the same axis for both types, so no data qubit is used twice in a
+# layer; X stabilizers follow the "N" shape (up, left, right, down) and Z stabilizers its
+# mirror image (up, right, left, down), which keeps every overlapping X/Z pair commuting.
+CX_SCHEDULE = {
+    'X': [(-1, 0), (0, -1), (0, 1), (1, 0)],
+    'Z': [(-1, 0), (0, 1), (0, -1), (1, 0)],
+}
+
+
+def cx_layers(layout):
+    """
+    CX gates of one stabilizer round grouped into parallel layers.
+
+    Returns:
+        list: Four lists of (control, target) pairs; data qubits control Z stabilizers and X
+            stabilizers control their data qubits.
+    """
+    n_rows, n_cols = layout['n_rows'], layout['n_cols']
+    layers = []
+    for step in range(4):
+        layer = []
+        for s in layout['syndrome_qubits']:
+            stab_type = layout['stabilizer_type'][s]
+            d_row, d_col = CX_SCHEDULE[stab_type][step]
+            r, c = divmod(s, n_cols)
+            nr, nc = r + d_row, c + d_col
+            if not (0 <= nr < n_rows and 0 <= nc < n_cols):
+                continue
+            q = nr * n_cols + nc
+            if q not in layout['stabilizer_map'][s]:
+                continue
+            layer.append((q, s) if stab_type == 'Z' else (s, q))
+        layers.append(layer)
+    return layers
+
+
+def build_square_circuit(grid, n_rounds, barriers=True, measure_data=True):
+    """
+    Build the square-grid surface code memory circuit with all stabilizers of a round in parallel.
+
+    Each round resets every syndrome qubit, applies Hadamards to the X syndrome qubits, runs the
+    four CX layers of `CX_SCHEDULE` and measures all syndrome qubits. Classical bits follow the
+    same order as `utils.apply_stabilizers` (round by round, stabilizers in row-major order), and
+    with `measure_data` every qubit i is finally measured onto bit n_syndrome * n_rounds + i, as in
+    `mine.py`, so existing decoders read these circuits unchanged.
+
+    Args:
+        grid (int): Grid size (odd).
+        n_rounds (int): Number of stabilizer measurement rounds.
+        barriers (bool): Insert a barrier between rounds (never inside a round).
+        measure_data (bool): Measure all qubits after the last round.
+
+    Returns:
+        QuantumCircuit: Surface code circuit, its classical bit map in `metadata` (`circuit_bit_map`)
+        MappingProxyType: Read-only stabilizer map {syndrome_qubit: (data_qubits, ...)}
+    """
+    from qiskit import QuantumCircuit
+
+    if grid % 2 != 1:
+        raise ValueError("Grid size must be an odd number")
+
+    layout = get_layout('square', grid)
+    syndrome_qubits = layout['syndrome_qubits']
+    x_syndromes = [s for s in syndrome_qubits if layout['stabilizer_type'][s] == 'X']
+    n_syndrome = len(syndrome_qubits)
+    layers = cx_layers(layout)
+
+    n_clbits = n_syndrome * n_rounds + (grid ** 2 if measure_data else 0)
+    qc = QuantumCircuit(grid ** 2, n_clbits)
+
+    for t in range(n_rounds):
+        qc.reset(syndrome_qubits)
+        qc.h(x_syndromes)
+        for layer in layers:
+            for control, target in layer:
+                qc.cx(control, target)
+        qc.h(x_syndromes)
+        qc.measure(syndrome_qubits, range(t * n_syndrome, (t + 1) * n_syndrome))
+        if barriers and t < n_rounds - 1:
+            qc.barrier()
+
+    if measure_data:
+        if barriers:
+            qc.barrier()
+        qc.measure(range(grid ** 2), range(n_syndrome * n_rounds, n_clbits))
+
+    attach_bit_map(qc, layout, n_rounds)
+    return qc, layout['stabilizer_map']
+
+
+def build_strip_circuit(distance, rounds=4, measure_data=False):
+    """
+    Build a rotated surface code circuit with alternating data/syndrome qubits.
+
+    Args:
+        distance (int): Code distance (determines grid size)
+        rounds (int): Number of measurement rounds
+        measure_data (bool): Measure every qubit i onto bit n_syndrome * rounds + i after the
+            last round, as `build_square_circuit` does
+
+    Returns:
+        QuantumCircuit: Surface code circuit
+        dict: Stabilizer map {syndrome_qubit: [data_qubits]}
+        list: Logical Z qubit chain (vertical data qubits)
+    """
+    from qiskit import QuantumCircuit
+
+    n_rows = 2 * distance + 1
+    n_cols = 3
+    total_qubits = n_rows * n_cols
+
+    # Identify data and syndrome qubits
+    data_qubits = []
+    syndrome_qubits = []
+    for r in range(n_rows):
+        for c in range(n_cols):
+            idx = r * n_cols + c
+            if (r + c) % 2 == 0:  # Checkerboard pattern
+                data_qubits.append(idx)
+            else:
+                syndrome_qubits.append(idx)
+
+    n_clbits = len(syndrome_qubits) * rounds + (total_qubits if measure_data else 0)
+    qc = QuantumCircuit(total_qubits, n_clbits)
+
+    # Initialize data qubits
+    for q in data_qubits:
+        qc.initialize([1, 0], q)  # Initialize to |0>
+
+    # Build stabilizer map
+    stabilizer_map = {}
+    for s in syndrome_qubits:
+        r, c = divmod(s, n_cols)
+        neighbors = []
+
+        # Z stabilizers (even rows)
+        if r % 2 == 0:
+            # Connect to horizontal neighbors
+            if c > 0: neighbors.append(s - 1)
+            if c < n_cols - 1: neighbors.append(s + 1)
+            # Connect to vertical neighbors
+            if r > 0: neighbors.append(s - n_cols)
+            if r < n_rows - 1: neighbors.append(s + n_cols)
+
+        # X stabilizers (odd rows)
+        else:
+            # Connect to vertical neighbors
+            if r > 0: neighbors.append(s - n_cols)
+            if r < n_rows - 1: neighbors.append(s + n_cols)
+            # Connect to horizontal neighbors
+            if c > 0: neighbors.append(s - 1)
+            if c < n_cols - 1: neighbors.append(s + 1)
+
+        stabilizer_map[s] = [q for q in neighbors if q in data_qubits]
+
+    classical_bit = 0
+
+    # Measurement rounds
+    for _ in range(rounds):
+        # Measure Z stabilizers (even rows)
+        for s in syndrome_qubits:
+            r, c = divmod(s, n_cols)
+            if r % 2 == 0:  # Z stabilizers
+                qc.reset(s)
+                for neighbor in stabilizer_map[s]:
+                    qc.cx(neighbor, s)
+                qc.measure(s, classical_bit)
+                classical_bit += 1
+                qc.barrier()
+
+        # Measure X stabilizers (odd rows)
+        for s in syndrome_qubits:
+            r, c = divmod(s, n_cols)
+            if r % 2 == 1:  # X stabilizers
+                qc.reset(s)
+                qc.h(s)
+                for neighbor in stabilizer_map[s]:
+                    qc.cx(s, neighbor)
+                qc.h(s)
+                qc.measure(s, classical_bit)
+                classical_bit += 1
+                qc.barrier()
+
+    if measure_data:
+        qc.measure(range(total_qubits), range(classical_bit, n_clbits))
+
+    # Logical Z chain (vertical middle column data qubits)
+    logical_z = [r * n_cols + 1 for r in range(1, n_rows, 2)]
+
+    attach_bit_map(qc, get_layout('strip', distance), rounds)
+    return qc, stabilizer_map, logical_z
+
+
+def patch_measurements(grid, n_patches, modes, measure_data=True):
+    """
+    Classical bits of a multi-patch circuit (see `build_patch_circuit`).
+
+    Returns:
+        dict: 'rounds', one {'merged', 'clbits': {syndrome qubit: classical bit}} per round,
+            'data' {qubit: classical bit} of the final readout (None without `measure_data`)
+            and 'n_bits'.
+    """
+    rounds = []
+    n_bits = 0
+    for mode in modes:
+        if mode not in ('split', 'merged'):
+            raise ValueError(f"Unknown round mode: {mode}")
+        layout = get_layout('patches', (grid, n_patches, mode == 'merged'))
+        clbits = {s: n_bits + k for k, s in enumerate(layout['syndrome_qubits'])}
+        rounds.append({'merged': mode == 'merged', 'clbits': clbits})
+        n_bits += len(clbits)
+
+    data = None
+    if measure_data:
+        n_qubits = grid * (n_patches * (grid + 1) - 1)
+        data = {q: n_bits + q for q in range(n_qubits)}
+        n_bits += n_qubits
+    return {'rounds': rounds, 'data': data, 'n_bits': n_bits}
+
+
+def build_patch_circuit(grid, n_patches, modes, barriers=True, measure_data=True):
+    """
+    Build a row of surface code patches whose rounds are either split or merged.
+
+    Split rounds measure every patch on its own, exactly like `build_square_circuit`; merged
+    rounds measure the whole row as one code, including the stabilizers across the gap columns
+    (lattice surgery). The gap data qubits are reset when a merge starts, so going from split to
+    merged to split rounds performs a merge and a split. Classical bits follow `patch_measurements`.
+
+    Args:
+        grid (int): Grid size of every patch (odd).
+        n_patches (int): Number of patches.
+        modes (sequence): 'split' or 'merged' for every round.
+        barriers (bool): Insert a barrier between rounds.
+        measure_data (bool): Measure all qubits after the last round.
+
+    Returns:
+        QuantumCircuit: Multi-patch circuit
+        dict: Its classical bits (`patch_measurements`)
+    """
+    from qiskit import QuantumCircuit
+
+    if grid % 2 != 1:
+        raise ValueError("Grid size must be an odd number")
+
+    measurements = patch_measurements(grid, n_patches, modes, measure_data)
+    layouts = {merged: get_layout('patches', (grid, n_patches, merged)) for merged in (False, True)}
+    n_qubits = layouts[True]['n_rows'] * layouts[True]['n_cols']
+    gap_data = sorted(set(layouts[True]['data_qubits']) - set(layouts[False]['data_qubits']))
+    qc = QuantumCircuit(n_qubits, measurements['n_bits'])
+
+    merged_before = False
+    for t, measured in enumerate(measurements['rounds']):
+        layout = layouts[measured['merged']]
+        if measured['merged'] and not merged_before and gap_data:
+            qc.reset(gap_data)
+        merged_before = measured['merged']
+
+        syndrome_qubits = layout['syndrome_qubits']
+        x_syndromes = [s for s in syndrome_qubits if layout['stabilizer_type'][s] == 'X']
+        qc.reset(syndrome_qubits)
+        qc.h(x_syndromes)
+        for layer in cx_layers(layout):
+            for control, target in layer:
+                qc.cx(control, target)
+        qc.h(x_syndromes)
+        qc.measure(syndrome_qubits, [measured['clbits'][s] for s in syndrome_qubits])
+        if barriers and t < len(modes) - 1:
+            qc.barrier()
+
+    if measure_data:
+        if barriers:
+            qc.barrier()
+        qubits = sorted(measurements['data'])
+        qc.measure(qubits, [measurements['data'][q] for q in qubits])
+
+    return qc, measurements
+
+
+def layout_circuit(kind, size, n_rounds, measure_data=True):
+    """Circuit whose classical bits match `layout.get_layout(kind, size)`: the square or the strip builder."""
+    if kind == 'square':
+        return build_square_circuit(size, n_rounds, measure_data=measure_data)[0]
+    if kind == 'strip':
+        return build_strip_circuit(size, n_rounds, measure_data)[0]
+    raise ValueError(f"Unknown layout kind: {kind}")
+
+
+def measurement_map(qc, layout, n_rounds):
+    """
+    Read the classical bit of every stabilizer measurement and qubit readout off the circuit.
+
+    The t-th measurement of a syndrome qubit (t < n_rounds) is its round t, any later
+    measurement of a qubit is its final readout.
+
+    Returns:
+        dict: As `decoder.default_bit_map`; 'data' is None unless every data qubit is read out.
+    """
+    column = {s: k for k, s in enumerate(layout['syndrome_qubits'])}
+    syndrome = np.full((n_rounds, len(column)), -1, dtype=np.intp)
+    data = np.full(layout['n_rows'] * layout['n_cols'], -1, dtype=np.intp)
+    measured = {}
+    for instruction in qc.data:
+        if instruction.operation.name != 'measure':
+            continue
+        q = qc.find_bit(instruction.qubits[0]).index
+        c = qc.find_bit(instruction.clbits[0]).index
+        t = measured.get(q, 0)
+        measured[q] = t + 1
+        if q in column and t < n_rounds:
+            syndrome[t, column[q]] = c
+        else:
+            data[q] = c
+    if (syndrome < 0).any():
+        raise ValueError(f"Circuit does not measure every stabilizer in {n_rounds} rounds")
+    return {
+        'n_bits': qc.num_clbits,
+        'syndrome': syndrome,
+        'data': data if (data[layout['data_qubits']] >= 0).all() else None,
+    }
+
+
+def attach_bit_map(qc, layout, n_rounds):
+    """Store the layout, round count and `measurement_map` of `qc` in its (serializable) metadata."""
+    bit_map = measurement_map(qc, layout, n_rounds)
+    qc.metadata = {
+        **(qc.metadata or {}),
+        'layout': [layout['kind'], layout['size']],
+        'n_rounds': n_rounds,
+        'bit_map': {key: value.tolist() if isinstance(value, np.ndarray) else value
+                    for key, value in bit_map.items()},
+    }
+
+
+def circuit_bit_map(qc, layout, n_rounds):
+    """
+    Classical bit gather indices of `qc`: the map its builder attached, or read off the circuit.
+
+    Index a (n_shots, n_bits) bit matrix with `bit_map['syndrome']` to get every syndrome round
+    at once, or pass it as `index` to `decoder.shots_to_bits` to skip the bit matrix entirely.
+    """
+    stored = (qc.metadata or {}).get('bit_map')
+    if (stored is None or qc.metadata.get('n_rounds') != n_rounds
+            or qc.metadata.get('layout') != [layout['kind'], layout['size']]):
+        return measurement_map(qc, layout, n_rounds)
+    return {
+        'n_bits': stored['n_bits'],
+        'syndrome': np.array(stored['syndrome'], dtype=np.intp),
+        'data': np.array(stored['data'], dtype=np.intp) if stored['data'] is not None else None,
+    }
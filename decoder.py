@@ -0,0 +1,651 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from layout import get_layout, stabilizer_adjacency
+
+
+def default_bit_map(layout, n_rounds, measure_data=True):
+    """
+    Gather indices of the classical bit layout shared by every circuit builder of this project.
+
+    Syndrome round t is measured onto bits t * n_syndrome ... (t + 1) * n_syndrome - 1 in
+    `layout['syndrome_qubits']` order and, with `measure_data`, qubit q is read out last onto
+    bit n_syndrome * n_rounds + q.
+
+    Returns:
+        dict: 'n_bits', 'syndrome' (n_rounds, n_syndrome) classical bit of every stabilizer
+            measurement and 'data' (n_qubits,) classical bit of every qubit readout, or None.
+    """
+    n_syndrome = len(layout['syndrome_qubits'])
+    n_qubits = layout['n_rows'] * layout['n_cols']
+    n_bits = n_syndrome * n_rounds + (n_qubits if measure_data else 0)
+    return {
+        'n_bits': n_bits,
+        'syndrome': np.arange(n_syndrome * n_rounds, dtype=np.intp).reshape(n_rounds, n_syndrome),
+        'data': np.arange(n_syndrome * n_rounds, n_bits, dtype=np.intp) if measure_data else None,
+    }
+
+
+def shot_to_bits(shot, index=None):
+    """Convert a Qiskit bitstring into a uint8 array indexed by classical bit (little-endian), or gathered at `index`."""
+    return shots_to_bits([shot], index)[0]
+
+
+def shots_to_bits(shots, index=None):
+    """
+    Convert equal-length Qiskit bitstrings into a (n_shots, n_bits) uint8 matrix indexed by classical bit.
+
+    With `index`, an array of classical bits (such as `default_bit_map(...)['syndrome']`), only
+    those bits are read, giving a (n_shots, *index.shape) matrix in one gather; Qiskit's
+    little-endian order is folded into the gather instead of reversing every string.
+    """
+    shots = [shot.replace(' ', '') for shot in shots]
+    if not shots:
+        return np.zeros((0, 0) if index is None else (0, *np.shape(index)), dtype=np.uint8)
+    raw = np.frombuffer(''.join(shots).encode(), dtype=np.uint8).reshape(len(shots), -1)
+    if index is None:
+        return raw[:, ::-1] - ord('0')
+    return raw[:, raw.shape[1] - 1 - np.asarray(index)] - ord('0')
+
+
+def readout_bit_map(layout, n_rounds, n_bits):
+    """`default_bit_map`, without the data readout when shots of `n_bits` bits have no room for it."""
+    bit_map = default_bit_map(layout, n_rounds)
+    if n_bits < bit_map['n_bits']:
+        bit_map = default_bit_map(layout, n_rounds, measure_data=False)
+    return bit_map
+
+
+def gather_readout(bits, layout, bit_map):
+    """
+    Data readout of a (n_shots, n_bits) bit matrix indexed by classical bit.
+
+    Returns:
+        np.ndarray: (n_shots, n_qubits) final readout indexed by qubit (zero on syndrome qubits),
+            or None when `bit_map` has no data readout.
+    """
+    if bit_map['data'] is None:
+        return None
+    data_qubits = layout['data_qubits']
+    data = np.zeros((len(bits), layout['n_rows'] * layout['n_cols']), dtype=np.uint8)
+    data[:, data_qubits] = bits[:, np.asarray(bit_map['data'])[data_qubits]]
+    return data
+
+
+def shots_readout(shots, layout, n_rounds, bit_map=None):
+    """
+    Syndrome rounds and data readout of Qiskit bitstrings.
+
+    Args:
+        bit_map (dict): Classical bit gather indices, defaults to `default_bit_map`, with the
+            data readout when the shots are long enough for it.
+
+    Returns:
+        tuple: (rounds (n_shots, n_rounds, n_syndrome), data as returned by `gather_readout`)
+    """
+    if bit_map is None:
+        bit_map = readout_bit_map(layout, n_rounds, len(shots[0].replace(' ', '')) if shots else 0)
+    rounds = shots_to_bits(shots, bit_map['syndrome'])
+    if bit_map['data'] is None:
+        return rounds, None
+    data_qubits = layout['data_qubits']
+    data = np.zeros((len(shots), layout['n_rows'] * layout['n_cols']), dtype=np.uint8)
+    data[:, data_qubits] = shots_to_bits(shots, np.asarray(bit_map['data'])[data_qubits])
+    return rounds, data
+
+
+def observed_flips(data, layout):
+    """
+    Logical flips measured by the data readout.
+
+    The data qubits are read out in the Z basis, so only the Z sector's logical operator
+    (`layout['logical_z']`, flipped by X errors) is measured; the X sector has no observable.
+
+    Returns:
+        dict: {'Z': (n_shots,) parity of the readout on `layout['logical_z']`}, empty without readout.
+    """
+    if data is None:
+        return {}
+    return {'Z': (data[:, layout['logical_z']].sum(axis=1) % 2).astype(np.uint8)}
+
+
+def decoded_result(freqs, logical_z, logical_x, observed=None):
+    """
+    Result dict shared by the decoders.
+
+    A correction's logical flip is only a logical error when it disagrees with what the data
+    readout measured; without a readout only the flip frequency of the corrections is known.
+
+    Args:
+        freqs (np.ndarray): Frequency of every shot.
+        logical_z, logical_x (np.ndarray): Logical flip of each shot's Z and X sector correction.
+        observed (dict): Measured logical flips per sector (`observed_flips`).
+
+    Returns:
+        dict: 'freqs', 'logical_z', 'logical_x', 'correction_flip_rate' (either correction flips
+            a logical operator) and, for the sectors in `observed`, 'failed' per shot (a
+            correction disagrees with its observable), 'logical_error_rate' and the per-sector
+            'logical_z_failed' / 'logical_x_failed' per shot and 'logical_z_rate' / 'logical_x_rate'.
+    """
+    freqs = np.asarray(freqs)
+    total_shots = freqs.sum()
+    result = {
+        'freqs': freqs,
+        'logical_z': logical_z,
+        'logical_x': logical_x,
+        'correction_flip_rate': float(freqs @ (logical_z | logical_x) / total_shots),
+    }
+    if observed:
+        failed = np.zeros(len(freqs), dtype=np.uint8)
+        for stab_type, name in (('Z', 'logical_z'), ('X', 'logical_x')):
+            if stab_type in observed:
+                sector_failed = result[name] ^ observed[stab_type]
+                result[f'{name}_failed'] = sector_failed
+                result[f'{name}_rate'] = float(freqs @ sector_failed / total_shots)
+                failed |= sector_failed
+        result['failed'] = failed
+        result['logical_error_rate'] = float(freqs @ failed / total_shots)
+    return result
+
+
+def syndrome_rounds(shot, layout, n_rounds, bit_map=None):
+    """
+    Extract the stabilizer measurements of one shot.
+
+    Returns:
+        np.ndarray: (n_rounds, n_syndrome) array, columns in `layout['syndrome_qubits']` order.
+    """
+    if bit_map is None:
+        bit_map = default_bit_map(layout, n_rounds)
+    return shot_to_bits(shot, bit_map['syndrome'])
+
+
+def detection_events(rounds):
+    """Detectors fire when a stabilizer changes between consecutive rounds: (n_rounds - 1, n_syndrome)."""
+    return rounds[1:] ^ rounds[:-1]
+
+
+# Every circuit of this project prepares the data qubits in |0> and reads them out in the Z basis:
+# Z stabilizers are deterministic before the first round and can be recomputed from the data
+# readout after the last one, X stabilizers are random in the first round and never read out.
+ANCHORED = {'Z': True, 'X': False}
+
+
+def memory_layers(stab_type, closing=False):
+    """
+    Detector layers of one sector of a memory experiment, as `build_spacetime_graph` options.
+
+    Args:
+        closing (bool): The shots carry the data readout.
+
+    Returns:
+        dict: 'opening' and 'closing' layers of the sector and its open 'time_boundaries'
+            (first, last), the ends no deterministic layer closes.
+    """
+    anchored = ANCHORED[stab_type]
+    closing = anchored and closing
+    return {'opening': anchored, 'closing': closing, 'time_boundaries': (not anchored, not closing)}
+
+
+def build_spacetime_graph(layout, stab_type, n_rounds, time_weight=1.0, space_weight=1.0, boundary_weight=None,
+                          opening=False, closing=False, time_boundaries=(False, False)):
+    """
+    Build the sparse spacetime matching graph of one stabilizer type over all rounds.
+
+    Node `t * n_stab + i` is the detector of the i-th stabilizer of this type in layer t; the
+    last node is the boundary. Layers compare consecutive rounds; with `opening` layer 0 is the
+    first round itself (a stabilizer deterministic on the initial state) and with `closing` the
+    last layer compares the last round with the stabilizers recomputed from the data readout.
+    Space-like edges join stabilizers that share a data qubit within a layer, time-like edges
+    join the same stabilizer in consecutive layers (measurement errors) and boundary edges join
+    stabilizers to the lattice boundary. An open end in `time_boundaries` (first, last) joins
+    its layer to the boundary with time-like edges: a measurement error there fires once.
+
+    Args:
+        layout (dict): Layout returned by `layout.get_layout`.
+        stab_type (str): 'Z' (detects X errors) or 'X' (detects Z errors).
+        n_rounds (int): Number of stabilizer measurement rounds.
+        time_weight (float): Weight of time-like edges.
+        space_weight (float): Weight of space-like edges.
+        boundary_weight (float): Weight of boundary edges, defaults to `space_weight`.
+        opening, closing, time_boundaries: Detector layers, see `memory_layers`; the defaults
+            give the bare round-to-round graph used for windows of a longer experiment.
+
+    Returns:
+        dict: 'stabilizers', 'columns' (their position in the syndrome rounds), 'n_nodes',
+            'boundary' (node index), 'edges' (m, 2), 'weights' (m,) and 'faults' (m,), the data
+            qubit flipped by each edge or -1 for time-like edges.
+    """
+    if boundary_weight is None:
+        boundary_weight = space_weight
+
+    order = layout['syndrome_qubits']
+    columns = [k for k, s in enumerate(order) if layout['stabilizer_type'][s] == stab_type]
+    stabilizers = [order[k] for k in columns]
+    position = {s: i for i, s in enumerate(stabilizers)}
+
+    n_stab = len(stabilizers)
+    n_layers = max(n_rounds - 1, 0) + opening + closing
+    boundary = n_stab * n_layers
+
+    edges = []
+    weights = []
+    faults = []
+    adjacency = stabilizer_adjacency(layout, stab_type)
+    for t in range(n_layers):
+        offset = t * n_stab
+        for s1, s2, q in adjacency:
+            if s2 is None:
+                edges.append((offset + position[s1], boundary))
+                weights.append(boundary_weight)
+            else:
+                edges.append((offset + position[s1], offset + position[s2]))
+                weights.append(space_weight)
+            faults.append(q)
+        if t + 1 < n_layers:
+            for i in range(n_stab):
+                edges.append((offset + i, offset + n_stab + i))
+                weights.append(time_weight)
+                faults.append(-1)
+    open_layers = {t for t, is_open in zip((0, n_layers - 1), time_boundaries) if is_open and n_layers}
+    for t in sorted(open_layers):
+        for i in range(n_stab):
+            edges.append((t * n_stab + i, boundary))
+            weights.append(time_weight)
+            faults.append(-1)
+
+    return {
+        'stab_type': stab_type,
+        'stabilizers': stabilizers,
+        'columns': np.array(columns, dtype=np.intp),
+        'n_nodes': boundary + 1,
+        'boundary': boundary,
+        'edges': np.array(edges, dtype=np.intp).reshape(-1, 2),
+        'weights': np.array(weights, dtype=float),
+        'faults': np.array(faults, dtype=np.intp),
+    }
+
+
+def shortest_path_tables(graph, logical_chain):
+    """
+    All-pairs shortest paths over a spacetime graph (vectorized Floyd-Warshall).
+
+    Returns:
+        dict: 'dist' distances, 'next' next hop on each shortest path, 'fault' data qubit of
+            each direct edge (-1 if none), 'parity' parity of each path on `logical_chain`, or
+            of the observable flips of its edges when the graph has 'observables'
+            (`error_model.model_graph`), and 'edge_parity' that parity for every graph edge.
+    """
+    n = graph['n_nodes']
+    in_chain = set(logical_chain)
+
+    dist = np.full((n, n), np.inf)
+    np.fill_diagonal(dist, 0.0)
+    nxt = np.tile(np.arange(n), (n, 1))
+    fault = np.full((n, n), -1, dtype=np.intp)
+    parity = np.zeros((n, n), dtype=np.uint8)
+
+    flips = graph.get('observables')
+    if flips is not None:
+        edge_parity = np.asarray(flips, dtype=np.uint8)
+    else:
+        edge_parity = np.array([q in in_chain for q in graph['faults']], dtype=np.uint8)
+    for (u, v), w, q, flip in zip(graph['edges'], graph['weights'], graph['faults'], edge_parity):
+        if w < dist[u, v]:
+            dist[u, v] = dist[v, u] = w
+            fault[u, v] = fault[v, u] = q
+            parity[u, v] = parity[v, u] = flip
+
+    for k in range(n):
+        candidate = dist[:, k, None] + dist[None, k, :]
+        better = candidate < dist
+        if not better.any():
+            continue
+        dist = np.where(better, candidate, dist)
+        parity = np.where(better, parity[:, k, None] ^ parity[None, k, :], parity)
+        nxt = np.where(better, nxt[:, k, None], nxt)
+
+    return {'dist': dist, 'next': nxt, 'fault': fault, 'parity': parity, 'edge_parity': edge_parity}
+
+
+@lru_cache(maxsize=None)
+def matching_tables(kind, size, stab_type, n_rounds, time_weight=1.0, space_weight=1.0, boundary_weight=None,
+                    logical_chain=None, opening=False, closing=False, time_boundaries=(False, False)):
+    """
+    Spacetime graph and its shortest-path tables, computed once per (layout, type, rounds, weights, layers).
+
+    `logical_chain` must be a tuple; it defaults to the layout's logical operator detected by
+    this stabilizer type ('logical_z' for Z stabilizers, 'logical_x' for X stabilizers). The
+    layer options are those of `build_spacetime_graph`.
+    """
+    layout = get_layout(kind, size)
+    if logical_chain is None:
+        logical_chain = layout['logical_z'] if stab_type == 'Z' else layout['logical_x']
+
+    graph = build_spacetime_graph(layout, stab_type, n_rounds, time_weight, space_weight, boundary_weight,
+                                  opening, closing, time_boundaries)
+    tables = shortest_path_tables(graph, logical_chain)
+    tables['graph'] = graph
+    tables['boundary'] = graph['boundary']
+    return tables
+
+
+def sector_tables(kind, size, stab_type, n_rounds, weights=(1.0, 1.0, None), noise=None, closing=False):
+    """
+    Tables of one sector of a full memory experiment, with its `memory_layers`.
+
+    Args:
+        weights (tuple): (time_weight, space_weight, boundary_weight) of `matching_tables`.
+        noise (tuple): Sorted circuit noise items; the graph then comes from the circuit's
+            detector error model (`error_model.model_tables`) instead of the weights.
+        closing (bool): The shots carry the data readout.
+    """
+    if noise is not None:
+        from error_model import model_tables
+        return model_tables(kind, size, stab_type, n_rounds, noise, closing)
+    return matching_tables(kind, size, stab_type, n_rounds, *weights, **memory_layers(stab_type, closing))
+
+
+def path_faults(u, v, tables):
+    """Data qubits along the shortest path between two nodes (walked along the shortest-path tree)."""
+    qubits = []
+    nxt = tables['next']
+    fault = tables['fault']
+    while u != v:
+        step = nxt[u, v]
+        q = fault[u, step]
+        if q >= 0:
+            qubits.append(int(q))
+        u = step
+    return qubits
+
+
+def match_detectors(fired, tables, reweight=None):
+    """
+    Minimum weight perfect matching of fired detectors, allowing matches to the boundary.
+
+    Each pair is weighted by the cheaper of its direct path and both nodes going to the
+    boundary; for an odd number of detectors a single boundary node is added.
+
+    Args:
+        fired (np.ndarray): Node indices of the fired detectors.
+        tables (dict): Result of `matching_tables`.
+        reweight (dict): Optional data qubit -> weight change applied to the shortest paths
+            through that qubit (the paths themselves are kept).
+
+    Returns:
+        list: Matched (node, node) pairs, either node may be the boundary.
+    """
+    k = len(fired)
+    if k == 0:
+        return []
+
+    boundary = tables['boundary']
+    dist = tables['dist']
+    direct = dist[np.ix_(fired, fired)]
+    to_boundary = dist[fired, boundary]
+    if reweight:
+        direct = direct.copy()
+        to_boundary = to_boundary.copy()
+        for i in range(k):
+            to_boundary[i] += sum(reweight.get(q, 0.0) for q in path_faults(int(fired[i]), boundary, tables))
+            for j in range(i + 1, k):
+                delta = sum(reweight.get(q, 0.0) for q in path_faults(int(fired[i]), int(fired[j]), tables))
+                direct[i, j] += delta
+                direct[j, i] += delta
+    via_boundary = to_boundary[:, None] + to_boundary[None, :]
+    pair_weight = np.minimum(direct, via_boundary)
+
+    import networkx as nx
+
+    G = nx.Graph()
+    for i in range(k):
+        for j in range(i + 1, k):
+            G.add_edge(i, j, weight=float(pair_weight[i, j]))
+    if k % 2 == 1:
+        for i in range(k):
+            G.add_edge(i, k, weight=float(to_boundary[i]))
+
+    pairs = []
+    for i, j in nx.min_weight_matching(G):
+        i, j = min(i, j), max(i, j)
+        if j == k:
+            pairs.append((int(fired[i]), boundary))
+        elif direct[i, j] <= via_boundary[i, j]:
+            pairs.append((int(fired[i]), int(fired[j])))
+        else:
+            pairs.append((int(fired[i]), boundary))
+            pairs.append((int(fired[j]), boundary))
+    return pairs
+
+
+def correction_qubits(pairs, tables):
+    """Data qubits flipped by a matching."""
+    flipped = set()
+    for u, v in pairs:
+        flipped ^= set(path_faults(u, v, tables))
+    return flipped
+
+
+def logical_flip(pairs, tables):
+    """Parity of the matching's correction on the logical chain of the tables."""
+    flip = 0
+    for u, v in pairs:
+        flip ^= int(tables['parity'][u, v])
+    return flip
+
+
+def decode_shot(shot, layout, n_rounds, stab_type='Z', time_weight=1.0, space_weight=1.0, boundary_weight=None):
+    """
+    Decode one shot with a single matching over the full spacetime graph.
+
+    Returns:
+        tuple: (matched pairs, logical flip of the correction)
+    """
+    tables = sector_tables(layout['kind'], layout['size'], stab_type, n_rounds,
+                           (time_weight, space_weight, boundary_weight))
+    events = sector_events(syndrome_rounds(shot, layout, n_rounds)[None], layout)[stab_type]
+    fired = np.flatnonzero(events[0])
+    pairs = match_detectors(fired, tables)
+    return pairs, logical_flip(pairs, tables)
+
+
+def decode_counts(counts, layout, n_rounds, stab_type='Z', time_weight=1.0, space_weight=1.0, boundary_weight=None):
+    """
+    Decode every distinct bitstring once and weight the outcome by its frequency.
+
+    Args:
+        counts (dict): Bitstring -> frequency, as returned by `get_counts()`.
+        layout (dict): Layout returned by `layout.get_layout`.
+        n_rounds (int): Number of stabilizer measurement rounds.
+        stab_type (str): Stabilizer type to decode.
+
+    Returns:
+        float: Fraction of shots whose correction flips the logical operator (not compared
+            with any readout, see `decode_both_sectors` for failure rates).
+    """
+    total_shots = sum(counts.values())
+    logical_errors = 0
+    for shot, freq in counts.items():
+        _, flip = decode_shot(shot, layout, n_rounds, stab_type, time_weight, space_weight, boundary_weight)
+        logical_errors += freq * flip
+    return logical_errors / total_shots
+
+
+def sector_detectors(counts, layout, n_rounds, bit_map=None):
+    """
+    Split the detection events of all shots into the Z and X sectors in one pass.
+
+    Returns:
+        tuple: (shots, freqs, fired, observed) where `fired[stab_type][n]` holds the fired
+            detector nodes of shot n in the spacetime graph of that stabilizer type and
+            `observed` the logical flips measured by the data readout (`observed_flips`).
+    """
+    shots = list(counts.keys())
+    freqs = np.array([counts[shot] for shot in shots])
+    rounds, data = shots_readout(shots, layout, n_rounds, bit_map)
+    return shots, freqs, rounds_detectors(rounds, layout, data), observed_flips(data, layout)
+
+
+def bits_detectors(bits, layout, n_rounds, bit_map=None):
+    """`fired` and `observed` of `sector_detectors` for a (n_shots, n_bits) matrix indexed by classical bit."""
+    if bit_map is None:
+        bit_map = readout_bit_map(layout, n_rounds, bits.shape[1])
+    data = gather_readout(bits, layout, bit_map)
+    return rounds_detectors(bits[:, bit_map['syndrome']], layout, data), observed_flips(data, layout)
+
+
+def readout_stabilizers(data, layout, stab_type):
+    """Stabilizers of one type recomputed from a (n_shots, n_qubits) data readout: (n_shots, n_stab) uint8."""
+    stabilizers = [s for s in layout['syndrome_qubits'] if layout['stabilizer_type'][s] == stab_type]
+    return np.stack([data[:, list(layout['stabilizer_map'][s])].sum(axis=1) % 2 for s in stabilizers],
+                    axis=1).astype(np.uint8)
+
+
+def sector_events(rounds, layout, data=None):
+    """
+    Detection events of both sectors, layer by layer as the nodes of `sector_tables`.
+
+    Args:
+        rounds (np.ndarray): (n_shots, n_rounds, n_syndrome) syndrome rounds.
+        layout (dict): Layout returned by `layout.get_layout`.
+        data (np.ndarray): (n_shots, n_qubits) data readout (`gather_readout`), which closes
+            the Z sector; None without one.
+
+    Returns:
+        dict: Stabilizer type -> (n_shots, n_layers, n_stab) uint8 events.
+    """
+    events = {}
+    for stab_type in ('Z', 'X'):
+        layers = memory_layers(stab_type, data is not None)
+        columns = [k for k, s in enumerate(layout['syndrome_qubits']) if layout['stabilizer_type'][s] == stab_type]
+        sector = rounds[:, :, columns]
+        parts = [sector[:, :1]] if layers['opening'] else []
+        parts.append(sector[:, 1:] ^ sector[:, :-1])
+        if layers['closing']:
+            parts.append((readout_stabilizers(data, layout, stab_type) ^ sector[:, -1])[:, None])
+        events[stab_type] = np.concatenate(parts, axis=1)
+    return events
+
+
+def rounds_detectors(rounds, layout, data=None):
+    """`fired` of `sector_detectors` for gathered (n_shots, n_rounds, n_syndrome) syndrome rounds and data readout."""
+    n_shots = len(rounds)
+    return {stab_type: [np.flatnonzero(row) for row in events.reshape(n_shots, -1)]
+            for stab_type, events in sector_events(rounds, layout, data).items()}
+
+
+def _decode_sector(kind, size, stab_type, n_rounds, weights, fired, reweights=None, noise=None, bp=None,
+                   closing=False):
+    """Decode the fired detectors of many shots in one sector: list of (logical flip, correction)."""
+    tables = sector_tables(kind, size, stab_type, n_rounds, weights, noise, closing)
+    if bp is not None:
+        from belief_propagation import bp_weights, reweighted_match
+        shot_weights = bp_weights(fired, tables, p=None if bp is True else bp)
+    outcomes = []
+    for n, nodes in enumerate(fired):
+        reweight = reweights[n] if reweights is not None else None
+        if bp is not None:
+            _, flip, corrected = reweighted_match(nodes, tables, shot_weights[n], reweight)
+            outcomes.append((flip, corrected))
+            continue
+        pairs = match_detectors(nodes, tables, reweight)
+        outcomes.append((logical_flip(pairs, tables), correction_qubits(pairs, tables)))
+    return outcomes
+
+
+def decode_both_sectors(counts, layout, n_rounds, time_weight=1.0, space_weight=1.0, boundary_weight=None,
+                        y_weight=None, workers=1, noise=None, bit_map=None, bp=None, pool=None):
+    """
+    Decode the Z and X sectors of every shot from one call.
+
+    Detection events of both sectors come from a single pass over the shot matrix and the two
+    independent graphs can be decoded concurrently. With `y_weight`, a second pass reweights each
+    sector's paths through data qubits corrected by the other sector to `y_weight`, so that
+    Y errors (an X and a Z flip on the same qubit) are matched as one cheaper fault.
+
+    Args:
+        counts (dict): Bitstring -> frequency.
+        layout (dict): Layout returned by `layout.get_layout`.
+        n_rounds (int): Number of stabilizer measurement rounds.
+        y_weight (float): Weight of a space-like edge whose qubit was corrected in the other sector.
+        workers (int): Processes started for the two sectors of this call, 1 decodes in-process.
+            Starting them (and rebuilding the tables in every child) costs far more than small
+            batches take to decode: repeated calls should share a `pool` instead.
+        noise (dict): Circuit noise (see `circuit_export`); when given, both graphs come from the
+            circuit's detector error model (`error_model.model_tables`) instead of the weights.
+        bit_map (dict): Classical bit gather indices of the circuit (`circuits.circuit_bit_map`),
+            defaults to `default_bit_map`.
+        bp (float or bool): Run the belief-propagation pre-pass (`belief_propagation`) and match
+            with its per-shot edge weights; a float is the prior error rate of every edge, True
+            reads the priors from the edge weights (with `noise`).
+        pool (Executor): Caller-owned process pool decoding the two sectors, kept alive (with
+            its workers' cached tables) across calls; overrides `workers`.
+
+    Returns:
+        dict: 'shots' and `decoded_result`: per-shot logical flips of the corrections,
+            'logical_z' (from the Z sector) and 'logical_x' (from the X sector), and, when the
+            shots carry the data readout, the shots that 'failed' and the 'logical_error_rate'.
+    """
+    shots, freqs, fired, observed = sector_detectors(counts, layout, n_rounds, bit_map)
+    result = decode_fired(fired, freqs, layout, n_rounds, time_weight, space_weight, boundary_weight,
+                          y_weight, workers, noise, bp, observed, pool)
+    return {'shots': shots, **result}
+
+
+def decode_bits(bits, freqs, layout, n_rounds, bit_map=None, **kwargs):
+    """
+    `decode_both_sectors` for shots given as a (n_shots, n_bits) matrix indexed by classical bit.
+
+    Returns:
+        dict: As `decode_both_sectors`, without 'shots'.
+    """
+    fired, observed = bits_detectors(bits, layout, n_rounds, bit_map)
+    return decode_fired(fired, np.asarray(freqs), layout, n_rounds, observed=observed, **kwargs)
+
+
+def decode_fired(fired, freqs, layout, n_rounds, time_weight=1.0, space_weight=1.0, boundary_weight=None,
+                 y_weight=None, workers=1, noise=None, bp=None, observed=None, pool=None):
+    """
+    Decode the fired detectors of both sectors (see `decode_both_sectors`).
+
+    Args:
+        observed (dict): Logical flips measured by the data readout (`observed_flips`); `fired`
+            then holds the closing layer of that readout (`rounds_detectors` with `data`).
+            Without them the result has no failure rate, only the corrections' flips.
+    """
+    weights = (time_weight, space_weight, boundary_weight)
+    base = (layout['kind'], layout['size'])
+    noise = tuple(sorted(noise.items())) if noise is not None else None
+    closing = bool(observed)
+
+    def run(reweights, executor):
+        jobs = [(*base, stab_type, n_rounds, weights, fired[stab_type], reweights[stab_type], noise, bp, closing)
+                for stab_type in ('Z', 'X')]
+        if executor is not None:
+            futures = [executor.submit(_decode_sector, *job) for job in jobs]
+            return dict(zip(('Z', 'X'), (f.result() for f in futures)))
+        return dict(zip(('Z', 'X'), (_decode_sector(*job) for job in jobs)))
+
+    # one pool for both passes when the caller has none
+    owned = ProcessPoolExecutor(max_workers=min(workers, 2)) if pool is None and workers > 1 else None
+    executor = pool if pool is not None else owned
+    try:
+        outcomes = run({'Z': None, 'X': None}, executor)
+
+        if y_weight is not None:
+            delta = y_weight - space_weight
+            reweights = {
+                'Z': [{q: delta for q in corr} for _, corr in outcomes['X']],
+                'X': [{q: delta for q in corr} for _, corr in outcomes['Z']],
+            }
+            outcomes = run(reweights, executor)
+    finally:
+        if owned is not None:
+            owned.shutdown()
+
+    logical_z = np.array([flip for flip, _ in outcomes['Z']], dtype=np.uint8)
+    logical_x = np.array([flip for flip, _ in outcomes['X']], dtype=np.uint8)
+    return decoded_result(freqs, logical_z, logical_x, observed)
@@ -0,0 +1,286 @@
+"""
+Detector error model of a noisy surface code circuit and matching graphs weighted from it.
+
+Every single Pauli fault allowed by the noise channels of `circuit_export.circuit_operations` is
+pushed through the Clifford circuit as a Pauli frame (one row per fault, all faults at once) to
+find the detectors and the observable it flips. Faults with the same effect are merged into one
+error mechanism, and each sector's matching graph gets one edge per mechanism weighted -log(p),
+replacing the hand-picked time/space weights.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from circuit_export import circuit_operations, detector_order
+from circuits import layout_circuit
+from decoder import shortest_path_tables
+from layout import get_layout, stabilizer_adjacency
+
+# (x, z) components of the Paulis I, X, Y, Z
+PAULIS = [(0, 0), (1, 0), (1, 1), (0, 1)]
+_PAIRS = [(a, b) for a in PAULIS for b in PAULIS if a != (0, 0) or b != (0, 0)]
+
+# Faults of each noise channel as (x, z) frames of shape (faults, arity), each fault taking an
+# equal share of the channel probability.
+CHANNELS = {
+    'X_ERROR': (np.array([[1]], dtype=bool), np.array([[0]], dtype=bool)),
+    'DEPOLARIZE1': (np.array([[p[0]] for p in PAULIS[1:]], dtype=bool),
+                    np.array([[p[1]] for p in PAULIS[1:]], dtype=bool)),
+    'DEPOLARIZE2': (np.array([[a[0], b[0]] for a, b in _PAIRS], dtype=bool),
+                    np.array([[a[1], b[1]] for a, b in _PAIRS], dtype=bool)),
+}
+
+
+def propagate_faults(circuit, n_qubits):
+    """
+    Measurement flips caused by every single fault of a circuit.
+
+    Args:
+        circuit (dict): Result of `circuit_export.circuit_operations`.
+        n_qubits (int): Number of qubits of the circuit.
+
+    Returns:
+        tuple: (flips (n_faults, n_measurements) bool, probabilities (n_faults,)).
+    """
+    operations = circuit['operations']
+    # first pass: one block of frame rows per noise operation
+    starts = []
+    probabilities = []
+    n_faults = 0
+    for name, p, qubits in operations:
+        starts.append(n_faults)
+        if name in CHANNELS:
+            k, arity = CHANNELS[name][0].shape
+            n_rows = k * len(qubits) // arity
+            probabilities.append(np.full(n_rows, p / k))
+            n_faults += n_rows
+
+    x = np.zeros((n_faults, n_qubits), dtype=bool)
+    z = np.zeros((n_faults, n_qubits), dtype=bool)
+    flips = np.zeros((n_faults, circuit['n_measurements']), dtype=bool)
+    n_measured = 0
+
+    for (name, p, qubits), start in zip(operations, starts):
+        targets = np.asarray(qubits, dtype=np.intp)
+        if name in CHANNELS:
+            fx, fz = CHANNELS[name]
+            k, arity = fx.shape
+            for i in range(len(targets) // arity):
+                rows = slice(start + i * k, start + (i + 1) * k)
+                for j in range(arity):
+                    x[rows, targets[i * arity + j]] ^= fx[:, j]
+                    z[rows, targets[i * arity + j]] ^= fz[:, j]
+        elif name == 'H':
+            x[:, targets], z[:, targets] = z[:, targets], x[:, targets]
+        elif name == 'CX':
+            controls, cx_targets = targets[0::2], targets[1::2]
+            x[:, cx_targets] ^= x[:, controls]
+            z[:, controls] ^= z[:, cx_targets]
+        elif name == 'R':
+            x[:, targets] = False
+            z[:, targets] = False
+        elif name == 'M':
+            flips[:, n_measured:n_measured + len(targets)] = x[:, targets]
+            n_measured += len(targets)
+
+    probabilities = np.concatenate(probabilities) if probabilities else np.zeros(0)
+    return flips, probabilities
+
+
+def detector_error_model(qc, layout, n_rounds, noise):
+    """
+    Merged error mechanisms of a noisy circuit.
+
+    Faults flipping the same detectors and observable are combined as independent events,
+    p = (1 - prod(1 - 2 p_i)) / 2; faults flipping nothing are dropped.
+
+    Args:
+        qc (QuantumCircuit): Circuit built on `layout` (see `circuit_export.circuit_operations`).
+        layout (dict): Layout returned by `layout.get_layout`.
+        n_rounds (int): Number of stabilizer measurement rounds.
+        noise (dict): Channel probabilities, as for `circuit_export.to_stim`.
+
+    Returns:
+        dict: 'n_detectors', 'closing' (the data readout closes the Z sector), 'detectors'
+            (list of detector index tuples), 'observables' (bool array, observable flipped by
+            each mechanism) and 'probabilities'.
+    """
+    circuit = circuit_operations(qc, layout, n_rounds, noise)
+    flips, p = propagate_faults(circuit, qc.num_qubits)
+
+    symptoms = np.zeros((len(flips), len(circuit['detectors'])), dtype=bool)
+    for d, (_, records) in enumerate(circuit['detectors']):
+        symptoms[:, d] = np.bitwise_xor.reduce(flips[:, list(records)], axis=1)
+    if circuit['observable'] is not None:
+        observable = np.bitwise_xor.reduce(flips[:, circuit['observable']], axis=1)
+    else:
+        observable = np.zeros(len(flips), dtype=bool)
+
+    keys = np.packbits(np.column_stack([symptoms, observable]), axis=1)
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    merged = (1 - np.exp(np.bincount(inverse, weights=np.log1p(-2 * p), minlength=len(unique)))) / 2
+
+    first = np.zeros(len(unique), dtype=np.intp)
+    first[inverse[::-1]] = np.arange(len(inverse))[::-1]
+    detectors = [tuple(np.flatnonzero(symptoms[i])) for i in first]
+    keep = [k for k, dets in enumerate(detectors) if dets or observable[first[k]]]
+
+    return {
+        'n_detectors': len(circuit['detectors']),
+        'closing': circuit['closing'],
+        'detectors': [detectors[k] for k in keep],
+        'observables': observable[first[keep]],
+        'probabilities': merged[keep],
+    }
+
+
+def to_text(model):
+    """Stim-style text of a detector error model ('error(p) D0 D3 L0' lines)."""
+    lines = []
+    for dets, obs, p in zip(model['detectors'], model['observables'], model['probabilities']):
+        targets = [f"D{d}" for d in dets] + (["L0"] if obs else [])
+        lines.append(f"error({p:.6g}) " + " ".join(targets))
+    return "\n".join(lines) + "\n"
+
+
+def _decompose(symptom, basic, depth=3):
+    """Split a set of detectors into graph-like mechanisms of `basic` (node sets), or None."""
+    if not symptom:
+        return []
+    if depth == 0:
+        return None
+    first = min(symptom)
+    for part in basic.get(first, ()):
+        if part <= symptom:
+            rest = _decompose(symptom - part, basic, depth - 1)
+            if rest is not None:
+                return [part] + rest
+    return None
+
+
+def model_graph(model, layout, n_rounds, stab_type):
+    """
+    Matching graph of one sector built from a detector error model.
+
+    Nodes and fault qubits follow `decoder.build_spacetime_graph`, so the result can be passed
+    to `decoder.shortest_path_tables`; measurement errors at an open time end fire a single
+    detector and become the time boundaries of `decoder.memory_layers`. Every mechanism touching
+    one or two detectors of the sector becomes an edge, including those between stabilizers
+    that share no data qubit (hook errors spreading from a syndrome qubit onto two data qubits);
+    larger ones, such as Y errors seen by both sectors, are decomposed into those edges when
+    possible and otherwise left out. Probabilities landing on the same edge are combined before
+    taking -log(p). When the circuit has an observable (the Z sector closed by the readout),
+    every edge also records whether its most likely mechanism flips it.
+
+    Returns:
+        dict: Graph with the keys of `decoder.build_spacetime_graph`, plus 'dropped', the total
+            probability of the mechanisms that could not be decomposed, and 'observables' for
+            the sector of the observable.
+    """
+    order = detector_order(layout, n_rounds, model['closing'])
+    sector = [d for d, (t, _, _) in enumerate(order) if t == stab_type]
+    offset = sector[0] if sector else 0
+    n_sector = len(sector)
+
+    columns = [k for k, s in enumerate(layout['syndrome_qubits']) if layout['stabilizer_type'][s] == stab_type]
+    stabilizers = [layout['syndrome_qubits'][k] for k in columns]
+    n_stab = len(stabilizers)
+    boundary = n_sector
+
+    shared = {}
+    boundary_qubit = {}
+    for s1, s2, q in stabilizer_adjacency(layout, stab_type):
+        if s2 is None:
+            boundary_qubit.setdefault(s1, q)
+        else:
+            shared.setdefault(frozenset((s1, s2)), q)
+
+    def edge_fault(nodes):
+        """Data qubit flipped by an edge, -1 for time-like edges and faults on several qubits."""
+        stabs = [stabilizers[n % n_stab] for n in nodes]
+        if len(nodes) == 1:
+            return boundary_qubit.get(stabs[0], -1)
+        if stabs[0] == stabs[1]:
+            return -1
+        return shared.get(frozenset(stabs), -1)
+
+    symptoms = []
+    for dets, flips, p in zip(model['detectors'], model['observables'], model['probabilities']):
+        nodes = frozenset(d - offset for d in dets if offset <= d < offset + n_sector)
+        if nodes:
+            symptoms.append((nodes, bool(flips), p))
+
+    basic = {}
+    for nodes, _, _ in symptoms:
+        if len(nodes) <= 2:
+            for n in nodes:
+                basic.setdefault(n, set()).add(nodes)
+    # try pairs before single boundary edges
+    basic = {n: sorted(parts, key=len, reverse=True) for n, parts in basic.items()}
+
+    edge_p = {}
+    observable_p = {}  # edge -> probability of its direct mechanisms leaving / flipping the observable
+    dropped = 0.0
+    for nodes, flips, p in symptoms:
+        if len(nodes) <= 2:
+            odds = observable_p.setdefault(nodes, [0.0, 0.0])
+            odds[flips] += p
+        parts = _decompose(nodes, basic)
+        if parts is None:
+            dropped += p
+            continue
+        for part in parts:
+            q = edge_p.get(part, 0.0)
+            edge_p[part] = q * (1 - p) + p * (1 - q)
+
+    edges, weights, faults, observables = [], [], [], []
+    for part, p in edge_p.items():
+        nodes = sorted(part)
+        faults.append(edge_fault(nodes))
+        edges.append((nodes[0], nodes[1] if len(nodes) == 2 else boundary))
+        weights.append(-np.log(p))
+        no_flip, flip = observable_p[part]
+        observables.append(flip > no_flip)
+
+    graph = {
+        'stab_type': stab_type,
+        'stabilizers': stabilizers,
+        'columns': np.array(columns, dtype=np.intp),
+        'n_nodes': boundary + 1,
+        'boundary': boundary,
+        'edges': np.array(edges, dtype=np.intp).reshape(-1, 2),
+        'weights': np.array(weights, dtype=float),
+        'faults': np.array(faults, dtype=np.intp),
+        'dropped': dropped,
+    }
+    if stab_type == 'Z' and model['closing']:
+        graph['observables'] = np.array(observables, dtype=np.uint8)
+    return graph
+
+
+def noise_key(noise):
+    """Hashable form of a noise dict, for `model_tables`."""
+    return tuple(sorted(noise.items()))
+
+
+@lru_cache(maxsize=None)
+def model_tables(kind, size, stab_type, n_rounds, noise, closing=False):
+    """
+    Matching tables of one sector weighted by the circuit's detector error model.
+
+    Built once per (layout, type, rounds, noise, readout) and interchangeable with
+    `decoder.sector_tables`.
+
+    Args:
+        noise (tuple): Noise dict as returned by `noise_key`.
+        closing (bool): Model the circuit with the data readout, which closes the Z sector.
+    """
+    layout = get_layout(kind, size)
+    qc = layout_circuit(kind, size, n_rounds, measure_data=closing)
+    model = detector_error_model(qc, layout, n_rounds, dict(noise))
+    graph = model_graph(model, layout, n_rounds, stab_type)
+    tables = shortest_path_tables(graph, layout['logical_z'] if stab_type == 'Z' else layout['logical_x'])
+    tables['graph'] = graph
+    tables['boundary'] = graph['boundary']
+    return tables
@@ -0,0 +1,209 @@
+"""
+Threshold and error-suppression fits over (distance, p) sweeps.
+
+Two models are fitted to the logical error rate P_L of every sweep point, each point weighted by
+the inverse of its binomial variance:
+
+    finite-size scaling  P_L = A + B x + C x^2,  x = (p - p_th) d^(1 / nu)
+    suppression          P_L = C / Lambda^((d + 1) / 2)  at every fixed p
+
+The scaling form is linear in A, B, C, so every (p_th, nu) candidate of a grid is solved in
+closed form at once from its weighted normal equations and the grid is refined around the best
+candidate. Uncertainties come from a parametric bootstrap (errors resampled from the binomial of
+each point) spread over worker processes.
+"""
+import argparse
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+def save_sweep(results, path):
+    """Store sweep results {(distance, p): result} without their counts."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    stripped = {point: {k: v for k, v in result.items() if k != 'counts'} for point, result in results.items()}
+    with open(path, 'wb') as f:
+        pickle.dump(stripped, f)
+
+
+def load_sweep(path):
+    """Load sweep results stored by `save_sweep`."""
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def sweep_arrays(results):
+    """
+    Flatten sweep results into arrays.
+
+    Args:
+        results (dict): (distance, p) -> dict with at least 'errors' and 'shots'
+            (as returned by `sampling.adaptive_sweep`).
+
+    Returns:
+        dict: 'distance', 'p', 'errors', 'shots', 'rate' and 'weight' arrays. Rates and weights
+            use (errors + 0.5) / (shots + 1) so that points without errors stay usable.
+    """
+    points = sorted(results)
+    distance = np.array([d for d, _ in points], dtype=float)
+    p = np.array([p for _, p in points], dtype=float)
+    errors = np.array([results[point]['errors'] for point in points], dtype=float)
+    shots = np.array([results[point]['shots'] for point in points], dtype=float)
+    return _with_rates({'distance': distance, 'p': p, 'errors': errors, 'shots': shots})
+
+
+def _with_rates(data):
+    rate = (data['errors'] + 0.5) / (data['shots'] + 1)
+    return {**data, 'rate': rate, 'weight': data['shots'] / (rate * (1 - rate))}
+
+
+def _scaling_solve(distance, p, rate, weight, p_th, nu):
+    """
+    Weighted least squares of the quadratic scaling form for many (p_th, nu) candidates.
+
+    Returns:
+        tuple: (coefficients (n_candidates, 3), chi2 (n_candidates,))
+    """
+    x = (p[None, :] - p_th[:, None]) * distance[None, :] ** (1 / nu[:, None])
+    powers = np.empty(x.shape + (5,))  # (n_candidates, n_points, 5)
+    powers[:, :, 0] = 1.0
+    for k in range(1, 5):
+        powers[:, :, k] = powers[:, :, k - 1] * x
+    moments = weight @ powers
+    targets = (weight * rate) @ powers[:, :, :3]
+    normal = moments[:, np.arange(3)[:, None] + np.arange(3)[None, :]]
+    coefficients = np.linalg.solve(normal, targets[:, :, None])[:, :, 0]
+    chi2 = weight @ rate ** 2 - np.sum(coefficients * targets, axis=1)
+    return coefficients, chi2
+
+
+def fit_threshold(data, p_range=None, nu_range=(0.5, 3.0), grid=21, passes=6):
+    """
+    Fit the finite-size-scaling form by a grid search over (p_th, nu) refined around the optimum.
+
+    Args:
+        data (dict): Result of `sweep_arrays`.
+        p_range (tuple): Search range of p_th, defaults to the range of swept p.
+        nu_range (tuple): Search range of nu.
+        grid (int): Candidates per axis in every pass.
+        passes (int): Number of refinements.
+
+    Returns:
+        dict: 'p_th', 'nu', 'coefficients' (A, B, C) and 'chi2'.
+    """
+    if p_range is None:
+        p_range = (data['p'].min(), data['p'].max())
+    (p_low, p_high), (nu_low, nu_high) = p_range, nu_range
+
+    for _ in range(passes):
+        p_grid, nu_grid = np.meshgrid(np.linspace(p_low, p_high, grid), np.linspace(nu_low, nu_high, grid))
+        p_th, nu = p_grid.ravel(), nu_grid.ravel()
+        coefficients, chi2 = _scaling_solve(data['distance'], data['p'], data['rate'], data['weight'], p_th, nu)
+        best = np.nanargmin(chi2)
+        p_step = (p_high - p_low) / (grid - 1)
+        nu_step = (nu_high - nu_low) / (grid - 1)
+        p_low, p_high = p_th[best] - 2 * p_step, p_th[best] + 2 * p_step
+        nu_low, nu_high = max(nu[best] - 2 * nu_step, 1e-3), nu[best] + 2 * nu_step
+
+    return {'p_th': p_th[best], 'nu': nu[best], 'coefficients': coefficients[best], 'chi2': chi2[best]}
+
+
+def fit_lambda(data):
+    """
+    Fit log P_L = log C - k log Lambda with k = (d + 1) / 2, separately for every swept p.
+
+    Returns:
+        dict: 'p', 'lambda' and 'C' arrays, one entry per distinct p with at least two distances.
+    """
+    ps, group = np.unique(data['p'], return_inverse=True)
+    k = (data['distance'] + 1) / 2
+    y = np.log(data['rate'])
+    # delta method: var(log P) = var(P) / P^2
+    w = data['weight'] * data['rate'] ** 2
+
+    def total(values):
+        return np.bincount(group, weights=values, minlength=len(ps))
+
+    s0, s1, s2 = total(w), total(w * k), total(w * k * k)
+    t0, t1 = total(w * y), total(w * k * y)
+    n_distances = np.bincount(group, minlength=len(ps))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        determinant = s0 * s2 - s1 ** 2
+        slope = (s0 * t1 - s1 * t0) / determinant
+        intercept = (s2 * t0 - s1 * t1) / determinant
+    keep = n_distances >= 2
+    return {'p': ps[keep], 'lambda': np.exp(-slope[keep]), 'C': np.exp(intercept[keep])}
+
+
+def _bootstrap_chunk(data, seed, n_samples, threshold_kwargs):
+    rng = np.random.default_rng(seed)
+    thresholds = np.empty((n_samples, 2))
+    lambdas = []
+    for i in range(n_samples):
+        errors = rng.binomial(data['shots'].astype(np.int64), data['errors'] / data['shots'])
+        sample = _with_rates({**data, 'errors': errors.astype(float)})
+        fit = fit_threshold(sample, **threshold_kwargs)
+        thresholds[i] = fit['p_th'], fit['nu']
+        lambdas.append(fit_lambda(sample)['lambda'])
+    return thresholds, np.array(lambdas)
+
+
+def bootstrap(data, n_samples=200, workers=4, seed=None, **threshold_kwargs):
+    """
+    Parametric bootstrap of both fits, split across worker processes.
+
+    Returns:
+        dict: 'p_th', 'nu' and 'lambda' (per swept p) bootstrap samples, plus their standard
+            deviations as 'p_th_std', 'nu_std' and 'lambda_std'.
+    """
+    workers = max(1, min(workers, n_samples))
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    sizes = [len(chunk) for chunk in np.array_split(np.arange(n_samples), workers)]
+    jobs = [(data, s, n, threshold_kwargs) for s, n in zip(seeds, sizes) if n]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(_bootstrap_chunk, *zip(*jobs)))
+    else:
+        chunks = [_bootstrap_chunk(*job) for job in jobs]
+
+    thresholds = np.concatenate([t for t, _ in chunks])
+    lambdas = np.concatenate([l for _, l in chunks])
+    return {
+        'p_th': thresholds[:, 0],
+        'nu': thresholds[:, 1],
+        'lambda': lambdas,
+        'p_th_std': thresholds[:, 0].std(ddof=1),
+        'nu_std': thresholds[:, 1].std(ddof=1),
+        'lambda_std': lambdas.std(axis=0, ddof=1),
+    }
+
+
+def fit_sweep(results, n_samples=200, workers=4, seed=None, **threshold_kwargs):
+    """Threshold, nu and Lambda of a sweep with bootstrap standard deviations."""
+    data = sweep_arrays(results)
+    threshold = fit_threshold(data, **threshold_kwargs)
+    suppression = fit_lambda(data)
+    summary = {**threshold, **suppression}
+    if n_samples:
+        samples = bootstrap(data, n_samples, workers, seed, **threshold_kwargs)
+        summary.update({k: samples[k] for k in ('p_th_std', 'nu_std', 'lambda_std')})
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit threshold and Lambda to stored sweep results.")
+    parser.add_argument('sweep', help="Pickle written by fitting.save_sweep")
+    parser.add_argument('--bootstrap', type=int, default=200, help="Bootstrap samples (0 to skip)")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    summary = fit_sweep(load_sweep(args.sweep), args.bootstrap, args.workers, args.seed)
+    print(f"p_th = {summary['p_th']:.5g} ± {summary.get('p_th_std', np.nan):.2g}, "
+          f"nu = {summary['nu']:.3g} ± {summary.get('nu_std', np.nan):.2g}")
+    for i, p in enumerate(summary['p']):
+        std = summary['lambda_std'][i] if 'lambda_std' in summary else np.nan
+        print(f"p = {p:.4g}: Lambda = {summary['lambda'][i]:.3g} ± {std:.2g}")
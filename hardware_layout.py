@@ -0,0 +1,163 @@
+"""
+Hardware embeddings of the 3-column strip layout, computed once per coupling map and reused.
+
+The strip of distance d is the 3-column grid of `layout.get_layout('strip', d)`; every grid
+neighbour pair is a data/syndrome pair driven by one CX per round. Heavy-hex devices have no
+degree-4 qubits, so the grid cannot be embedded exactly: the embedding places the logical qubits
+row by row with a beam search that minimises the number of interactions whose physical qubits
+are not coupled (weighted by their coupling-map distance), and prefers qubits with low readout
+error for the syndrome qubits, which are measured and reset every round.
+
+Distance d + 1 only adds two rows at the end of the strip, so its embedding extends the one of
+distance d. Embeddings are stored per coupling map in `stats/layouts` and grown on demand, and
+every distance uses a prefix of the same physical qubit list.
+"""
+import json
+import os
+
+import numpy as np
+
+from incremental import hash_config
+from layout import get_layout
+
+N_COLS = 3
+
+
+def coupling_edges(coupling):
+    """Sorted undirected edges of a backend (`backend.coupling_map`), a `CouplingMap` or an edge list."""
+    coupling = getattr(coupling, 'coupling_map', coupling)
+    edges = coupling.get_edges() if hasattr(coupling, 'get_edges') else coupling
+    return sorted({(min(a, b), max(a, b)) for a, b in edges if a != b})
+
+
+def coupling_distances(edges):
+    """All-pairs hop distances of a coupling graph (BFS from every qubit), unreachable pairs = inf."""
+    n_qubits = max(max(edge) for edge in edges) + 1
+    neighbours = [[] for _ in range(n_qubits)]
+    for a, b in edges:
+        neighbours[a].append(b)
+        neighbours[b].append(a)
+
+    dist = np.full((n_qubits, n_qubits), np.inf)
+    for source in range(n_qubits):
+        dist[source, source] = 0
+        frontier = [source]
+        depth = 0
+        while frontier:
+            depth += 1
+            nxt = []
+            for q in frontier:
+                for r in neighbours[q]:
+                    if dist[source, r] == np.inf:
+                        dist[source, r] = depth
+                        nxt.append(r)
+            frontier = nxt
+    return dist
+
+
+def measurement_errors(backend):
+    """Readout error of every qubit from a `Target`-based backend, None when it has no calibration."""
+    target = getattr(backend, 'target', None)
+    if target is None or 'measure' not in target:
+        return None
+    errors = np.zeros(target.num_qubits)
+    for qargs, properties in target['measure'].items():
+        if qargs and properties is not None and properties.error is not None:
+            errors[qargs[0]] = properties.error
+    return errors
+
+
+def strip_interactions(distance):
+    """For every logical qubit of the strip (row-major), its grid neighbours placed before it."""
+    n_qubits = (2 * distance + 1) * N_COLS
+    return [[q - d for d in (1, N_COLS) if q - d >= 0 and (d == N_COLS or q % N_COLS)]
+            for q in range(n_qubits)]
+
+
+def extend_embedding(placements, distance, dist, readout=None, beam_width=32, candidates=8,
+                     readout_weight=1.0):
+    """
+    Grow partial embeddings (lists of physical qubits, logical qubit i on placements[k][i])
+    to the strip of `distance` by beam search.
+
+    A placement costs dist - 1 for every interaction between its logical qubit and a placed
+    neighbour (0 when the physical qubits are coupled), plus `readout_weight` times the readout
+    error of the physical qubit when it hosts a syndrome qubit.
+
+    Returns:
+        tuple: (physical qubits of the best embedding, its routing cost)
+    """
+    layout = get_layout('strip', distance)
+    syndrome = set(layout['syndrome_qubits'])
+    previous = strip_interactions(distance)
+    n_logical = len(previous)
+    n_physical = len(dist)
+    if n_logical > n_physical:
+        raise ValueError(f"Strip of distance {distance} needs {n_logical} qubits, the device has {n_physical}")
+    readout = np.zeros(n_physical) if readout is None else np.asarray(readout)
+
+    beam = [(0.0, list(placement)) for placement in placements]
+    for q in range(len(beam[0][1]), n_logical):
+        expanded = []
+        for cost, placement in beam:
+            free = np.ones(n_physical, dtype=bool)
+            free[placement] = False
+            anchors = [placement[nb] for nb in previous[q]]
+            if anchors:
+                step = (dist[anchors][:, free] - 1).sum(axis=0)
+                # stay close to the rest of the strip when the neighbours give no preference
+                step = step + 1e-3 * dist[placement[-1], free]
+            else:
+                step = np.zeros(free.sum()) if not placement else 1e-3 * dist[placement[-1], free]
+            if q in syndrome:
+                step = step + readout_weight * readout[free]
+            options = np.flatnonzero(free)
+            best = np.argsort(step, kind='stable')[:candidates if placement else n_physical]
+            expanded.extend((cost + step[i], placement + [int(options[i])]) for i in best)
+        expanded.sort(key=lambda state: state[0])
+        beam = expanded[:beam_width]
+        if not np.isfinite(beam[0][0]):
+            raise ValueError("The coupling map is not connected enough for this strip")
+
+    cost, placement = beam[0]
+    return placement, float(cost)
+
+
+def strip_layout(backend, distance, cache_dir='stats/layouts', **search_kwargs):
+    """
+    Physical qubits for the strip of `distance` on `backend`, logical qubit i on entry i.
+
+    The embedding of the largest distance computed so far is cached per coupling map; smaller
+    distances use its prefix and larger ones extend it.
+    """
+    edges = coupling_edges(backend)
+    path = os.path.join(cache_dir, f"strip_{hash_config(edges)[:16]}.json")
+    n_logical = (2 * distance + 1) * N_COLS
+
+    cached = {'distance': 0, 'physical_qubits': [], 'cost': 0.0}
+    if os.path.exists(path):
+        with open(path) as f:
+            cached = json.load(f)
+    if cached['distance'] >= distance:
+        return cached['physical_qubits'][:n_logical]
+
+    placements = [cached['physical_qubits']] if cached['physical_qubits'] else [[]]
+    physical_qubits, cost = extend_embedding(placements, distance, coupling_distances(edges),
+                                             measurement_errors(backend), **search_kwargs)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'distance': distance, 'physical_qubits': physical_qubits,
+                   'cost': cached['cost'] + cost}, f)
+    return physical_qubits
+
+
+def strip_pass_manager(backend, distance, optimization_level=1, **layout_kwargs):
+    """
+    Preset pass manager that starts the strip on its cached embedding, so no layout search runs.
+
+    Level 1 lets routing SWAPs cancel against the CX of the stabilizer rounds, which level 0 keeps.
+    """
+    from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+
+    return generate_preset_pass_manager(target=backend.target, optimization_level=optimization_level,
+                                        initial_layout=strip_layout(backend, distance, **layout_kwargs))
@@ -0,0 +1,135 @@
+"""
+Content-hash dependency tracking for analysis results.
+
+Every result is stored together with a fingerprint of what it was computed from: the hash of its
+input dataset, of the layout and of the decoder configuration (including the source of the
+decoder modules). A later run recomputes a result only when its fingerprint changed, so tweaking
+one decoder setting re-decodes only the results that depend on it.
+
+File hashes are remembered by (size, modification time), so unchanged multi-megabyte count
+files are not re-read on every run.
+"""
+import hashlib
+import json
+import os
+import pickle
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_config(config):
+    """Hash of a JSON-like configuration (dict keys are sorted, unknown objects use repr)."""
+    return hash_bytes(json.dumps(config, sort_keys=True, default=repr).encode())
+
+
+def hash_counts(counts):
+    """Hash of a counts dict, independent of its insertion order."""
+    digest = hashlib.sha256()
+    for shot in sorted(counts):
+        digest.update(f"{shot}:{counts[shot]};".encode())
+    return digest.hexdigest()
+
+
+def hash_layout(layout):
+    """Hash of the parts of a layout that decoding depends on."""
+    return hash_config({
+        'kind': layout['kind'],
+        'size': layout['size'],
+        'syndrome_qubits': layout['syndrome_qubits'],
+        'stabilizer_map': sorted((s, list(qs)) for s, qs in layout['stabilizer_map'].items()),
+    })
+
+
+def hash_source(*modules):
+    """Hash of the source files of some modules, so code changes invalidate their results."""
+    digest = hashlib.sha256()
+    for module in modules:
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class ResultStore:
+    """
+    Results keyed by name, reused while their fingerprint is unchanged.
+
+    Args:
+        directory (str): Where results and the manifest (`manifest.json`) live.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {'results': {}, 'files': {}}
+
+    def hash_file(self, path):
+        """Content hash of a file, re-read only when its size or modification time changed."""
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        known = self.manifest['files'].get(key)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        self.manifest['files'][key] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        self._save_manifest()
+        return digest.hexdigest()
+
+    @staticmethod
+    def fingerprint(dependencies):
+        """Combine named dependency hashes (or plain configuration values) into one fingerprint."""
+        return hash_config(dependencies)
+
+    def _result_path(self, name):
+        safe = "".join(ch if ch.isalnum() or ch in '-_.' else '_' for ch in name)
+        return os.path.join(self.directory, f"{safe}.pkl")
+
+    def _save_manifest(self):
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    def is_fresh(self, name, dependencies):
+        entry = self.manifest['results'].get(name)
+        return (entry is not None and entry['fingerprint'] == self.fingerprint(dependencies)
+                and os.path.exists(self._result_path(name)))
+
+    def load(self, name):
+        with open(self._result_path(name), 'rb') as f:
+            return pickle.load(f)
+
+    def store(self, name, dependencies, result):
+        with open(self._result_path(name), 'wb') as f:
+            pickle.dump(result, f)
+        self.manifest['results'][name] = {'fingerprint': self.fingerprint(dependencies),
+                                          'dependencies': dependencies}
+        self._save_manifest()
+
+    def cached(self, name, dependencies, compute):
+        """
+        Return the stored result of `name` if its dependencies are unchanged, else compute it.
+
+        Args:
+            name (str): Result name, e.g. "grid_5/boundary/mwpm".
+            dependencies (dict): Named hashes and configuration values the result depends on.
+            compute (callable): Called without arguments when the result must be (re)computed.
+
+        Returns:
+            tuple: (result, recomputed)
+        """
+        if self.is_fresh(name, dependencies):
+            return self.load(name), False
+        result = compute()
+        self.store(name, dependencies, result)
+        return result, True
@@ -0,0 +1,132 @@
+from functools import lru_cache
+from types import MappingProxyType
+
+
+@lru_cache(maxsize=None)
+def get_layout(kind, size):
+    """
+    Describe one of the qubit layouts used in this project.
+
+    All layouts place qubits on a row-major grid with a checkerboard pattern: qubits with
+    (row + col) odd are syndrome qubits, Z-type on even rows and X-type on odd rows.
+
+    Args:
+        kind (str): 'square' for the grid x grid layout of `utils.apply_stabilizers`,
+            'strip' for the 3-column layout of `circuits.build_strip_circuit`,
+            'patches' for grid x grid patches side by side, one gap column apart
+            (`circuits.build_patch_circuit`).
+        size: Grid size for 'square', code distance for 'strip', and
+            (grid, n_patches, merged) for 'patches': split patches leave the gap columns idle
+            and measure every patch on its own, merged patches measure the whole grid as one
+            code, including the stabilizers across the gaps.
+
+    Returns:
+        dict: Layout description. The result is cached and shared, do not modify it.
+    """
+    if kind == 'square':
+        n_rows, n_cols = size, size
+    elif kind == 'strip':
+        n_rows, n_cols = 2 * size + 1, 3
+    elif kind == 'patches':
+        grid, n_patches, merged = size
+        n_rows, n_cols = grid, n_patches * (grid + 1) - 1
+    else:
+        raise ValueError(f"Unknown layout kind: {kind}")
+
+    def region(c):
+        """Patch of column c (None for a gap column of split patches), 0 for single-patch layouts."""
+        if kind != 'patches' or merged:
+            return 0
+        return c // (grid + 1) if c % (grid + 1) < grid else None
+
+    data_qubits = []
+    syndrome_qubits = []
+    stabilizer_map = {}
+    stabilizer_type = {}
+
+    for r in range(n_rows):
+        for c in range(n_cols):
+            idx = r * n_cols + c
+            if region(c) is None:
+                continue
+            if (r + c) % 2 == 0:
+                data_qubits.append(idx)
+                continue
+
+            syndrome_qubits.append(idx)
+            # same neighbour order as utils.apply_stabilizers
+            if r % 2 == 0:
+                stabilizer_type[idx] = 'Z'
+                candidates = [(r, c - 1), (r, c + 1), (r - 1, c), (r + 1, c)]
+            else:
+                stabilizer_type[idx] = 'X'
+                candidates = [(r + 1, c), (r - 1, c), (r, c - 1), (r, c + 1)]
+            stabilizer_map[idx] = tuple(nr * n_cols + nc for nr, nc in candidates
+                                        if 0 <= nr < n_rows and 0 <= nc < n_cols and region(nc) == region(c))
+
+    # The square grid measures stabilizers in row-major order, the strip measures
+    # all Z stabilizers of a round before all X stabilizers.
+    if kind == 'strip':
+        measurement_order = ([s for s in syndrome_qubits if stabilizer_type[s] == 'Z'] +
+                             [s for s in syndrome_qubits if stabilizer_type[s] == 'X'])
+    else:
+        measurement_order = list(syndrome_qubits)
+
+    layout = {
+        'kind': kind,
+        'size': size,
+        'n_rows': n_rows,
+        'n_cols': n_cols,
+        'data_qubits': data_qubits,
+        'syndrome_qubits': measurement_order,
+        'stabilizer_map': MappingProxyType(stabilizer_map),
+        'stabilizer_type': MappingProxyType(stabilizer_type),
+        # first column of data qubits (crossed once by every X error chain)
+        'logical_z': [q for q in data_qubits if q % n_cols == 0],
+        # first row of data qubits (crossed once by every Z error chain)
+        'logical_x': [q for q in data_qubits if q < n_cols],
+    }
+    if kind == 'patches':
+        # logical operators of every patch, whether or not the patches are currently merged
+        layout['patch_logical_z'] = [[r * n_cols + j * (grid + 1) for r in range(0, n_rows, 2)]
+                                     for j in range(n_patches)]
+        layout['patch_logical_x'] = [[j * (grid + 1) + c for c in range(0, grid, 2)] for j in range(n_patches)]
+    return layout
+
+
+def stabilizer_adjacency(layout, stab_type):
+    """
+    Spatial matching edges between stabilizers of one type.
+
+    Two stabilizers of the same type are adjacent when they share a data qubit; a data qubit
+    touched by a single stabilizer of that type gives that stabilizer an edge to the boundary.
+    The result is computed once per layout.
+
+    Args:
+        layout (dict): Layout returned by `get_layout`.
+        stab_type (str): 'Z' or 'X'.
+
+    Returns:
+        list: (stabilizer, other stabilizer or None for the boundary, data qubit) tuples.
+    """
+    return _stabilizer_adjacency(layout['kind'], layout['size'], stab_type)
+
+
+@lru_cache(maxsize=None)
+def _stabilizer_adjacency(kind, size, stab_type):
+    layout = get_layout(kind, size)
+    touching = {}
+    for s in layout['syndrome_qubits']:
+        if layout['stabilizer_type'][s] != stab_type:
+            continue
+        for q in layout['stabilizer_map'][s]:
+            touching.setdefault(q, []).append(s)
+
+    edges = []
+    for q in sorted(touching):
+        stabs = touching[q]
+        if len(stabs) == 1:
+            edges.append((stabs[0], None, q))
+        else:
+            edges.append((stabs[0], stabs[1], q))
+    return tuple(edges)
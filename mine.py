@@ -1,4 +1,3 @@
-from qiskit import QuantumCircuit
 import matplotlib.pyplot as plt
 from dotenv import load_dotenv
 import os
@@ -6,7 +5,8 @@ import networkx as nx
 import pickle
 from qiskit.visualization import circuit_drawer
 
-from utils import apply_stabilizers, run_on_ibm, run_on_simulator, calculate_error_statistics, plot_error_stats
+from circuits import build_square_circuit
+from utils import run_on_ibm, run_on_simulator, calculate_error_statistics, plot_error_stats
 from utils import process_detection_events, build_mwpm_graph, apply_mwpm, inject_random_errors
 
 load_dotenv()
@@ -21,40 +21,7 @@ for trial in range(NUM_TRIALS):
     grid = 3
     n_rounds = 4
 
-    if grid % 2 != 1:
-        raise ValueError("Grid size must be an odd number")
-
-    n_data = (grid ** 2)//2 + 1
-    n_syndrome = (grid ** 2) - n_data
-
-    data_qubits = list(range(grid**2))
-
-    qc = QuantumCircuit(n_data + n_syndrome, (n_syndrome * n_rounds) + grid**2)
-
-    stabilizer_map = {}
-
-    # Initialize the qubits
-    for i in range(grid**2):
-        if i % 2 == 0:
-            qc.initialize([1, 0], i)
-        else:
-            stabilizer_map[i] = []
-
-    classical_bits = 0
-
-    classical_bits, stabilizer_map = apply_stabilizers(qc, grid, classical_bits, stabilizer_map)
-
-    # qc = inject_random_errors(qc, grid, error_prob=0.1)  # After initialization, before stabilizers
-
-    for _ in range(n_rounds - 1):
-        classical_bits, stabilizer_map = apply_stabilizers(qc, grid, classical_bits, stabilizer_map)
-
-    # iterate from (n_syndrome * n_rounds) till grid**2 to measure the grid qubits
-    c = n_syndrome * n_rounds
-    for i in range(grid**2):
-        # print(f"Measuring qubit {i} onto classical bit {c}")
-        qc.measure(i, c)
-        c = c + 1
+    qc, stabilizer_map = build_square_circuit(grid, n_rounds)
 
     # plot the circuit
     fig = plt.figure(figsize=(12, 5), dpi=600)
@@ -62,11 +29,6 @@ for trial in range(NUM_TRIALS):
     fig.set_dpi(600)
     fig.savefig("circuit.png")
 
-    # iterate through the stabilizer map
-    # for k, v in stabilizer_map.items():
-    #     # the value is a list of connections, remove duplicates
-    #     stabilizer_map[k] = list(set(v))
-    #
     # print(stabilizer_map)
     #
     # if SIMULATION:
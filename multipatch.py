@@ -0,0 +1,313 @@
+"""
+Decoding of multi-patch circuits (`circuits.build_patch_circuit`) region by region.
+
+The detector graph of a multi-patch circuit spans every patch and every round, but it usually
+falls apart into independent regions: while patches are split no edge joins them, so each
+patch (and each stabilizer type) is its own connected component, and only merged stretches of
+rounds tie patches together. The graph is partitioned into connected components once per
+(patches, round modes, weights), every component gets its own shortest-path tables, and the
+components are matched concurrently in a process pool. Decoding k split patches therefore
+costs k single-patch decodings spread over the workers instead of one k-times larger matching.
+
+Detectors compare a stabilizer between consecutive rounds that measure it with the same
+support; at a merge or split the stabilizers whose support changes have no detector there. As in
+`decoder.memory_layers`, the Z stabilizers of the first round and, when the data qubits are read
+out, the Z stabilizers computed from that readout add an opening and a closing layer. Every
+stabilizer whose detectors start or stop (an open end of the experiment, or a merge or split
+changing its support) gets a time boundary there. The gap Z stabilizers have no opening
+detector at a merge: each of them is random on the merged code, only their product (the
+logical ZZ) is fixed. A patch fails when its corrected Z sector disagrees with the readout
+parity of its logical operator.
+
+    python multipatch.py check    (per-patch rates of a mirror-symmetric row agree)
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from circuits import patch_measurements
+from decoder import correction_qubits, match_detectors, memory_layers, shortest_path_tables, shots_to_bits
+from layout import get_layout
+
+
+def round_layout(grid, n_patches, measured):
+    """Layout of one round of `circuits.patch_measurements`, split or merged."""
+    return get_layout('patches', (grid, n_patches, measured['merged']))
+
+
+def patch_detectors(grid, n_patches, modes, stab_type, closing=False):
+    """
+    Detectors of one stabilizer type.
+
+    Layer 0 is the opening layer (first round alone), layer t + 1 compares rounds t and t + 1
+    and layer len(modes) is the closing layer (last round against the data readout), the
+    opening and closing layers only for the sectors `decoder.memory_layers` gives them.
+
+    Args:
+        closing (bool): The shots carry the data readout.
+
+    Returns:
+        list: (layer, syndrome qubit, classical bits whose parity is the detector).
+    """
+    measurements = patch_measurements(grid, n_patches, modes)
+    rounds = measurements['rounds']
+    layers = memory_layers(stab_type, closing)
+    detectors = []
+
+    if layers['opening']:
+        first = round_layout(grid, n_patches, rounds[0])
+        for s in first['syndrome_qubits']:
+            if first['stabilizer_type'][s] == stab_type:
+                detectors.append((0, s, (rounds[0]['clbits'][s],)))
+    for t in range(len(rounds) - 1):
+        before = round_layout(grid, n_patches, rounds[t])
+        after = round_layout(grid, n_patches, rounds[t + 1])
+        for s in after['syndrome_qubits']:
+            if (after['stabilizer_type'][s] == stab_type and s in before['stabilizer_map']
+                    and before['stabilizer_map'][s] == after['stabilizer_map'][s]):
+                detectors.append((t + 1, s, (rounds[t]['clbits'][s], rounds[t + 1]['clbits'][s])))
+    if layers['closing']:
+        last = round_layout(grid, n_patches, rounds[-1])
+        for s in last['syndrome_qubits']:
+            if last['stabilizer_type'][s] == stab_type:
+                data = tuple(measurements['data'][q] for q in last['stabilizer_map'][s])
+                detectors.append((len(rounds), s, (rounds[-1]['clbits'][s], *data)))
+    return detectors
+
+
+def patch_graph(grid, n_patches, modes, stab_type, time_weight=1.0, space_weight=1.0, boundary_weight=None,
+                closing=False):
+    """
+    Combined detector graph of all patches, in the format of `decoder.build_spacetime_graph`.
+
+    Returns:
+        dict: 'n_nodes', 'boundary', 'edges', 'weights', 'faults' and 'records'
+            (n_detectors, n_bits) 0/1, the classical bits whose parity is every detector.
+    """
+    if boundary_weight is None:
+        boundary_weight = space_weight
+    measurements = patch_measurements(grid, n_patches, modes, measure_data=closing)
+    rounds = measurements['rounds']
+    detectors = patch_detectors(grid, n_patches, modes, stab_type, closing)
+    index = {(t, s): i for i, (t, s, _) in enumerate(detectors)}
+    boundary = len(detectors)
+    layers = sorted({t for t, _, _ in detectors})
+
+    edges = []
+    weights = []
+    faults = []
+    for t in layers:
+        layout = round_layout(grid, n_patches, rounds[min(t, len(rounds) - 1)])
+        touching = {}
+        for s in layout['syndrome_qubits']:
+            if (t, s) in index:
+                for q in layout['stabilizer_map'][s]:
+                    touching.setdefault(q, []).append(index[(t, s)])
+        for q in sorted(touching):
+            nodes = touching[q]
+            edges.append((nodes[0], nodes[1] if len(nodes) > 1 else boundary))
+            weights.append(space_weight if len(nodes) > 1 else boundary_weight)
+            faults.append(q)
+
+    # a measurement error in round t flips the detectors of layers t and t + 1 reading it; where
+    # a stabilizer's detectors start or stop (an open end of the experiment, a merge or a split
+    # changing its support) only one of them exists and the error ends at the time boundary
+    for t, measured in enumerate(rounds):
+        layout = round_layout(grid, n_patches, measured)
+        for s in layout['syndrome_qubits']:
+            nodes = [index[key] for key in ((t, s), (t + 1, s)) if key in index]
+            if nodes:
+                edges.append((nodes[0], nodes[1] if len(nodes) > 1 else boundary))
+                weights.append(time_weight)
+                faults.append(-1)
+
+    records = np.zeros((len(detectors), measurements['n_bits']), dtype=np.uint8)
+    for i, (_, _, bits) in enumerate(detectors):
+        records[i, list(bits)] = 1
+    return {
+        'n_nodes': boundary + 1,
+        'boundary': boundary,
+        'edges': np.array(edges, dtype=np.intp).reshape(-1, 2),
+        'weights': np.array(weights, dtype=float),
+        'faults': np.array(faults, dtype=np.intp),
+        'records': records,
+    }
+
+
+def partition(graph):
+    """Connected components of the detectors, ignoring the shared boundary node: list of node arrays."""
+    parent = list(range(graph['boundary']))
+
+    def root(u):
+        while parent[u] != u:
+            parent[u] = parent[parent[u]]
+            u = parent[u]
+        return u
+
+    for u, v in graph['edges']:
+        if v != graph['boundary']:
+            parent[root(u)] = root(v)
+    roots = np.array([root(u) for u in range(graph['boundary'])], dtype=np.intp)
+    return [np.flatnonzero(roots == r) for r in np.unique(roots)]
+
+
+@lru_cache(maxsize=None)
+def region_tables(grid, n_patches, modes, stab_type, time_weight=1.0, space_weight=1.0, boundary_weight=None,
+                  closing=False):
+    """
+    Independent regions of the detector graph, computed once per configuration.
+
+    `modes` must be a tuple; `closing` as in `patch_graph`.
+
+    Returns:
+        tuple: One dict per region with 'nodes' (detector indices), 'records' and 'tables'
+            (`decoder.shortest_path_tables` of the region with its own boundary node).
+    """
+    graph = patch_graph(grid, n_patches, modes, stab_type, time_weight, space_weight, boundary_weight, closing)
+    regions = []
+    for nodes in partition(graph):
+        local = np.full(graph['n_nodes'], -1, dtype=np.intp)
+        local[nodes] = np.arange(len(nodes))
+        local[graph['boundary']] = len(nodes)
+        keep = local[graph['edges'][:, 0]] >= 0
+        sub = {
+            'n_nodes': len(nodes) + 1,
+            'edges': local[graph['edges'][keep]],
+            'weights': graph['weights'][keep],
+            'faults': graph['faults'][keep],
+        }
+        tables = shortest_path_tables(sub, ())
+        tables['boundary'] = len(nodes)
+        regions.append({'nodes': nodes, 'records': graph['records'][nodes], 'tables': tables})
+    return tuple(regions)
+
+
+def _decode_region(grid, n_patches, modes, stab_type, weights, closing, k, fired):
+    """Data qubits corrected in region k for every shot (rows of `fired`)."""
+    tables = region_tables(grid, n_patches, modes, stab_type, *weights, closing)[k]['tables']
+    return [correction_qubits(match_detectors(np.flatnonzero(row), tables), tables) for row in fired]
+
+
+def decode_patches(counts, grid, n_patches, modes, time_weight=1.0, space_weight=1.0, boundary_weight=None,
+                   workers=1, pool=None):
+    """
+    Decode a multi-patch circuit, all regions of both stabilizer types in parallel.
+
+    Args:
+        counts (dict): Bitstring -> frequency of `circuits.build_patch_circuit(grid, n_patches, modes)`.
+        workers (int): Processes started for the regions of this call, 1 decodes in-process.
+            Starting them (and rebuilding the region tables in every child) costs more than small
+            batches take to decode: repeated calls should share a `pool` instead.
+        pool (Executor): Caller-owned process pool for the regions, kept alive (with its
+            workers' cached `region_tables`) across calls; overrides `workers`.
+
+    Returns:
+        dict: 'freqs', 'logical_z' and 'logical_x' (n_shots, n_patches) parity of each patch's
+            logical operator under the correction, 'correction_flip_rate' (either correction
+            flips a patch's logical operator) per patch and 'regions' the number of independent
+            regions per stabilizer type. When the shots carry the data readout, also 'failed'
+            (n_shots, n_patches), the Z correction disagreeing with the readout parity of the
+            patch's logical Z, and its per-patch 'logical_error_rate' (the X sector has no
+            observable in a Z-basis readout).
+    """
+    modes = tuple(modes)
+    weights = (time_weight, space_weight, boundary_weight)
+    shots = list(counts.keys())
+    freqs = np.array([counts[shot] for shot in shots])
+    layout = get_layout('patches', (grid, n_patches, True))
+    bits = shots_to_bits(shots)
+    measurements = patch_measurements(grid, n_patches, modes)
+    closing = bits.shape[1] >= measurements['n_bits']
+
+    jobs = []
+    n_regions = {}
+    for stab_type in ('Z', 'X'):
+        regions = region_tables(grid, n_patches, modes, stab_type, *weights, closing)
+        n_regions[stab_type] = len(regions)
+        for k, region in enumerate(regions):
+            records = region['records'][:, :bits.shape[1]].astype(np.int64)
+            fired = ((bits.astype(np.int64) @ records.T) % 2).astype(np.uint8)
+            jobs.append((stab_type, (grid, n_patches, modes, stab_type, weights, closing, k, fired)))
+
+    if pool is not None:
+        futures = [(stab_type, pool.submit(_decode_region, *job)) for stab_type, job in jobs]
+        outcomes = [(stab_type, future.result()) for stab_type, future in futures]
+    elif workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as owned:
+            futures = [(stab_type, owned.submit(_decode_region, *job)) for stab_type, job in jobs]
+            outcomes = [(stab_type, future.result()) for stab_type, future in futures]
+    else:
+        outcomes = [(stab_type, _decode_region(*job)) for stab_type, job in jobs]
+
+    result = {'freqs': freqs, 'regions': n_regions}
+    total_shots = freqs.sum()
+    for stab_type, name in (('Z', 'logical_z'), ('X', 'logical_x')):
+        chains = [set(chain) for chain in layout[f'patch_{name}']]
+        flips = np.zeros((len(shots), n_patches), dtype=np.uint8)
+        for job_type, corrections in outcomes:
+            if job_type != stab_type:
+                continue
+            for n, corrected in enumerate(corrections):
+                for j, chain in enumerate(chains):
+                    flips[n, j] ^= len(corrected & chain) % 2
+        result[name] = flips
+    result['correction_flip_rate'] = freqs @ (result['logical_z'] | result['logical_x']) / total_shots
+
+    if closing:
+        data_bits = [[measurements['data'][q] for q in chain] for chain in layout['patch_logical_z']]
+        observed = np.stack([bits[:, chain].sum(axis=1) % 2 for chain in data_bits], axis=1).astype(np.uint8)
+        result['failed'] = result['logical_z'] ^ observed
+        result['logical_error_rate'] = freqs @ result['failed'] / total_shots
+    return result
+
+
+def check_symmetry(grid=3, n_patches=2, modes=('split', 'merged', 'merged', 'split'), p=0.003, shots=10000,
+                   seed=3, sigmas=4.0):
+    """
+    Check that mirror-image patches of a sampled row fail at the same rate.
+
+    The row of patches is symmetric under reflection, so patch j and patch n_patches - 1 - j
+    must agree within `sigmas` standard errors of their difference.
+
+    Returns:
+        list: Descriptions of the disagreeing patch pairs, empty when all pass.
+    """
+    from qiskit_aer import AerSimulator
+
+    from circuits import build_patch_circuit
+    from noise_models import noise_model
+
+    qc, _ = build_patch_circuit(grid, n_patches, modes)
+    simulator = AerSimulator(method='stabilizer', noise_model=noise_model(p=p), seed_simulator=seed)
+    counts = simulator.run(qc, shots=shots).result().get_counts()
+    rates = decode_patches(counts, grid, n_patches, modes)['logical_error_rate']
+    print(f"LOG - Per-patch logical error rates: {np.round(rates, 4).tolist()}")
+
+    failures = []
+    for j in range(n_patches // 2):
+        mirror = n_patches - 1 - j
+        pooled = (rates[j] + rates[mirror]) / 2
+        error = np.sqrt(2 * pooled * (1 - pooled) / shots)
+        if abs(rates[j] - rates[mirror]) > sigmas * error:
+            failures.append(f"patches {j} and {mirror}: {rates[j]:.4f} vs {rates[mirror]:.4f}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checks of the multi-patch decoder.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    check = sub.add_parser('check', help="Per-patch rates of a mirror-symmetric row agree")
+    check.add_argument('--grid', type=int, default=3)
+    check.add_argument('--patches', type=int, default=2)
+    check.add_argument('--modes', nargs='+', default=['split', 'merged', 'merged', 'split'])
+    check.add_argument('--p', type=float, default=0.003)
+    check.add_argument('--shots', type=int, default=10000)
+    args = parser.parse_args()
+
+    failures = check_symmetry(args.grid, args.patches, tuple(args.modes), args.p, args.shots)
+    for failure in failures:
+        print(f"FAILED {failure}")
+    print(f"LOG - {'ok' if not failures else f'{len(failures)} failures'}")
+    raise SystemExit(1 if failures else 0)
@@ -0,0 +1,320 @@
+"""
+Noise models for local simulation: device calibration snapshots and parametric circuit-level models.
+
+A calibration snapshot is the per-qubit T1/T2 and readout error and the per-gate error and
+duration of a backend at one moment (what `IBMstats.py` queries), stored as JSON under
+`stats/calibration` so simulations can be repeated against the same device state:
+
+    python noise_models.py snapshot --backend ibm_kyiv
+    python noise_models.py show stats/calibration/ibm_kyiv_20250301T120000.json
+    python noise_models.py check ibm_kyiv   (per-qubit noise of every pair, both CX directions)
+
+`snapshot_noise_model` turns a snapshot into an Aer `NoiseModel` with one channel per qubit and
+coupled pair: a depolarizing channel for the reported gate error plus the Pauli twirl of the
+thermal relaxation during the gate, and the qubit's readout error. Every channel is a Pauli
+channel, so the model stays usable with Aer's stabilizer method and Pauli-frame sampling.
+`p` rescales a snapshot so its mean two-qubit gate error is `p`, which turns one device
+profile into a threshold sweep. Aer samples per-qubit errors shot by shot, so snapshot models
+simulate one to two orders of magnitude slower than the all-qubit parametric ones.
+
+Parametric models ('uniform', 'si1000') are `circuit_export` noise dicts, valid for both stim
+and Aer. `noise_model` builds either kind once per (snapshot, p, model, physical qubits) and
+returns the cached model on every later call of a sweep.
+"""
+import argparse
+import glob
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from incremental import hash_config
+
+SNAPSHOT_DIR = os.path.join('stats', 'calibration')
+ONE_QUBIT_GATES = ['h', 'x', 'sx', 'id']
+TWO_QUBIT_GATES = ['cx', 'cz', 'ecr']
+
+_models = {}
+
+
+def calibration_snapshot(backend):
+    """
+    Calibration of a `Target`-based backend as a JSON-friendly dict.
+
+    Returns:
+        dict: 'backend', 'retrieved', 'num_qubits', 'qubits' (per qubit 't1', 't2' in seconds and
+            'readout' error, None when unknown) and 'gates' (name -> "q0,q1" -> {'error', 'duration'}).
+    """
+    target = backend.target
+    properties = target.qubit_properties or [None] * target.num_qubits
+    qubits = [{'t1': getattr(qubit, 't1', None), 't2': getattr(qubit, 't2', None), 'readout': None}
+              for qubit in properties]
+    gates = {}
+    for name in target.operation_names:
+        for qargs, instruction in target[name].items():
+            if not qargs or instruction is None:
+                continue
+            if name == 'measure':
+                qubits[qargs[0]]['readout'] = instruction.error
+            elif instruction.error is not None:
+                gates.setdefault(name, {})[','.join(map(str, qargs))] = {'error': instruction.error,
+                                                                          'duration': instruction.duration}
+    return {
+        'backend': getattr(backend, 'name', str(backend)),
+        'retrieved': datetime.now(timezone.utc).isoformat(),
+        'num_qubits': target.num_qubits,
+        'qubits': qubits,
+        'gates': gates,
+    }
+
+
+def save_snapshot(snapshot, directory=SNAPSHOT_DIR):
+    """Write a snapshot to `directory/<backend>_<time>.json` and return the path."""
+    stamp = datetime.fromisoformat(snapshot['retrieved']).strftime('%Y%m%dT%H%M%S')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{snapshot['backend']}_{stamp}.json")
+    with open(path, 'w') as f:
+        json.dump(snapshot, f, indent=1)
+    return path
+
+
+def load_snapshot(path):
+    """Snapshot from a JSON path, or the latest one saved for a backend name."""
+    if not os.path.exists(path):
+        saved = sorted(glob.glob(os.path.join(SNAPSHOT_DIR, f"{path}_*.json")))
+        if not saved:
+            raise FileNotFoundError(f"No calibration snapshot {path}")
+        path = saved[-1]
+    with open(path) as f:
+        return json.load(f)
+
+
+def _gate_table(snapshot, n_qubits):
+    """Per-qubit single-qubit and per-pair two-qubit (error, duration) of a snapshot."""
+    single = {}
+    for name in ('sx', 'x'):
+        for qargs, entry in snapshot['gates'].get(name, {}).items():
+            single.setdefault(int(qargs), (entry['error'], entry['duration']))
+    pairs = {}
+    for name in TWO_QUBIT_GATES:
+        for qargs, entry in snapshot['gates'].get(name, {}).items():
+            a, b = map(int, qargs.split(','))
+            pairs.setdefault((min(a, b), max(a, b)), (entry['error'], entry['duration']))
+    return single, pairs
+
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return float(np.mean(values)) if values else None
+
+
+def relaxation_paulis(t1, t2, duration, scale=1.0):
+    """Pauli twirl (p_x, p_y, p_z) of amplitude and phase damping over `duration`."""
+    if not t1 or not t2 or not duration:
+        return 0.0, 0.0, 0.0
+    t2 = min(t2, 2 * t1)
+    p_xy = scale * (1 - np.exp(-duration / t1)) / 4
+    p_z = max(scale * (1 - np.exp(-duration / t2)) / 2 - p_xy, 0.0)
+    return p_xy, p_xy, p_z
+
+
+def snapshot_noise_model(snapshot, p=None, physical_qubits=None):
+    """
+    Aer noise model of a calibration snapshot (see module docstring).
+
+    Args:
+        snapshot (dict): Result of `calibration_snapshot` or `load_snapshot`.
+        p (float): Rescale every error so the mean two-qubit gate error is `p`; None keeps the
+            calibrated values.
+        physical_qubits (list): Physical qubit of every circuit qubit (e.g. from
+            `hardware_layout.strip_layout`), defaults to circuit qubit i on physical qubit i.
+            Circuit pairs that are not coupled on the device get the mean two-qubit error as
+            a plain depolarizing channel.
+    """
+    from qiskit_aer.noise import NoiseModel, ReadoutError, depolarizing_error, pauli_error
+
+    n_physical = snapshot['num_qubits']
+    physical_qubits = list(range(n_physical)) if physical_qubits is None else list(physical_qubits)
+    single, pairs = _gate_table(snapshot, n_physical)
+    mean_pair = (_mean([e for e, _ in pairs.values()]), _mean([d for _, d in pairs.values()]))
+    scale = p / mean_pair[0] if p is not None and mean_pair[0] else 1.0
+    qubits = snapshot['qubits']
+
+    def channel(error, duration, physical):
+        """Depolarizing + twirled relaxation with total average infidelity `error` (scaled)."""
+        relax = [relaxation_paulis(qubits[q]['t1'], qubits[q]['t2'], duration, scale) for q in physical]
+        n = len(physical)
+        d = 2 ** n
+        p_relax = 1 - np.prod([1 - sum(paulis) for paulis in relax])
+        remainder = max(scale * (error or 0.0) - p_relax * d / (d + 1), 0.0)
+        combined = depolarizing_error(min(remainder * d / (d - 1), 1.0), n)
+        for k, paulis in enumerate(relax):
+            if sum(paulis):
+                labels = ['I' * (n - 1 - k) + pauli + 'I' * k for pauli in 'XYZ']
+                terms = [(label, prob) for label, prob in zip(labels, paulis)] + [('I' * n, 1 - sum(paulis))]
+                combined = combined.compose(pauli_error(terms))
+        return combined
+
+    model = NoiseModel()
+    for i, q in enumerate(physical_qubits):
+        error, duration = single.get(q, (None, None))
+        model.add_quantum_error(channel(error, duration, [q]), ONE_QUBIT_GATES, [i])
+        readout = qubits[q]['readout']
+        if readout:
+            e = min(scale * readout, 0.5)
+            model.add_readout_error(ReadoutError([[1 - e, e], [e, 1 - e]]), [i])
+
+    if mean_pair[0] is not None:
+        model.add_all_qubit_quantum_error(depolarizing_error(min(scale * mean_pair[0] * 4 / 3, 1.0), 2),
+                                          TWO_QUBIT_GATES)
+    index = {q: i for i, q in enumerate(physical_qubits)}
+    for (a, b), (error, duration) in pairs.items():
+        if a in index and b in index:
+            # error qubit k acts on the k-th gate qubit, so each direction gets its own channel;
+            # both override the mean all-qubit channel on purpose
+            for first, second in ((a, b), (b, a)):
+                model.add_quantum_error(channel(error, duration, [first, second]), TWO_QUBIT_GATES,
+                                        [index[first], index[second]], warnings=False)
+    return model
+
+
+def pauli_marginals(error):
+    """
+    Per-qubit Pauli probabilities of a Pauli `QuantumError`.
+
+    Returns:
+        np.ndarray: (n_qubits, 3) probability that error qubit k (0 = first gate qubit) suffers X, Y, Z.
+    """
+    from qiskit.quantum_info import Chi, pauli_basis
+
+    n = error.num_qubits
+    probabilities = np.real(np.diag(Chi(error.to_quantumchannel()).data)) / 2 ** n
+    marginals = np.zeros((n, 3))
+    for label, probability in zip(pauli_basis(n).to_labels(), probabilities):
+        for k, pauli in enumerate(reversed(label)):
+            if pauli != 'I':
+                marginals[k, 'XYZ'.index(pauli)] += probability
+    return marginals
+
+
+def toy_snapshot(n_qubits=4, seed=0):
+    """Snapshot of a line of `n_qubits` with random, distinct T1/T2 and gate errors, for `check_pair_noise`."""
+    rng = np.random.default_rng(seed)
+    t1 = rng.uniform(50e-6, 300e-6, n_qubits)
+    return {
+        'backend': 'toy',
+        'retrieved': datetime.now(timezone.utc).isoformat(),
+        'num_qubits': n_qubits,
+        'qubits': [{'t1': float(t), 't2': float(t * rng.uniform(0.5, 1.5)), 'readout': 0.01} for t in t1],
+        'gates': {
+            'sx': {str(q): {'error': 3e-4, 'duration': 35e-9} for q in range(n_qubits)},
+            'cx': {f"{q},{q + 1}": {'error': 8e-3, 'duration': 600e-9} for q in range(n_qubits - 1)},
+        },
+    }
+
+
+def check_pair_noise(snapshot, p=None):
+    """
+    Check that every coupled pair carries each qubit's own relaxation in both gate directions.
+
+    The channel of a CX on (b, a) must be that of (a, b) with its qubits swapped, and on both
+    the qubit with the shorter T1 must suffer the larger X marginal.
+
+    Returns:
+        list: Descriptions of the failed pairs, empty when all pass.
+    """
+    model = snapshot_noise_model(snapshot, p)
+    errors = model._local_quantum_errors['cx']
+    _, pairs = _gate_table(snapshot, snapshot['num_qubits'])
+    failures = []
+    for a, b in pairs:
+        forward = pauli_marginals(errors[(a, b)])
+        backward = pauli_marginals(errors[(b, a)])
+        if not np.allclose(forward, backward[::-1]):
+            failures.append(f"({a}, {b}): the two directions are not mirror images")
+        shorter = 0 if snapshot['qubits'][a]['t1'] < snapshot['qubits'][b]['t1'] else 1
+        if forward[shorter, 0] < forward[1 - shorter, 0] or backward[1 - shorter, 0] < backward[shorter, 0]:
+            failures.append(f"({a}, {b}): relaxation on the wrong qubit")
+    return failures
+
+
+def circuit_noise(p, model='uniform'):
+    """
+    Parametric circuit-level noise dict (`circuit_export` format) of strength `p`.
+
+    'uniform' puts `p` on every channel; 'si1000' is the superconducting-inspired model
+    (single-qubit gates p / 10, two-qubit gates p, resets 2p, measurements 5p).
+    """
+    if model == 'uniform':
+        from circuit_export import uniform_noise
+        return uniform_noise(p)
+    if model == 'si1000':
+        return {'p1': p / 10, 'p2': p, 'p_reset': 2 * p, 'p_meas': 5 * p}
+    raise ValueError(f"Unknown noise model: {model}")
+
+
+def noise_model(snapshot=None, p=None, model='uniform', physical_qubits=None):
+    """
+    Aer noise model, built once per (snapshot, p, model, physical qubits) and then cached.
+
+    Args:
+        snapshot (str or dict): Calibration snapshot (path, backend name or dict); None uses the
+            parametric `model` at strength `p`.
+    """
+    if isinstance(snapshot, str):
+        snapshot = load_snapshot(snapshot)
+    key = (hash_config(snapshot) if snapshot is not None else None, p, model,
+           tuple(physical_qubits) if physical_qubits is not None else None)
+    if key not in _models:
+        if snapshot is not None:
+            _models[key] = snapshot_noise_model(snapshot, p, physical_qubits)
+        else:
+            from circuit_export import aer_noise_model
+            _models[key] = aer_noise_model(circuit_noise(p, model))
+    return _models[key]
+
+
+def decoder_weights(snapshot):
+    """Time and space weights -log(p) from the mean readout and single-qubit gate errors, as in `IBMstats.py`."""
+    single, _ = _gate_table(snapshot, snapshot['num_qubits'])
+    p_meas = _mean([qubit['readout'] for qubit in snapshot['qubits']])
+    p_data = _mean([error for error, _ in single.values()])
+    return {'time_weight': float(-np.log(p_meas)), 'space_weight': float(-np.log(p_data))}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Store and inspect backend calibration snapshots.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    take = sub.add_parser('snapshot', help="Save the current calibration of an IBM backend")
+    take.add_argument('--backend', required=True)
+    take.add_argument('--instance', default="ibm-q/open/main")
+    show = sub.add_parser('show', help="Summarise a snapshot")
+    show.add_argument('snapshot', help="Snapshot path or backend name (latest snapshot)")
+    check = sub.add_parser('check', help="Check the per-qubit noise of every coupled pair in both directions")
+    check.add_argument('snapshot', nargs='?', default=None, help="Snapshot path or backend name (default: a toy line)")
+    args = parser.parse_args()
+
+    if args.command == 'snapshot':
+        from qiskit_ibm_runtime import QiskitRuntimeService
+
+        backend = QiskitRuntimeService(instance=args.instance).backend(args.backend)
+        print(f"LOG - Snapshot saved to {save_snapshot(calibration_snapshot(backend))}")
+    elif args.command == 'check':
+        failures = check_pair_noise(load_snapshot(args.snapshot) if args.snapshot else toy_snapshot())
+        for failure in failures:
+            print(f"FAILED {failure}")
+        print(f"LOG - {'ok' if not failures else f'{len(failures)} failures'}")
+        raise SystemExit(1 if failures else 0)
+    else:
+        snapshot = load_snapshot(args.snapshot)
+        single, pairs = _gate_table(snapshot, snapshot['num_qubits'])
+        print(f"LOG - {snapshot['backend']} ({snapshot['num_qubits']} qubits), retrieved {snapshot['retrieved']}")
+        print(f"Mean T1: {_mean([q['t1'] for q in snapshot['qubits']])}")
+        print(f"Mean T2: {_mean([q['t2'] for q in snapshot['qubits']])}")
+        print(f"Mean readout error: {_mean([q['readout'] for q in snapshot['qubits']])}")
+        print(f"Mean single-qubit gate error: {_mean([e for e, _ in single.values()])}")
+        print(f"Mean two-qubit gate error: {_mean([e for e, _ in pairs.values()])}")
+        weights = decoder_weights(snapshot)
+        print(f"Time weight: {weights['time_weight']}")
+        print(f"Space weight: {weights['space_weight']}")
@@ -0,0 +1,473 @@
+"""
+End-to-end command line pipeline: build -> run -> decode -> aggregate.
+
+    python pipeline.py build     --layout square --distances 3 5 7 --rounds 4
+    python pipeline.py run       --layout square --distances 3 5 7 --p 0.001 0.003 --backend stim
+    python pipeline.py run       --layout square --distances 3 5 7 --p 0.001 --backend stim --archive --shots 1000000
+    python pipeline.py run       --layout square --distances 3 5 --p 0.002 --backend aer --snapshot ibm_kyiv
+    python pipeline.py retrieve  --layout strip --session cygaq6wrta1g008v3k5g
+    python pipeline.py decode    --layout square --distances 3 5 7 --p 0.001 0.003 --decoder dem
+    python pipeline.py aggregate --layout square --distances 3 5 7 --p 0.001 0.003 --fit --check
+    python pipeline.py all       ...same options, every stage in turn
+    python pipeline.py all       --rounds 200 --decoder windowed --commit 3 --buffer 3  (long memory runs)
+
+Every stage writes one pickle per (layout, distance, rounds, p) point under --cache-dir
+(circuits/, counts/, decoded/, sweeps/) and skips points whose output already exists, so
+repeated runs only do new work; decoded points are also redone when their counts, decoder
+settings or decoder code change. --force recomputes. With --archive, stim and aer runs write
+bit-packed shot archives (archives/, see `shot_archive`) instead of counts pickles, and the
+decode stage reads a point's archive when it has one.
+"""
+import argparse
+import os
+import pickle
+
+import numpy as np
+
+import profiling
+from layout import get_layout
+
+STAGES = ['build', 'run', 'decode', 'aggregate']
+
+
+def layout_size(kind, distance):
+    """Size argument of `layout.get_layout` for a code distance ('square' grids are 2d - 1 wide)."""
+    return 2 * distance - 1 if kind == 'square' else distance
+
+
+def point_name(kind, distance, n_rounds, p=None):
+    name = f"{kind}_d{distance}_r{n_rounds}"
+    return name if p is None else f"{name}_p{p:g}"
+
+
+def cache_path(args, stage, name, extension='pkl'):
+    directory = os.path.join(args.cache_dir, stage)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{name}.{extension}")
+
+
+def is_cached(path, args):
+    if os.path.exists(path) and not args.force:
+        print(f"LOG - Cached {path}")
+        return True
+    return False
+
+
+def load(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def dump(obj, path):
+    with open(path, 'wb') as f:
+        pickle.dump(obj, f)
+
+
+def decoder_name(args):
+    """Name of the decoder settings in the decoded results and sweeps."""
+    return args.decoder
+
+
+def noise_of(p, model='uniform'):
+    from noise_models import circuit_noise
+    return circuit_noise(p, model) if p else None
+
+
+def build(args):
+    """Build and cache the circuit of every distance."""
+    from circuits import layout_circuit
+
+    for d in args.distances:
+        path = cache_path(args, 'circuits', point_name(args.layout, d, args.rounds))
+        if is_cached(path, args):
+            continue
+        print(f"LOG - Building {args.layout} circuit, distance {d}")
+        dump(layout_circuit(args.layout, layout_size(args.layout, d), args.rounds), path)
+
+
+def _aer_noise_model(args, p):
+    """Aer noise model of a point: the calibration snapshot rescaled to p, or parametric noise."""
+    from noise_models import noise_model
+    if args.snapshot:
+        return noise_model(args.snapshot, p or None)
+    return noise_model(p=p, model=args.noise_model) if p else None
+
+
+def _sampler(args, qc, layout, p):
+    """shots -> counts for the selected backend."""
+    if args.snapshot and args.backend != 'aer':
+        raise ValueError("Calibration snapshots need the aer backend")
+    if args.backend == 'stim':
+        from circuit_export import sample_counts
+        rng = np.random.default_rng(args.seed)
+        return lambda shots: sample_counts(qc, layout, args.rounds, noise_of(p, args.noise_model), shots,
+                                           seed=int(rng.integers(2 ** 32)))
+    if args.backend == 'aer':
+        from sampling import simulator_sampler
+        return simulator_sampler(qc, _aer_noise_model(args, p), seed=args.seed)
+    if args.backend == 'synthetic':
+        from sampling import synthetic_sampler
+        return synthetic_sampler(layout, args.rounds, p, seed=args.seed)
+    if args.backend == 'ibm':
+        from utils import run_on_ibm
+        return lambda shots: run_on_ibm(qc, shots)
+    raise ValueError(f"Unknown backend: {args.backend}")
+
+
+def _run_archive(args, circuit_path, layout, d, p, path):
+    """
+    Sample --shots shots of one point straight into its shot archive.
+
+    An archive of the same circuit holding fewer shots (an interrupted run) is topped up to
+    --shots; one of another circuit is sampled again.
+    """
+    from circuits import circuit_bit_map
+    from shot_archive import archive_header, check_header, open_archive, read_header, simulate_to_archive
+
+    if args.backend not in ('stim', 'aer') or args.rel_error:
+        raise ValueError("--archive samples a fixed number of shots on the stim or aer backend")
+    qc = load(circuit_path)
+    held = 0
+    if os.path.exists(path) and not args.force:
+        expected = archive_header(layout, args.rounds, qc.num_clbits, circuit_bit_map(qc, layout, args.rounds))
+        try:
+            check_header(read_header(path)[0], expected, path)
+            held = open_archive(path)['n_shots']
+        except ValueError as error:
+            print(f"LOG - Sampling again: {error}")
+    if held >= args.shots:
+        print(f"LOG - Cached {path}")
+        return
+    if held == 0 and os.path.exists(path):
+        os.remove(path)
+
+    shots = args.shots - held
+    resumed = f", resuming after {held} shots" if held else ""
+    print(f"LOG - Sampling distance {d}, p = {p:g} on {args.backend} into {path}{resumed}")
+    if args.backend == 'stim':
+        simulate_to_archive(qc, path, layout, args.rounds, shots, noise=noise_of(p, args.noise_model),
+                            seed=args.seed)
+    else:
+        simulate_to_archive(qc, path, layout, args.rounds, shots, backend='aer', seed=args.seed,
+                            noise_model=_aer_noise_model(args, p))
+
+
+def run(args):
+    """Sample every (distance, p) point, adaptively when --rel-error is given."""
+    from sampling import decoded_errors, sample_until_converged
+    from shared_pool import DecodePool
+
+    for d in args.distances:
+        circuit_path = cache_path(args, 'circuits', point_name(args.layout, d, args.rounds))
+        if args.backend != 'synthetic' and not os.path.exists(circuit_path):
+            build(argparse.Namespace(**{**vars(args), 'distances': [d], 'force': False}))
+        layout = get_layout(args.layout, layout_size(args.layout, d))
+
+        # the batches of every point of this distance share one set of decoding workers
+        pool = None
+        try:
+            for p in args.p:
+                name = point_name(args.layout, d, args.rounds, p)
+                if args.archive:
+                    _run_archive(args, circuit_path, layout, d, p, cache_path(args, 'archives', name, 'shots'))
+                    continue
+                path = cache_path(args, 'counts', name)
+                if is_cached(path, args):
+                    continue
+                qc = load(circuit_path) if args.backend != 'synthetic' else None
+                sample = _sampler(args, qc, layout, p)
+                print(f"LOG - Sampling distance {d}, p = {p:g} on {args.backend}")
+                if args.rel_error:
+                    if pool is None and args.workers > 1:
+                        pool = DecodePool(layout, args.rounds, args.workers)
+                    result = sample_until_converged(sample, decoded_errors(layout, args.rounds, pool=pool),
+                                                    rel_error=args.rel_error, batch_shots=args.shots,
+                                                    max_shots=args.max_shots)
+                    counts = result['counts']
+                else:
+                    counts = sample(args.shots)
+                dump(counts, path)
+        finally:
+            if pool is not None:
+                pool.close()
+
+
+def retrieve(args):
+    """Fetch the counts of finished IBM jobs (by --job or --session) into the counts cache."""
+    import qiskit.providers
+    from qiskit_ibm_runtime import QiskitRuntimeService
+
+    service = QiskitRuntimeService()
+    jobs = [service.job(job_id) for job_id in args.job] if args.job else []
+    if args.session:
+        jobs += service.jobs(session_id=args.session, limit=args.limit)
+
+    # distance from the key length, with or without the final data readout
+    distance_of_bits = {}
+    for d in range(2, 64):
+        layout = get_layout(args.layout, layout_size(args.layout, d))
+        n_syndrome_bits = len(layout['syndrome_qubits']) * args.rounds
+        distance_of_bits[n_syndrome_bits] = d
+        distance_of_bits[n_syndrome_bits + layout['n_rows'] * layout['n_cols']] = d
+
+    for job in jobs:
+        if job.status() != qiskit.providers.JobStatus.DONE:
+            print(f"LOG - Skipping job {job.job_id()} - status: {job.status()}")
+            continue
+        counts = job.result()[0].data.c.get_counts()
+        n_bits = len(next(iter(counts)).replace(' ', ''))
+        d = distance_of_bits.get(n_bits)
+        if d is None:
+            print(f"LOG - Skipping job {job.job_id()}: {n_bits} bits match no {args.layout} distance")
+            continue
+        # hardware points are filed under the first --p, the noise assumed when decoding them
+        path = cache_path(args, 'counts', point_name(args.layout, d, args.rounds, args.p[0]))
+        if is_cached(path, args):
+            continue
+        print(f"LOG - Job {job.job_id()}: distance {d}")
+        dump(counts, path)
+
+
+def decoded_store(args):
+    from incremental import ResultStore
+    return ResultStore(os.path.join(args.cache_dir, 'decoded'))
+
+
+def _shot_chunks(path, chunk_size):
+    """
+    Yield (shots, freqs, bit_map) chunks of a shot archive or a counts pickle.
+
+    Archive chunks are (n, n_bits) bit matrices with their stored gather indices, counts chunks
+    are counts dicts (bit_map None: `decoder.default_bit_map`).
+    """
+    from shot_archive import archive_bit_map, iter_unique_chunks, open_archive
+    from syndrome_history import iter_count_chunks
+
+    if path.endswith('.shots'):
+        archive = open_archive(path)
+        bit_map = archive_bit_map(archive['header'])
+        for bits, freqs in iter_unique_chunks(archive, chunk_size):
+            yield bits, freqs, bit_map
+    else:
+        for chunk_shots, freqs in iter_count_chunks(load(path), chunk_size):
+            yield dict(zip(chunk_shots, freqs.tolist())), freqs, None
+
+
+def _bits_counts(bits, freqs):
+    """Counts dict of distinct (n, n_bits) shots indexed by classical bit."""
+    keys = (bits[:, ::-1] + ord('0')).astype(np.uint8)
+    return {row.tobytes().decode(): int(freq) for row, freq in zip(keys, freqs)}
+
+
+def decode(args):
+    """
+    Decode every cached shot archive or counts file chunk by chunk.
+
+    A point is re-decoded only when its counts, layout, decoder settings or the decoder
+    source changed since it was last decoded (see `incremental.ResultStore`).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    import decoder
+    import error_model
+    import windowed
+    from decoder import decode_bits, decode_both_sectors
+    from incremental import hash_config, hash_layout, hash_source
+    from shared_pool import DecodePool
+    from windowed import decode_windowed
+
+    store = decoded_store(args)
+    source = hash_source(decoder, error_model, windowed)
+    # long-lived workers sharing the matching tables, built once per distance (per point for 'dem')
+    pool, pool_key = None, None
+    # the windowed decoder's workers only run window jobs, so one executor serves every point
+    window_pool = (ProcessPoolExecutor(max_workers=args.workers)
+                   if args.decoder == 'windowed' and args.workers > 1 else None)
+    try:
+        for d in args.distances:
+            layout = get_layout(args.layout, layout_size(args.layout, d))
+            for p in args.p:
+                name = point_name(args.layout, d, args.rounds, p)
+                counts_path = cache_path(args, 'archives', name, 'shots')
+                if not os.path.exists(counts_path):
+                    counts_path = cache_path(args, 'counts', name)
+                if not os.path.exists(counts_path):
+                    print(f"LOG - No counts for {name}, run the 'run' stage first")
+                    continue
+
+                noise = noise_of(p, args.noise_model) if args.decoder == 'dem' else None
+                dependencies = {
+                    'counts': store.hash_file(counts_path),
+                    'layout': hash_layout(layout),
+                    'decoder': hash_config({'decoder': args.decoder, 'noise': noise, 'rounds': args.rounds,
+                                            'window': [args.commit, args.buffer] if args.decoder == 'windowed' else None}),
+                    'source': source,
+                }
+                result_name = f"{decoder_name(args)}_{name}"
+                if store.is_fresh(result_name, dependencies) and not args.force:
+                    print(f"LOG - Unchanged {result_name}")
+                    continue
+
+                key = (d, p if noise else None)
+                if args.decoder != 'windowed' and args.workers > 1 and key != pool_key:
+                    if pool is not None:
+                        pool.close()
+                    pool, pool_key = DecodePool(layout, args.rounds, args.workers, noise=noise), key
+
+                errors = {'logical_z': 0, 'logical': 0}
+                shots = 0
+                print(f"LOG - Decoding {name} with the {args.decoder} decoder")
+                for chunk, freqs, bit_map in _shot_chunks(counts_path, args.chunk_size):
+                    if args.decoder == 'windowed':
+                        counts = chunk if bit_map is None else _bits_counts(chunk, freqs)
+                        result = decode_windowed(counts, layout, args.rounds, args.commit, args.buffer,
+                                                 bit_map=bit_map, pool=window_pool)
+                    elif bit_map is not None:
+                        result = (pool.decode_bits(chunk, freqs, bit_map) if pool is not None else
+                                  decode_bits(chunk, freqs, layout, args.rounds, bit_map, noise=noise))
+                    elif pool is not None:
+                        result = pool.decode_counts(chunk)
+                    else:
+                        result = decode_both_sectors(chunk, layout, args.rounds, workers=1, noise=noise)
+                    if 'failed' not in result:
+                        raise ValueError(f"{counts_path} has no data readout to count logical errors against")
+                    # only the Z sector is measured by the readout (`decoder.observed_flips`)
+                    errors['logical_z'] += int(freqs @ result['logical_z_failed'])
+                    errors['logical'] += int(freqs @ result['failed'])
+                    shots += int(freqs.sum())
+                store.store(result_name, dependencies,
+                            {'distance': d, 'p': p, 'shots': shots, 'errors': errors['logical'], **errors})
+    finally:
+        if pool is not None:
+            pool.close()
+        if window_pool is not None:
+            window_pool.shutdown()
+
+
+def distance_violations(results):
+    """
+    Points where a larger distance does not lower the logical error rate, at the lowest p.
+
+    Below threshold every distance step must suppress the rate; two points without any error
+    are not told apart.
+
+    Args:
+        results (dict): (distance, p) -> decoded point with 'errors' and 'shots'.
+
+    Returns:
+        list: (p, (d, rate), (next d, rate)) for every consecutive pair of distances that fails.
+    """
+    if not results:
+        return []
+    p = min(p for _, p in results)
+    rates = [(d, results[(d, p)]['errors'] / results[(d, p)]['shots'])
+             for d in sorted(d for d, q in results if q == p) if results[(d, p)]['shots']]
+    return [(p, low, high) for low, high in zip(rates, rates[1:]) if high[1] >= low[1] and high[1] > 0]
+
+
+def aggregate(args):
+    """Collect decoded points into a sweep file and optionally fit threshold and Lambda."""
+    from fitting import fit_sweep, save_sweep
+
+    store = decoded_store(args)
+    results = {}
+    for d in args.distances:
+        for p in args.p:
+            result_name = f"{decoder_name(args)}_{point_name(args.layout, d, args.rounds, p)}"
+            if result_name in store.manifest['results']:
+                results[(d, p)] = store.load(result_name)
+
+    path = cache_path(args, 'sweeps', f"{args.layout}_r{args.rounds}_{decoder_name(args)}")
+    save_sweep(results, path)
+    print(f"LOG - {len(results)} points saved to {path}")
+    for (d, p), result in sorted(results.items()):
+        print(f"d = {d}, p = {p:g}: {result['errors']}/{result['shots']} logical errors")
+
+    violations = distance_violations(results)
+    for p, (d1, rate1), (d2, rate2) in violations:
+        print(f"LOG - Warning: p = {p:g}: d = {d2} fails at {rate2:.3g}, not below d = {d1} at {rate1:.3g}")
+    if args.check and violations:
+        raise SystemExit(f"Logical error rate not suppressed by distance at p = {violations[0][0]:g}")
+
+    if args.fit and len({d for d, _ in results}) >= 2:
+        summary = fit_sweep(results, args.bootstrap, args.workers, args.seed)
+        print(f"p_th = {summary['p_th']:.5g}, nu = {summary['nu']:.3g}")
+        for p, lam in zip(summary['p'], summary['lambda']):
+            print(f"p = {p:.4g}: Lambda = {lam:.3g}")
+
+
+def run_all(args):
+    for stage in STAGES:
+        print(f"LOG - Stage {stage}")
+        COMMANDS[stage](args)
+
+
+COMMANDS = {'build': build, 'run': run, 'retrieve': retrieve, 'decode': decode, 'aggregate': aggregate,
+            'all': run_all}
+
+
+def parse_args(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--layout', choices=['square', 'strip'], default='square')
+    common.add_argument('--distances', type=int, nargs='+', default=[3, 5, 7])
+    common.add_argument('--rounds', type=int, default=4)
+    common.add_argument('--p', type=float, nargs='+', default=[0.001],
+                        help="Physical error rates (noise of the run, and of the 'dem' decoder)")
+    common.add_argument('--noise-model', choices=['uniform', 'si1000'], default='uniform',
+                        help="Parametric circuit noise of strength p (stim/aer runs and the 'dem' decoder)")
+    common.add_argument('--snapshot', default=None,
+                        help="Calibration snapshot (path or backend name) for aer runs, rescaled to p")
+    common.add_argument('--cache-dir', default='stats/pipeline')
+    common.add_argument('--force', action='store_true', help="Recompute cached outputs")
+    common.add_argument('--workers', type=int, default=2)
+    common.add_argument('--seed', type=int, default=None)
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('build', parents=[common], help="Build circuits")
+
+    sampling = argparse.ArgumentParser(add_help=False)
+    sampling.add_argument('--backend', choices=['stim', 'aer', 'synthetic', 'ibm'], default='stim')
+    sampling.add_argument('--shots', type=int, default=1024, help="Shots, or first batch with --rel-error")
+    sampling.add_argument('--rel-error', type=float, default=None, help="Sample adaptively to this precision")
+    sampling.add_argument('--max-shots', type=int, default=1_000_000)
+    sampling.add_argument('--archive', action='store_true',
+                          help="Write stim/aer shots to bit-packed archives instead of counts pickles")
+
+    decoding = argparse.ArgumentParser(add_help=False)
+    decoding.add_argument('--decoder', choices=['uniform', 'dem', 'windowed'], default='uniform')
+    decoding.add_argument('--commit', type=int, default=None, help="Windowed decoder: layers committed per window")
+    decoding.add_argument('--buffer', type=int, default=None, help="Windowed decoder: layers around each window")
+    decoding.add_argument('--chunk-size', type=int, default=4096, help="Distinct bitstrings per decoding chunk")
+
+    fitting = argparse.ArgumentParser(add_help=False)
+    fitting.add_argument('--fit', action='store_true', help="Fit threshold and Lambda")
+    fitting.add_argument('--bootstrap', type=int, default=100)
+    fitting.add_argument('--check', action='store_true',
+                         help="Fail when a larger distance does not lower the logical error rate at the lowest p")
+
+    subparsers.add_parser('run', parents=[common, sampling], help="Sample circuits")
+    retrieve_parser = subparsers.add_parser('retrieve', parents=[common], help="Fetch IBM job results")
+    retrieve_parser.add_argument('--job', nargs='+', default=[])
+    retrieve_parser.add_argument('--session', default=None)
+    retrieve_parser.add_argument('--limit', type=int, default=20)
+    subparsers.add_parser('decode', parents=[common, decoding], help="Decode cached counts")
+    subparsers.add_parser('aggregate', parents=[common, decoding, fitting], help="Collect and fit")
+    subparsers.add_parser('all', parents=[common, sampling, decoding, fitting], help="Every stage")
+    args = parser.parse_args(argv)
+    # points of other noise models are cached next to the uniform ones
+    if args.snapshot:
+        args.cache_dir = os.path.join(args.cache_dir, os.path.splitext(os.path.basename(args.snapshot))[0])
+    elif args.noise_model != 'uniform':
+        args.cache_dir = os.path.join(args.cache_dir, args.noise_model)
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    profile_path = profiling.enable_from_env()
+    COMMANDS[args.command](args)
+    if profile_path:
+        profiling.export(profile_path)
+        print(f"LOG - Stage profile saved to {profile_path}")
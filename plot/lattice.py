@@ -0,0 +1,152 @@
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection, PathCollection
+from matplotlib.path import Path
+
+Z_COLOR = '#4BB96F'
+X_COLOR = '#FEE02F'
+
+
+def lattice_shape(geometry, distance):
+    """(n_rows, n_cols) of the 'square' grid or the 3-column 'strip' at a given code distance."""
+    if geometry == 'square':
+        return 2 * distance - 1, 2 * distance - 1
+    if geometry == 'strip':
+        return 2 * distance + 1, 3
+    raise ValueError(f"Unknown geometry: {geometry}")
+
+
+def lattice_sites(n_rows, n_cols):
+    """
+    Grid positions of the lattice as arrays.
+
+    Rows run along x and columns along y with half-unit spacing, as in the other plot scripts.
+    Qubits with (row + col) even are data qubits, the others are Z stabilizers on even rows and
+    X stabilizers on odd rows.
+
+    Returns:
+        dict: 'rows', 'cols', 'xy' (n, 2), 'data' and 'z'/'x' boolean masks.
+    """
+    rows, cols = np.divmod(np.arange(n_rows * n_cols), n_cols)
+    data = (rows + cols) % 2 == 0
+    return {
+        'rows': rows,
+        'cols': cols,
+        'xy': np.column_stack([rows / 2, cols / 2]),
+        'data': data,
+        'z': ~data & (rows % 2 == 0),
+        'x': ~data & (rows % 2 == 1),
+    }
+
+
+def plaquette_collection(xy, color, arm=1.0, thickness=0.2, alpha=0.9, zorder=1):
+    """All "+"-shaped stabilizer plaquettes centred on `xy` as a single compound path."""
+    xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+    half_arm, half_thick = arm / 2, thickness / 2
+    horizontal = np.array([[-half_arm, -half_thick], [half_arm, -half_thick],
+                           [half_arm, half_thick], [-half_arm, half_thick]])
+    # same winding as the horizontal arm, so the overlap is filled once
+    vertical = horizontal[::-1, ::-1]
+    verts = np.concatenate([xy[:, None, :] + horizontal, xy[:, None, :] + vertical])
+    path = Path.make_compound_path_from_polys(verts)
+    return PathCollection([path], facecolors=color, edgecolors='none', alpha=alpha, zorder=zorder)
+
+
+def circle_markers(ax, xy, radius=0.1, facecolor='black', edgecolor=None, linewidth=0, zorder=3):
+    """
+    Circles with a data-space radius centred on `xy`, drawn as the markers of a single line.
+
+    The marker size is derived from the current axis limits, so set them (and the aspect) first.
+    """
+    xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+    ax.apply_aspect()
+    x_min, x_max = ax.get_xlim()
+    points_per_unit = ax.get_window_extent().width / (x_max - x_min) * 72 / ax.figure.dpi
+    return ax.plot(xy[:, 0], xy[:, 1], linestyle='none', marker='o', markersize=2 * radius * points_per_unit,
+                   markerfacecolor=facecolor, markeredgecolor=edgecolor if edgecolor else facecolor,
+                   markeredgewidth=linewidth, zorder=zorder)[0]
+
+
+def chain_segments(qubits, orientation='auto', half_length=0.5):
+    """
+    Line segments drawn through the data qubits of a logical chain.
+
+    Args:
+        qubits: (row, col) grid positions.
+        orientation (str): 'x', 'y' or 'auto' (along x on even rows, along y on odd rows).
+    """
+    qubits = np.asarray(qubits, dtype=float).reshape(-1, 2)
+    xy = qubits / 2
+    if orientation == 'auto':
+        along_x = qubits[:, 0] % 2 == 0
+    else:
+        along_x = np.full(len(qubits), orientation == 'x')
+    offset = np.where(along_x[:, None], [half_length, 0.0], [0.0, half_length])
+    return np.stack([xy - offset, xy + offset], axis=1)
+
+
+def render_lattice(n_rows, n_cols, ax=None, stabilizer_types=('Z', 'X'), removed=(), chains=(),
+                   data_zorder=2, stabilizer_zorder=3, limits=None):
+    """
+    Draw a surface code lattice with a handful of collection calls.
+
+    Args:
+        n_rows, n_cols (int): Grid dimensions.
+        ax: Axis to draw into, a new 8x8 figure is created when omitted.
+        stabilizer_types: Which stabilizer types to draw.
+        removed: (row, col) positions of stabilizers to leave out.
+        chains: Logical chains as dicts with 'qubits' ((row, col) list), 'color' and optionally
+            'orientation' (see `chain_segments`), 'radius' and 'linewidth'.
+        limits: Optional ((x_min, x_max), (y_min, y_max)); circle sizes are derived from the
+            limits, so change them here rather than after rendering.
+
+    Returns:
+        The axis.
+    """
+    if ax is None:
+        _, ax = plt.subplots(figsize=(8, 8))
+    if limits is None:
+        limits = ((-0.5, (n_rows - 1) / 2 + 0.5), (-0.5, (n_cols - 1) / 2 + 0.5))
+    ax.set_xlim(*limits[0])
+    ax.set_ylim(*limits[1])
+    ax.set_aspect('equal')
+    ax.axis('off')
+
+    sites = lattice_sites(n_rows, n_cols)
+    keep = np.ones(n_rows * n_cols, dtype=bool)
+    if len(removed):
+        removed = np.asarray(removed).reshape(-1, 2)
+        keep[removed[:, 0] * n_cols + removed[:, 1]] = False
+
+    stabilizers = np.zeros_like(keep)
+    for stype, color in (('Z', Z_COLOR), ('X', X_COLOR)):
+        if stype not in stabilizer_types:
+            continue
+        mask = sites[stype.lower()] & keep
+        stabilizers |= mask
+        ax.add_collection(plaquette_collection(sites['xy'][mask], color), autolim=False)
+
+    for chain in chains:
+        segments = chain_segments(chain['qubits'], chain.get('orientation', 'auto'))
+        ax.add_collection(LineCollection(segments, colors=chain['color'], linewidths=chain.get('linewidth', 6),
+                                         zorder=4), autolim=False)
+        circle_markers(ax, segments.mean(axis=1), chain.get('radius', 0.13), chain['color'], zorder=4)
+
+    circle_markers(ax, sites['xy'][sites['data']], 0.1, 'white', 'black', 2, zorder=data_zorder)
+    circle_markers(ax, sites['xy'][stabilizers], 0.1, 'black', zorder=stabilizer_zorder)
+    return ax
+
+
+def save_lattice(path, geometry, distance, **kwargs):
+    """Render the lattice of a layout to `path`; the extension picks the format (.pdf/.svg are vector)."""
+    n_rows, n_cols = lattice_shape(geometry, distance)
+    # 8 inches for the longer side up to d = 5, growing linearly beyond but capped for raster output
+    inches = min(8 * max(1.0, max(n_rows, n_cols) / 9), 24)
+    fig, ax = plt.subplots(figsize=(inches * n_rows / max(n_rows, n_cols), inches * n_cols / max(n_rows, n_cols)))
+    render_lattice(n_rows, n_cols, ax=ax, **kwargs)
+    fig.savefig(path)
+    plt.close(fig)
+
+
+if __name__ == "__main__":
+    save_lattice("surface_code_lattice.pdf", 'square', 51)
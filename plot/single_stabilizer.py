@@ -1,62 +1,43 @@
+import numpy as np
 import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
+
+from lattice import Z_COLOR, X_COLOR, plaquette_collection, circle_markers
 
 def plot_stabilizers(grid_size, stabilizer_type_to_plot):
     # Create a figure and axis
     fig, ax = plt.subplots(figsize=(8, 8))
 
-    # Generate stabilizer positions (integer coordinates)
-    stabilizer_positions = [(i, j) for i in range(grid_size) for j in range(grid_size)]
-
-    # Generate data qubit positions (midpoints between stabilizers)
-    data_horizontal = [(i + 0.5, j) for i in range(grid_size - 1) for j in range(grid_size)]
-    data_vertical = [(i, j + 0.5) for i in range(grid_size) for j in range(grid_size - 1)]
-    data_qubits = set(data_horizontal + data_vertical)
-
-    # Define stabilizer types (checkerboard pattern: Z for even i+j, X for odd i+j)
-    stabilizer_types = {}
-    for i, j in stabilizer_positions:
-        stabilizer_types[(i, j)] = 'X' if (i + j) % 2 == 0 else 'Z'
-
-    # Plot colored "+"-shaped regions for stabilizers of the specified type
-    for (i, j) in stabilizer_positions:
-        stype = stabilizer_types[(i, j)]
-        if stype == stabilizer_type_to_plot:
-            color = '#4BB96F' if stype == 'Z' else '#FEE02F'
-            alpha = 0.9  # Transparency for overlapping regions
-
-            # Horizontal arm of the "+" (covers left/right data qubits)
-            ax.add_patch(Rectangle(
-                (i - 0.5, j - 0.1), 1.0, 0.2,  # Position (x, y), width, height
-                facecolor=color, alpha=alpha, edgecolor=None, zorder=1
-            ))
-
-            # Vertical arm of the "+" (covers top/bottom data qubits)
-            ax.add_patch(Rectangle(
-                (i - 0.1, j - 0.5), 0.2, 1.0,  # Position (x, y), width, height
-                facecolor=color, alpha=alpha, edgecolor=None, zorder=1
-            ))
-
-    # Plot data qubits (white circles)
-    for (x, y) in data_qubits:
-        ax.add_patch(plt.Circle((x, y), radius=0.1, color='white', ec='black', lw=2, zorder=2))
-
-    # Plot stabilizers (black circles)
-    for (i, j) in stabilizer_positions:
-        if stabilizer_types[(i, j)] == stabilizer_type_to_plot:
-            ax.add_patch(plt.Circle((i, j), radius=0.1, color='black', zorder=3))
-
-    # Adjust axis limits and appearance
+    # Fix the axis limits first: circle sizes are derived from them
     ax.set_xlim(-0.5, grid_size - 0.5)
     ax.set_ylim(-0.5, grid_size - 0.5)
-
     ax.set_aspect('equal')
     plt.axis('off')
 
+    # Generate stabilizer positions (integer coordinates)
+    i, j = np.divmod(np.arange(grid_size ** 2), grid_size)
+
+    # Generate data qubit positions (midpoints between stabilizers)
+    hi, hj = np.divmod(np.arange((grid_size - 1) * grid_size), grid_size)
+    vi, vj = np.divmod(np.arange(grid_size * (grid_size - 1)), grid_size - 1) if grid_size > 1 else ([], [])
+    data_qubits = np.concatenate([np.column_stack([hi + 0.5, hj]), np.column_stack([vi, np.add(vj, 0.5)])])
+
+    # Stabilizer types follow a checkerboard pattern: X for even i+j, Z for odd i+j
+    is_x = (i + j) % 2 == 0
+    selected = is_x if stabilizer_type_to_plot == 'X' else ~is_x
+    stabilizers = np.column_stack([i, j])[selected]
+
+    # Colored "+"-shaped regions for all stabilizers of the specified type in one collection
+    color = Z_COLOR if stabilizer_type_to_plot == 'Z' else X_COLOR
+    ax.add_collection(plaquette_collection(stabilizers, color), autolim=False)
+
+    # Data qubits (white circles) and stabilizers (black circles)
+    circle_markers(ax, data_qubits, 0.1, 'white', 'black', 2, zorder=2)
+    circle_markers(ax, stabilizers, 0.1, 'black', zorder=3)
+
     plt.savefig(f"surface_code_plot_{stabilizer_type_to_plot}.png", dpi=300, bbox_inches="tight")
     plt.close()
     # plt.show()
 
 # Example usage:
 # plot_stabilizers(grid_size=1, stabilizer_type_to_plot='Z')  # For Z-stabilizers
-plot_stabilizers(grid_size=1, stabilizer_type_to_plot='X')  # For X-stabilizers
\ No newline at end of file
+plot_stabilizers(grid_size=1, stabilizer_type_to_plot='X')  # For X-stabilizers
@@ -0,0 +1,156 @@
+"""
+Headless figure rendering kept off the analysis hot path.
+
+Matching graphs are drawn at their lattice coordinates (row, col, round) instead of a spring
+layout: rounds are placed side by side, every edge goes into a single LineCollection and the
+boundary node sits to the left of the lattice. `PlotQueue` renders in a background process pool
+and can be disabled per run (SURFACE_PLOTS=0) without touching the calling code.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+def node_coordinates(node, n_cols=None):
+    """
+    Lattice coordinates (row, col, t) of a matching graph node, None for the boundary.
+
+    Accepts the "row,col,t" ids of `utils.build_mwpm_graph` and the (stabilizer, t) tuples of
+    `prova/michele.py` (which needs `n_cols` to split the stabilizer index).
+    """
+    if isinstance(node, str):
+        if node == 'boundary':
+            return None
+        row, col, t = map(int, node.split(','))
+        return row, col, t
+    s, t = node
+    if s < 0:
+        return None
+    row, col = divmod(s, n_cols)
+    return row, col, t
+
+
+def graph_arrays(G, n_cols=None, matching=()):
+    """
+    Flatten a networkx matching graph into picklable arrays for rendering.
+
+    Returns:
+        dict: 'xy' node positions, 'segments' (m, 2, 2) edge end points, 'weights' (m,),
+            'boundary_edge' (m,) bool and 'matched' (m,) bool.
+    """
+    coords = {node: node_coordinates(node, n_cols) for node in G.nodes()}
+    lattice = [c for c in coords.values() if c is not None]
+    width = (max(c[1] for c in lattice) + 2) if lattice else 1
+    height = max(c[0] for c in lattice) if lattice else 0
+
+    def position(node):
+        c = coords[node]
+        if c is None:
+            return -2.0, -height / 2
+        row, col, t = c
+        return col + t * width, -row
+
+    matched = {frozenset(pair) for pair in matching}
+    edges = list(G.edges(data='weight', default=1.0))
+    segments = np.array([[position(u), position(v)] for u, v, _ in edges], dtype=float).reshape(-1, 2, 2)
+    return {
+        'xy': np.array([position(node) for node in G.nodes()], dtype=float).reshape(-1, 2),
+        'is_boundary': np.array([coords[node] is None for node in G.nodes()], dtype=bool),
+        'segments': segments,
+        'weights': np.array([w for _, _, w in edges], dtype=float),
+        'boundary_edge': np.array([coords[u] is None or coords[v] is None for u, v, _ in edges], dtype=bool),
+        'matched': np.array([frozenset((u, v)) in matched for u, v, _ in edges], dtype=bool),
+    }
+
+
+def render_graph_arrays(arrays, path, title=None, dpi=150):
+    """Render the output of `graph_arrays` to `path` with the Agg backend (no pyplot state)."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.collections import LineCollection
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    segments = arrays['segments']
+    plain = ~arrays['boundary_edge'] & ~arrays['matched']
+    if plain.any():
+        lines = LineCollection(segments[plain], array=arrays['weights'][plain], cmap='viridis',
+                               linewidths=0.6, alpha=0.6, zorder=1)
+        ax.add_collection(lines)
+        fig.colorbar(lines, ax=ax, label='Edge weight')
+    boundary = arrays['boundary_edge'] & ~arrays['matched']
+    if boundary.any():
+        ax.add_collection(LineCollection(segments[boundary], colors='lightgrey', linewidths=0.4,
+                                         linestyles='dashed', zorder=0))
+    if arrays['matched'].any():
+        ax.add_collection(LineCollection(segments[arrays['matched']], colors='red', linewidths=2, zorder=2))
+
+    xy = arrays['xy']
+    ax.scatter(xy[~arrays['is_boundary'], 0], xy[~arrays['is_boundary'], 1], s=20, c='lightblue',
+               edgecolors='black', linewidths=0.5, zorder=3)
+    ax.scatter(xy[arrays['is_boundary'], 0], xy[arrays['is_boundary'], 1], s=60, c='black', marker='s', zorder=3)
+
+    ax.autoscale_view()
+    ax.set_aspect('equal')
+    ax.axis('off')
+    if title:
+        ax.set_title(title)
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+
+
+def save_matching_graph(G, path, n_cols=None, matching=(), title=None, dpi=150):
+    """Draw a matching graph synchronously at its lattice coordinates."""
+    render_graph_arrays(graph_arrays(G, n_cols, matching), path, title, dpi)
+
+
+class PlotQueue:
+    """
+    Background pool for figure rendering.
+
+    Figures are submitted as plain arrays and rendered by worker processes, so analysis never
+    waits on matplotlib. With `enabled=False` (or SURFACE_PLOTS=0) submissions are dropped.
+    Functions submitted with `submit` must be importable by the workers.
+    """
+
+    def __init__(self, workers=2, enabled=None):
+        if enabled is None:
+            enabled = os.getenv("SURFACE_PLOTS", "1") != "0"
+        self.enabled = enabled
+        self.workers = workers
+        self._pool = None
+        self._futures = []
+
+    def submit(self, func, *args, **kwargs):
+        if not self.enabled:
+            return None
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        future = self._pool.submit(func, *args, **kwargs)
+        self._futures.append(future)
+        return future
+
+    def matching_graph(self, G, path, n_cols=None, matching=(), title=None, dpi=150):
+        if not self.enabled:
+            return None
+        return self.submit(render_graph_arrays, graph_arrays(G, n_cols, matching), path, title, dpi)
+
+    def close(self):
+        """Wait for the pending figures and shut the pool down; re-raises rendering errors."""
+        if self._pool is None:
+            return
+        try:
+            for future in self._futures:
+                future.result()
+        finally:
+            self._pool.shutdown()
+            self._pool = None
+            self._futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,210 @@
+"""
+Lightweight per-stage instrumentation for the analysis pipeline.
+
+Stages are wrapped with `stage(name)` or `@profiled(name)`. While profiling is disabled (the
+default) both only check a flag, so they can stay in production code. Enable it with
+`enable()` or by setting SURFACE_PROFILE to an output path and calling `enable_from_env()`.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+_enabled = False
+_track_memory = False
+_records = []
+_local = threading.local()
+_origin = time.perf_counter()
+
+
+def enable(memory=True):
+    """Start recording stages; `memory` also tracks peak allocations per stage with tracemalloc."""
+    global _enabled, _track_memory
+    _enabled = True
+    _track_memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    global _enabled, _track_memory
+    _enabled = False
+    if _track_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _track_memory = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    _records.clear()
+
+
+def records():
+    return list(_records)
+
+
+def enable_from_env(variable="SURFACE_PROFILE"):
+    """Enable profiling when the environment variable is set; returns its value (the output path)."""
+    path = os.getenv(variable)
+    if path:
+        enable(memory=os.getenv(variable + "_MEMORY", "1") != "0")
+    return path
+
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+class _Frame:
+    __slots__ = ('name', 'counts', 'start', 'peak')
+
+    def __init__(self, name, counts):
+        self.name = name
+        self.counts = counts
+        self.start = 0.0
+        self.peak = 0
+
+    def count(self, **counts):
+        """Add item counts (events, edges, matched pairs, ...) to the running stage."""
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+
+
+class _NullFrame:
+    __slots__ = ()
+
+    def count(self, **counts):
+        pass
+
+
+_NULL_FRAME = _NullFrame()
+
+
+@contextmanager
+def stage(name, **counts):
+    """
+    Time a block of code as one pipeline stage.
+
+    The yielded object has a `count(**counts)` method to record item counts from inside the block.
+    """
+    if not _enabled:
+        yield _NULL_FRAME
+        return
+
+    frame = _Frame(name, dict(counts))
+    stack = _stack()
+    if _track_memory:
+        # the parent's peak so far would be lost by the reset
+        if stack:
+            stack[-1].peak = max(stack[-1].peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        frame.peak = tracemalloc.get_traced_memory()[0]
+        base = frame.peak
+    stack.append(frame)
+    frame.start = time.perf_counter()
+    try:
+        yield frame
+    finally:
+        end = time.perf_counter()
+        stack.pop()
+        record = {
+            'name': name,
+            'start': frame.start - _origin,
+            'duration': end - frame.start,
+            'counts': frame.counts,
+            'thread': threading.get_ident(),
+            'depth': len(stack),
+        }
+        if _track_memory:
+            peak = max(tracemalloc.get_traced_memory()[1], frame.peak)
+            record['peak_memory'] = peak - base
+            tracemalloc.reset_peak()
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+        _records.append(record)
+
+
+def profiled(name=None, counter=None):
+    """
+    Decorator version of `stage`.
+
+    Args:
+        name (str): Stage name, defaults to the function name.
+        counter (callable): Optional function mapping the return value to a dict of item counts.
+    """
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with stage(stage_name) as frame:
+                result = func(*args, **kwargs)
+                if counter is not None:
+                    frame.count(**counter(result))
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def summary():
+    """Aggregate the records per stage: calls, total/mean/max wall time, summed counts, peak memory."""
+    stages = {}
+    for record in _records:
+        entry = stages.setdefault(record['name'], {
+            'calls': 0, 'total': 0.0, 'max': 0.0, 'counts': {}, 'peak_memory': 0,
+        })
+        entry['calls'] += 1
+        entry['total'] += record['duration']
+        entry['max'] = max(entry['max'], record['duration'])
+        for key, value in record['counts'].items():
+            entry['counts'][key] = entry['counts'].get(key, 0) + value
+        entry['peak_memory'] = max(entry['peak_memory'], record.get('peak_memory', 0))
+    for entry in stages.values():
+        entry['mean'] = entry['total'] / entry['calls']
+    return stages
+
+
+def export_json(path):
+    with open(path, 'w') as f:
+        json.dump({'stages': summary(), 'records': _records}, f, indent=2)
+
+
+def export_chrome_trace(path):
+    """Write the records in the Chrome trace event format (chrome://tracing, Perfetto)."""
+    pid = os.getpid()
+    events = []
+    for record in _records:
+        args = dict(record['counts'])
+        if 'peak_memory' in record:
+            args['peak_memory'] = record['peak_memory']
+        events.append({
+            'name': record['name'],
+            'ph': 'X',
+            'ts': record['start'] * 1e6,
+            'dur': record['duration'] * 1e6,
+            'pid': pid,
+            'tid': record['thread'],
+            'args': args,
+        })
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+def export(path):
+    """Export to `path`: a Chrome trace if it ends with '.trace.json', a JSON summary otherwise."""
+    if path.endswith('.trace.json'):
+        export_chrome_trace(path)
+    else:
+        export_json(path)
@@ -0,0 +1,384 @@
+"""
+Regression corpus for the decoders: fixed syndrome cases, their expected decoding and baselines.
+
+A corpus holds, for one layout, distance and round count, memory experiment shots with the data
+readout (`synthetic.synthetic_memory`):
+    - every single fault (a data qubit error before a round or the readout, a flipped stabilizer
+      outcome, a flipped readout bit), with its true logical effect per sector, unknown where
+      another single fault has the same detectors and a different effect,
+    - phenomenological random shots at a few error rates, whose Z sector truth is the logical
+      flip measured by their data readout (`decoder.observed_flips`; the X sector is unobserved),
+together with what the reference decoder (full spacetime matching in `decoder`, with the
+opening and closing layers of `decoder.memory_layers`) returns for them: the logical flip and
+the corrected data qubits of each sector. Exact backends must agree with the reference on
+every case; every backend must decode at least its recorded share of the unambiguous single
+faults right, fail on at most a tolerance more random shots per error rate than the reference
+does, and stay within a factor of its recorded maximum per-shot decode time, so optimizations
+cannot silently change results. The default round count exceeds the windows of
+the streaming and windowed decoders, so their commits and buffers are exercised.
+
+    python regression.py generate --layouts square strip --sizes 5 7 --rounds 10
+    python regression.py check --backends matching pool streaming windowed
+    python regression.py check --failure-tolerance 0.1   (non-exact backends: at most 10% more failed shots)
+    python regression.py check --record            (store the current timings and accuracies as baselines)
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmark import git_commit
+from decoder import (correction_qubits, decode_fired, logical_flip, match_detectors, observed_flips,
+                     rounds_detectors, sector_tables)
+from layout import get_layout
+from synthetic import parity_check_matrix, rounds_to_counts, synthetic_memory
+
+CORPUS_DIR = os.path.join('stats', 'regression')
+DEFAULT_ROUNDS = 10
+
+
+def fault_cases(layout, n_rounds):
+    """
+    Syndrome rounds and data readout of every single fault.
+
+    X errors are placed before every round and before the readout, Z errors between rounds (a
+    Z error before the first round leaves the prepared |0> state unchanged and one after the
+    last round is not seen by the Z-basis readout).
+
+    Returns:
+        tuple: (rounds (n_cases, n_rounds, n_syndrome) uint8, data (n_cases, n_qubits) uint8,
+            labels, truth (n_cases, 2) true Z and X sector logical flips, -1 where ambiguous)
+    """
+    order = layout['syndrome_qubits']
+    n_syndrome = len(order)
+    n_qubits = layout['n_rows'] * layout['n_cols']
+    cases, readouts, labels, truth = [], [], [], []
+
+    def add(rounds, data, label, flips):
+        cases.append(rounds)
+        readouts.append(data)
+        labels.append(label)
+        truth.append(flips)
+
+    for stab_type, chain, error, times in (('Z', layout['logical_z'], 'X', range(n_rounds + 1)),
+                                           ('X', layout['logical_x'], 'Z', range(1, n_rounds))):
+        H = parity_check_matrix(layout, stab_type)
+        columns = [k for k, s in enumerate(order) if layout['stabilizer_type'][s] == stab_type]
+        for t in times:
+            for q in layout['data_qubits']:
+                rounds = np.zeros((n_rounds, n_syndrome), dtype=np.uint8)
+                rounds[t:, columns] = H[:, q]
+                data = np.zeros(n_qubits, dtype=np.uint8)
+                if error == 'X':
+                    data[q] = 1
+                flip = int(q in chain)
+                add(rounds, data, f"{error}{q}@{t}", (flip, 0) if stab_type == 'Z' else (0, flip))
+    for t in range(n_rounds):
+        for k, s in enumerate(order):
+            rounds = np.zeros((n_rounds, n_syndrome), dtype=np.uint8)
+            rounds[t, k] = 1
+            add(rounds, np.zeros(n_qubits, dtype=np.uint8), f"M{s}@{t}", (0, 0))
+    for q in layout['data_qubits']:
+        data = np.zeros(n_qubits, dtype=np.uint8)
+        data[q] = 1
+        add(np.zeros((n_rounds, n_syndrome), dtype=np.uint8), data, f"R{q}", (int(q in layout['logical_z']), 0))
+
+    rounds, data, truth = np.array(cases), np.array(readouts), np.array(truth, dtype=np.int8)
+    fired = rounds_detectors(rounds, layout, data)
+    for column, stab_type in enumerate(('Z', 'X')):
+        effects = {}
+        for nodes, flip in zip(fired[stab_type], truth[:, column]):
+            effects.setdefault(tuple(nodes), set()).add(int(flip))
+        for n, nodes in enumerate(fired[stab_type]):
+            if len(effects[tuple(nodes)]) > 1:
+                truth[n, column] = -1
+    return rounds, data, labels, truth
+
+
+def reference_decode(rounds, data, layout, n_rounds):
+    """
+    Full spacetime matching of every case.
+
+    Returns:
+        dict: 'logical_z', 'logical_x' (n_cases,) and 'corrections' {'Z': [...], 'X': [...]} with
+            the sorted corrected data qubits of every case.
+    """
+    fired = rounds_detectors(rounds, layout, data)
+    result = {'corrections': {}}
+    for stab_type, name in (('Z', 'logical_z'), ('X', 'logical_x')):
+        tables = sector_tables(layout['kind'], layout['size'], stab_type, n_rounds, closing=True)
+        flips, corrections = [], []
+        for nodes in fired[stab_type]:
+            pairs = match_detectors(nodes, tables)
+            flips.append(logical_flip(pairs, tables))
+            corrections.append(tuple(sorted(correction_qubits(pairs, tables))))
+        result[name] = np.array(flips, dtype=np.uint8)
+        result['corrections'][stab_type] = corrections
+    return result
+
+
+def fault_accuracy(logical_z, logical_x, truth):
+    """Share of the unambiguous (case, sector) single-fault outcomes decoded to their true logical flip."""
+    flips = np.stack([logical_z, logical_x], axis=1)
+    known = truth >= 0
+    return float((flips[known] == truth[known]).mean()) if known.any() else 1.0
+
+
+def generate_corpus(kind, size, n_rounds=DEFAULT_ROUNDS, shots=200, ps=(0.005, 0.02), seed=0):
+    """Build the corpus of one layout (see module docstring)."""
+    layout = get_layout(kind, size)
+    rounds, data, labels, truth = fault_cases(layout, n_rounds)
+    n_faults = len(rounds)
+    for i, p in enumerate(ps):
+        random_rounds, random_data = synthetic_memory(layout, n_rounds, shots, p, seed=seed + i)
+        rounds = np.concatenate([rounds, random_rounds])
+        data = np.concatenate([data, random_data])
+        labels += [f"random p={p:g}"] * shots
+        random_truth = np.full((shots, 2), -1, dtype=np.int8)
+        random_truth[:, 0] = observed_flips(random_data, layout)['Z']
+        truth = np.concatenate([truth, random_truth])
+
+    expected = reference_decode(rounds, data, layout, n_rounds)
+    groups = random_groups(labels, n_faults)
+    return {
+        'layout': (kind, size),
+        'n_rounds': n_rounds,
+        'rounds': rounds,
+        'data': data,
+        'labels': labels,
+        'truth': truth,
+        'n_faults': n_faults,
+        'expected': expected,
+        'accuracy': fault_accuracy(expected['logical_z'][:n_faults], expected['logical_x'][:n_faults],
+                                   truth[:n_faults]),
+        'failures': {label: int((expected['logical_z'][index] != truth[index, 0]).sum())
+                     for label, index in groups.items()},
+        'baselines': {},
+        'commit': git_commit(),
+        'created': datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def random_groups(labels, n_faults):
+    """Case indices of the random shots of every error rate, by label."""
+    groups = {}
+    for n in range(n_faults, len(labels)):
+        groups.setdefault(labels[n], []).append(n)
+    return {label: np.array(index) for label, index in groups.items()}
+
+
+def corpus_path(kind, size, n_rounds, directory=CORPUS_DIR):
+    return os.path.join(directory, f"{kind}_{size}_r{n_rounds}.pkl")
+
+
+def _counts_backend(decode):
+    """Adapt a decoder taking a counts dict to per-case outcomes."""
+    def run(rounds, data, layout, n_rounds):
+        counts = {}
+        keys = []
+        for shot_rounds, shot_data in zip(rounds, data):
+            (key,) = rounds_to_counts(shot_rounds[None], shot_data[None])
+            counts[key] = 1
+            keys.append(key)
+        result = decode(counts, layout, n_rounds)
+        row = {key: n for n, key in enumerate(counts)}
+        index = [row[key] for key in keys]
+        return result['logical_z'][index], result['logical_x'][index]
+    return run
+
+
+def _matching(rounds, data, layout, n_rounds):
+    result = decode_fired(rounds_detectors(rounds, layout, data), np.ones(len(rounds)), layout, n_rounds, workers=1,
+                          observed=observed_flips(data, layout))
+    return result['logical_z'], result['logical_x']
+
+
+def _streaming(rounds, data, layout, n_rounds):
+    from streaming import StreamingDecoder
+
+    decoder = StreamingDecoder(layout)
+    flips = np.zeros((len(rounds), 2), dtype=np.uint8)
+    for n, shot in enumerate(rounds):
+        for syndrome in shot:
+            decoder.push(syndrome)
+        result = decoder.finish(data[n])
+        flips[n] = result['logical_z'], result['logical_x']
+    return flips[:, 0], flips[:, 1]
+
+
+def _windowed(counts, layout, n_rounds):
+    from windowed import decode_windowed
+    return decode_windowed(counts, layout, n_rounds, workers=1)
+
+
+class _Pool:
+    """`shared_pool.DecodePool` backend, one pool per layout and round count kept across cases."""
+
+    def __init__(self, workers=2):
+        self.workers = workers
+        self.pools = {}
+
+    def __call__(self, rounds, data, layout, n_rounds):
+        from shared_pool import DecodePool
+
+        key = (layout['kind'], layout['size'], n_rounds)
+        if key not in self.pools:
+            self.pools[key] = DecodePool(layout, n_rounds, self.workers)
+        result = self.pools[key].decode_rounds(rounds, np.ones(len(rounds), dtype=np.int64), data=data)
+        return result['logical_z'], result['logical_x']
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.close()
+        self.pools = {}
+
+
+# name -> callable(rounds, data, layout, n_rounds) returning (logical_z, logical_x) per case
+BACKENDS = {
+    'matching': _matching,
+    'pool': _Pool(),
+    'streaming': _streaming,
+    'windowed': _counts_backend(_windowed),
+}
+# backends that run the reference's full matching and must reproduce it case by case; the
+# others decode windows of the experiment and are held to their single-fault accuracy
+EXACT = {'matching', 'pool'}
+
+
+def check_backend(corpus, backend, tolerance=3.0, repeats=3, failure_tolerance=0.1):
+    """
+    Decode every case of a corpus one shot at a time with a backend.
+
+    Args:
+        tolerance (float): Allowed factor over the recorded maximum per-shot time.
+        failure_tolerance (float): Allowed share of failures over the reference's on the random
+            shots of each error rate (plus one shot), for the backends outside `EXACT`.
+        repeats (int): Timings per shot; the fastest counts, so scheduler noise does not.
+
+    Returns:
+        dict: 'mismatches' (labels of cases whose logical outcome differs from the reference,
+            failing only `EXACT` backends), 'accuracy' on the unambiguous single faults and the
+            'min_accuracy' it must reach (the recorded baseline, else the reference's),
+            'failures' {label: (failed random shots, reference's, allowed)},
+            'max_shot_s', 'mean_shot_s', 'baseline' (or None) and 'passed'.
+    """
+    layout = get_layout(*corpus['layout'])
+    n_rounds = corpus['n_rounds']
+    decode = BACKENDS[backend]
+    expected = np.stack([corpus['expected']['logical_z'], corpus['expected']['logical_x']], axis=1)
+
+    # tables, pools and imports are built once, outside the timed shots
+    decode(corpus['rounds'][:1], corpus['data'][:1], layout, n_rounds)
+
+    times = np.empty(len(corpus['rounds']))
+    flips = np.empty((len(corpus['rounds']), 2), dtype=np.uint8)
+    for n, (rounds, data) in enumerate(zip(corpus['rounds'], corpus['data'])):
+        shot_times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            logical_z, logical_x = decode(rounds[None], data[None], layout, n_rounds)
+            shot_times.append(time.perf_counter() - start)
+        times[n] = min(shot_times)
+        flips[n] = logical_z[0], logical_x[0]
+    mismatches = [corpus['labels'][n] for n in np.flatnonzero(np.any(flips != expected, axis=1))]
+    n_faults = corpus['n_faults']
+    accuracy = fault_accuracy(flips[:n_faults, 0], flips[:n_faults, 1], corpus['truth'][:n_faults])
+    failures = {}
+    for label, index in random_groups(corpus['labels'], n_faults).items():
+        reference = corpus['failures'][label]
+        allowed = reference if backend in EXACT else int(reference * (1 + failure_tolerance)) + 1
+        failures[label] = (int((flips[index, 0] != corpus['truth'][index, 0]).sum()), reference, allowed)
+    too_many = any(failed > allowed for failed, _, allowed in failures.values())
+
+    baseline = corpus['baselines'].get(backend)
+    min_accuracy = baseline['accuracy'] if baseline and 'accuracy' in baseline else corpus['accuracy']
+    too_slow = baseline is not None and times.max() > tolerance * baseline['max_shot_s']
+    return {
+        'mismatches': mismatches,
+        'accuracy': accuracy,
+        'min_accuracy': min_accuracy,
+        'failures': failures,
+        'max_shot_s': float(times.max()),
+        'mean_shot_s': float(times.mean()),
+        'baseline': baseline,
+        'passed': (not (backend in EXACT and mismatches) and accuracy >= min_accuracy and not too_many
+                   and not too_slow),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the decoder regression corpus or check decoders against it.")
+    parser.add_argument('command', choices=['generate', 'check'])
+    parser.add_argument('--layouts', nargs='+', default=['square', 'strip'], choices=['square', 'strip'])
+    parser.add_argument('--sizes', nargs='+', type=int, default=[5, 7],
+                        help="grid sizes for 'square', code distances for 'strip'")
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS,
+                        help="More than the streaming and windowed decoders' windows")
+    parser.add_argument('--shots', type=int, default=200, help="Random shots per error rate")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument('--tolerance', type=float, default=3.0, help="Allowed slowdown of the max per-shot time")
+    parser.add_argument('--failure-tolerance', type=float, default=0.1,
+                        help="Allowed share of random-shot failures over the reference's (non-exact backends)")
+    parser.add_argument('--repeats', type=int, default=3, help="Timings per shot, the fastest counts")
+    parser.add_argument('--record', action='store_true',
+                        help="Store the measured timings and accuracies as the new baselines")
+    parser.add_argument('--dir', default=CORPUS_DIR)
+    args = parser.parse_args()
+
+    failed = False
+    try:
+        for kind in args.layouts:
+            for size in args.sizes:
+                path = corpus_path(kind, size, args.rounds, args.dir)
+                if args.command == 'generate':
+                    corpus = generate_corpus(kind, size, args.rounds, args.shots, seed=args.seed)
+                    os.makedirs(args.dir, exist_ok=True)
+                    with open(path, 'wb') as f:
+                        pickle.dump(corpus, f)
+                    print(f"LOG - {path}: {len(corpus['truth'])} cases, reference right on "
+                          f"{corpus['accuracy']:.1%} of the unambiguous single faults")
+                    continue
+
+                if not os.path.exists(path):
+                    print(f"LOG - No corpus {path}, run 'generate' first")
+                    failed = True
+                    continue
+                with open(path, 'rb') as f:
+                    corpus = pickle.load(f)
+                if 'failures' not in corpus:
+                    print(f"LOG - {path} has no random-shot failures, run 'generate' again")
+                    failed = True
+                    continue
+                for backend in args.backends:
+                    report = check_backend(corpus, backend, args.tolerance, args.repeats, args.failure_tolerance)
+                    baseline = report['baseline']['max_shot_s'] if report['baseline'] else float('nan')
+                    print(f"{kind:>6} {size:>2} {backend:>10}: {len(report['mismatches'])} mismatches, "
+                          f"{report['accuracy']:.1%} of single faults right (min {report['min_accuracy']:.1%}), "
+                          f"max {report['max_shot_s'] * 1e3:.2f} ms/shot (baseline {baseline * 1e3:.2f} ms), "
+                          f"{'ok' if report['passed'] else 'FAILED'}")
+                    for label, (failed_shots, reference, allowed) in report['failures'].items():
+                        print(f"       {label}: {failed_shots} failed shots (reference {reference}, at most {allowed})")
+                    if report['mismatches']:
+                        print(f"       first mismatches: {', '.join(report['mismatches'][:5])}")
+                    if args.record:
+                        corpus['baselines'][backend] = {'max_shot_s': report['max_shot_s'],
+                                                        'mean_shot_s': report['mean_shot_s'],
+                                                        'accuracy': report['accuracy'],
+                                                        'commit': git_commit()}
+                    else:
+                        failed |= not report['passed']
+                if args.record:
+                    with open(path, 'wb') as f:
+                        pickle.dump(corpus, f)
+    finally:
+        BACKENDS['pool'].close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
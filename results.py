@@ -3,14 +3,14 @@ from qiskit_ibm_runtime import QiskitRuntimeService
 import matplotlib.pyplot as plt
 from dotenv import load_dotenv
 import os
-import networkx as nx
 import pickle
 
-from mine import stats_history
+from plotting import save_matching_graph
 from utils import process_detection_events, build_mwpm_graph, apply_mwpm, calculate_error_statistics, plot_error_stats
 
 load_dotenv()
 API_KEY = os.getenv("IBM_API_KEY")
+stats_history = []
 
 service = QiskitRuntimeService(
     channel='ibm_quantum',
@@ -51,12 +51,7 @@ stats['counts'] = counts
 with open(f'stats/stats_grid_{grid}.pkl', 'wb') as f:
     pickle.dump(stats, f)
 
-# Draw the matching graph
-pos = nx.spring_layout(G)
-nx.draw(G, pos, with_labels=True, node_color='lightblue')
-labels = nx.get_edge_attributes(G, 'weight')
-nx.draw_networkx_edge_labels(G, pos, edge_labels=labels)
-plt.savefig(f"stats/{grid}_matching_graph.png")
-plt.close()
+# Draw the matching graph at its lattice coordinates
+save_matching_graph(G, f"stats/{grid}_matching_graph.png", matching=matching)
 
 # plot_error_stats(stats_history)
\ No newline at end of file
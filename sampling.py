@@ -0,0 +1,188 @@
+"""
+Adaptive shot allocation: sample in batches until the logical error rate is known well enough.
+
+Each (distance, p) point is sampled batch by batch; after every batch the logical errors (shots
+whose correction disagrees with the observable of the data readout) are counted and a Wilson
+score interval on the logical error rate is updated. Sampling stops once the
+interval half-width falls below `rel_error` times the rate, or at `max_shots`. The next batch is
+sized from the current estimate of the shots still needed, so easy points stop after one or two
+batches and rare-error points grow their batches geometrically instead of in fixed steps.
+"""
+from statistics import NormalDist
+
+import numpy as np
+
+from decoder import decode_both_sectors
+
+
+def binomial_interval(errors, shots, confidence=0.95):
+    """
+    Wilson score interval of a binomial rate.
+
+    Returns:
+        tuple: (rate, low, high)
+    """
+    if shots == 0:
+        return 0.0, 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    rate = errors / shots
+    denominator = 1 + z ** 2 / shots
+    centre = (rate + z ** 2 / (2 * shots)) / denominator
+    half = z * np.sqrt(rate * (1 - rate) / shots + z ** 2 / (4 * shots ** 2)) / denominator
+    return rate, max(0.0, centre - half), min(1.0, centre + half)
+
+
+def shots_needed(rate, rel_error, confidence=0.95):
+    """Shots for a normal-approximation half-width of `rel_error * rate` at the given rate."""
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    return int(np.ceil(z ** 2 * (1 - rate) / (rate * rel_error ** 2)))
+
+
+def merge_counts(total, counts):
+    """Add the frequencies of `counts` into `total` in place."""
+    for shot, freq in counts.items():
+        total[shot] = total.get(shot, 0) + freq
+    return total
+
+
+def sample_until_converged(sample, count_errors, rel_error=0.1, confidence=0.95, batch_shots=1024,
+                           max_shots=1_000_000, max_growth=8, keep_counts=True):
+    """
+    Sample one point in batches until the confidence interval of its error rate converges.
+
+    Args:
+        sample (callable): shots -> counts dict (a simulator, hardware or synthetic run).
+        count_errors (callable): counts -> number of shots with a logical error.
+        rel_error (float): Target interval half-width relative to the error rate.
+        confidence (float): Confidence level of the interval.
+        batch_shots (int): Size of the first batch, and the smallest batch afterwards.
+        max_shots (int): Shot budget of the point.
+        max_growth (int): Largest factor between consecutive batch sizes.
+        keep_counts (bool): Merge the counts of all batches into the result.
+
+    Returns:
+        dict: 'shots', 'errors', 'rate', 'low', 'high', 'converged', 'batches' (shots per batch)
+            and 'counts' when `keep_counts`.
+    """
+    shots = 0
+    errors = 0
+    batches = []
+    counts = {}
+    batch = min(batch_shots, max_shots)
+
+    while batch > 0:
+        new_counts = sample(batch)
+        errors += int(count_errors(new_counts))
+        shots += batch
+        batches.append(batch)
+        if keep_counts:
+            merge_counts(counts, new_counts)
+
+        rate, low, high = binomial_interval(errors, shots, confidence)
+        if errors and (high - low) / 2 <= rel_error * rate:
+            break
+        # with no errors yet, assume the rate sits at the upper end of the interval
+        needed = shots_needed(rate if errors else high, rel_error, confidence) - shots
+        batch = int(min(max(needed, batch_shots), max_growth * batch, max_shots - shots))
+
+    rate, low, high = binomial_interval(errors, shots, confidence)
+    result = {
+        'shots': shots,
+        'errors': errors,
+        'rate': rate,
+        'low': low,
+        'high': high,
+        'converged': bool(errors) and (high - low) / 2 <= rel_error * rate,
+        'batches': batches,
+    }
+    if keep_counts:
+        result['counts'] = counts
+    return result
+
+
+def decoded_errors(layout, n_rounds, pool=None, bit_map=None, bp=None, **decode_kwargs):
+    """
+    Error counter for `sample_until_converged`: shots whose correction disagrees with the observable.
+
+    Args:
+        pool (shared_pool.DecodePool): Caller-owned pool decoding every batch, so its workers and
+            shared tables are set up once per point instead of once per batch.
+        **decode_kwargs: Passed to `decoder.decode_both_sectors` when decoding in-process.
+    """
+    def count_errors(counts):
+        if pool is not None:
+            result = pool.decode_counts(counts, bit_map, bp)
+        else:
+            result = decode_both_sectors(counts, layout, n_rounds, bit_map=bit_map, bp=bp, **decode_kwargs)
+        if 'failed' not in result:
+            raise ValueError("Shots without the data readout have no measured logical errors")
+        return int(result['freqs'] @ result['failed'])
+    return count_errors
+
+
+def simulator_sampler(qc, noise_model=None, seed=None):
+    """Aer sampler for `sample_until_converged`; the circuit is transpiled once for all batches."""
+    from qiskit import transpile
+    from qiskit_aer import AerSimulator
+
+    simulator = AerSimulator(noise_model=noise_model, seed_simulator=seed)
+    compiled_circuit = transpile(qc, simulator)
+
+    def sample(shots):
+        return simulator.run(compiled_circuit, shots=shots).result().get_counts()
+    return sample
+
+
+def synthetic_sampler(layout, n_rounds, p, p_meas=None, seed=None):
+    """Phenomenological-noise sampler of memory experiments (`synthetic.synthetic_memory`), a fresh stream per batch."""
+    from synthetic import synthetic_counts
+
+    rng = np.random.default_rng(seed)
+
+    def sample(shots):
+        return synthetic_counts(layout, n_rounds, shots, p, p_meas, seed=rng.integers(2 ** 32), measure_data=True)
+    return sample
+
+
+def adaptive_sweep(points, make_sampler, make_counter, **kwargs):
+    """
+    Run `sample_until_converged` on every point of a sweep.
+
+    Args:
+        points: Iterable of point keys, e.g. (distance, p) tuples.
+        make_sampler (callable): point -> sampler.
+        make_counter (callable): point -> error counter.
+        **kwargs: Passed to `sample_until_converged`.
+
+    Returns:
+        dict: point -> result of `sample_until_converged`.
+    """
+    results = {}
+    for point in points:
+        results[point] = sample_until_converged(make_sampler(point), make_counter(point), **kwargs)
+        r = results[point]
+        print(f"{point}: {r['errors']}/{r['shots']} logical errors, rate {r['rate']:.4g} "
+              f"[{r['low']:.4g}, {r['high']:.4g}] in {len(r['batches'])} batches")
+    return results
+
+
+if __name__ == "__main__":
+    from fitting import save_sweep
+    from layout import get_layout
+    from shared_pool import DecodePool
+
+    n_rounds = 4
+    distances = (3, 5, 7)
+    points = [(d, p) for d in distances for p in (0.001, 0.003)]
+    layouts = {d: get_layout('square', 2 * d - 1) for d in distances}
+    # one pool per distance, reused by every batch of its points
+    pools = {d: DecodePool(layouts[d], n_rounds) for d in distances}
+    try:
+        results = adaptive_sweep(points,
+                                 lambda point: synthetic_sampler(layouts[point[0]], n_rounds, point[1], seed=0),
+                                 lambda point: decoded_errors(layouts[point[0]], n_rounds, pool=pools[point[0]]),
+                                 rel_error=0.1, max_shots=200_000, keep_counts=False)
+    finally:
+        for pool in pools.values():
+            pool.close()
+    save_sweep(results, "stats/sweeps/synthetic_square.pkl")
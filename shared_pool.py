@@ -0,0 +1,209 @@
+"""
+Persistent decoding worker pool with its tables and shots in shared memory.
+
+`decoder.decode_fired` starts a fresh process pool on every call, every worker rebuilds the
+shortest-path tables of its sector, and the fired detectors of every shot are pickled into the
+tasks. `DecodePool` instead builds the tables of both sectors once in the parent, copies them into
+one `multiprocessing.shared_memory` block that every worker maps at start-up, and keeps the
+workers alive across calls. The detection events of each batch (`decoder.sector_events`, both
+sectors side by side) are bit-packed into a second shared block, so a task is only (sector,
+offset, length) and returns the logical flips of its slice; per-task IPC stays constant whatever
+the distance or the number of shots. The observable of the data readout stays in the parent.
+
+    with DecodePool(layout, n_rounds, workers=8) as pool:
+        for chunk in chunks:
+            result = pool.decode_counts(chunk)
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from decoder import (decoded_result, gather_readout, logical_flip, match_detectors, observed_flips, readout_bit_map,
+                     sector_events, sector_tables, shots_readout)
+
+TABLE_ARRAYS = ('dist', 'next', 'parity', 'edge_parity')
+GRAPH_ARRAYS = ('edges', 'weights', 'faults')
+MIN_SLICE = 64
+
+# per-process state of the workers: attached blocks and the tables built on them
+_worker = {}
+
+
+def share_arrays(arrays):
+    """
+    Copy named arrays into one new shared memory block.
+
+    Returns:
+        tuple: (SharedMemory, spec) where spec lists (key, offset, shape, dtype) for `attach_arrays`.
+    """
+    spec = []
+    offset = 0
+    for key, array in arrays.items():
+        spec.append((key, offset, array.shape, array.dtype.str))
+        offset += -(-array.nbytes // 64) * 64
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for (key, start, shape, dtype), array in zip(spec, arrays.values()):
+        np.ndarray(shape, dtype, block.buf, start)[...] = array
+    return block, spec
+
+
+def attach_arrays(name, spec):
+    """Map a block written by `share_arrays`: (SharedMemory, dict of array views)."""
+    block = shared_memory.SharedMemory(name=name)
+    return block, {key: np.ndarray(shape, dtype, block.buf, start) for key, start, shape, dtype in spec}
+
+
+def _init_worker(name, spec, boundaries):
+    block, arrays = attach_arrays(name, spec)
+    tables = {}
+    for stab_type, boundary in boundaries.items():
+        sector = {key: arrays[f"{stab_type}/{key}"] for key in TABLE_ARRAYS}
+        sector['boundary'] = boundary
+        sector['graph'] = {key: arrays[f"{stab_type}/graph/{key}"] for key in GRAPH_ARRAYS}
+        sector['graph']['boundary'] = boundary
+        tables[stab_type] = sector
+    _worker.update({'tables_block': block, 'tables': tables, 'shots_name': None})
+
+
+def _shots(name, shape):
+    """Worker view of the current shot block, re-attached when the parent replaced it."""
+    if _worker['shots_name'] != name:
+        if _worker['shots_name'] is not None:
+            _worker['shots_block'].close()
+        _worker['shots_block'] = shared_memory.SharedMemory(name=name)
+        _worker['shots_name'] = name
+    return np.ndarray(shape, np.uint8, _worker['shots_block'].buf)
+
+
+def _decode_slice(stab_type, start, stop, name, shape, offset, length, bp=None):
+    """Logical flips of shots offset ... offset + length - 1 in one sector (event bits start ... stop - 1)."""
+    tables = _worker['tables'][stab_type]
+    packed = _shots(name, shape)[offset:offset + length]
+    sector = np.unpackbits(packed, axis=1, count=stop)[:, start:]
+    fired = [np.flatnonzero(row) for row in sector]
+
+    flips = np.zeros(length, dtype=np.uint8)
+    if bp is not None:
+        from belief_propagation import bp_weights, reweighted_match
+        shot_weights = bp_weights(fired, tables, p=None if bp is True else bp)
+        for n, nodes in enumerate(fired):
+            flips[n] = reweighted_match(nodes, tables, shot_weights[n])[1]
+        return flips
+    for n, nodes in enumerate(fired):
+        flips[n] = logical_flip(match_detectors(nodes, tables), tables)
+    return flips
+
+
+class DecodePool:
+    """
+    Worker processes decoding both sectors of one (layout, rounds, weights or noise) configuration.
+
+    Args:
+        layout (dict): Layout returned by `layout.get_layout`.
+        n_rounds (int): Number of stabilizer measurement rounds.
+        workers (int): Worker processes, defaults to every core.
+        noise (dict): Circuit noise; weight the graphs by its detector error model, as in
+            `decoder.decode_both_sectors`.
+        closing (bool): The shots carry the data readout (as `circuits.layout_circuit` builds
+            them), which closes the Z sector and gives failure rates; the tables are built for
+            one case only.
+        slices_per_worker (int): Tasks per worker and sector of every batch, for load balance.
+    """
+
+    def __init__(self, layout, n_rounds, workers=None, time_weight=1.0, space_weight=1.0, boundary_weight=None,
+                 noise=None, closing=True, slices_per_worker=4):
+        self.layout = layout
+        self.n_rounds = n_rounds
+        self.workers = workers or os.cpu_count()
+        self.closing = closing
+        self.slices_per_worker = slices_per_worker
+
+        noise = tuple(sorted(noise.items())) if noise is not None else None
+        arrays = {}
+        boundaries = {}
+        for stab_type in ('Z', 'X'):
+            tables = sector_tables(layout['kind'], layout['size'], stab_type, n_rounds,
+                                   (time_weight, space_weight, boundary_weight), noise, closing)
+            boundaries[stab_type] = int(tables['boundary'])
+            arrays.update({f"{stab_type}/{key}": tables[key] for key in TABLE_ARRAYS})
+            arrays.update({f"{stab_type}/graph/{key}": tables['graph'][key] for key in GRAPH_ARRAYS})
+        self.tables_block, spec = share_arrays(arrays)
+        self.shots_block = None
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(self.tables_block.name, spec, boundaries))
+
+    def _load_shots(self, packed):
+        """Copy packed detection events into the shot block, replacing it when it is too small."""
+        if self.shots_block is None or self.shots_block.size < packed.nbytes:
+            if self.shots_block is not None:
+                self.shots_block.close()
+                self.shots_block.unlink()
+            self.shots_block = shared_memory.SharedMemory(create=True, size=max(packed.nbytes, 1))
+        np.ndarray(packed.shape, np.uint8, self.shots_block.buf)[...] = packed
+
+    def decode_rounds(self, rounds, freqs, bp=None, data=None):
+        """
+        Decode gathered (n_shots, n_rounds, n_syndrome) syndrome rounds.
+
+        Args:
+            bp (float or bool): Belief-propagation pre-pass, as in `decoder.decode_both_sectors`.
+            data (np.ndarray): (n_shots, n_qubits) data readout (`decoder.gather_readout`),
+                required exactly when the pool was built with `closing`.
+
+        Returns:
+            dict: As `decoder.decode_fired`.
+        """
+        if (data is not None) != self.closing:
+            raise ValueError("The pool was built for shots " + ("with" if self.closing else "without")
+                             + " the data readout")
+        n_shots = len(rounds)
+        events = sector_events(rounds, self.layout, data)
+        sizes = [events[stab_type][0].size for stab_type in ('Z', 'X')]
+        spans = {'Z': (0, sizes[0]), 'X': (sizes[0], sizes[0] + sizes[1])}
+        flat = np.concatenate([events[stab_type].reshape(n_shots, -1) for stab_type in ('Z', 'X')], axis=1)
+        packed = np.packbits(flat, axis=1)
+        self._load_shots(packed)
+
+        n_slices = max(min(self.workers * self.slices_per_worker, -(-n_shots // MIN_SLICE)), 1)
+        bounds = np.linspace(0, n_shots, n_slices + 1).astype(int)
+        futures = {
+            stab_type: [self.executor.submit(_decode_slice, stab_type, *spans[stab_type], self.shots_block.name,
+                                             packed.shape, a, b - a, bp)
+                        for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+            for stab_type in ('Z', 'X')
+        }
+        flips = {stab_type: np.concatenate([future.result() for future in sector] or [np.zeros(0, np.uint8)])
+                 for stab_type, sector in futures.items()}
+
+        return decoded_result(freqs, flips['Z'], flips['X'], observed_flips(data, self.layout))
+
+    def decode_counts(self, counts, bit_map=None, bp=None):
+        """`decoder.decode_both_sectors` of a counts dict on the pool."""
+        shots = list(counts.keys())
+        freqs = np.array([counts[shot] for shot in shots])
+        rounds, data = shots_readout(shots, self.layout, self.n_rounds, bit_map)
+        return {'shots': shots, **self.decode_rounds(rounds, freqs, bp, data)}
+
+    def decode_bits(self, bits, freqs, bit_map=None, bp=None):
+        """`decoder.decode_bits` of a (n_shots, n_bits) matrix indexed by classical bit on the pool."""
+        if bit_map is None:
+            bit_map = readout_bit_map(self.layout, self.n_rounds, bits.shape[1])
+        data = gather_readout(bits, self.layout, bit_map)
+        return self.decode_rounds(bits[:, bit_map['syndrome']], np.asarray(freqs), bp, data)
+
+    def close(self):
+        """Stop the workers and release the shared memory."""
+        self.executor.shutdown()
+        for block in (self.tables_block, self.shots_block):
+            if block is not None:
+                block.close()
+                block.unlink()
+        self.tables_block = self.shots_block = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,272 @@
+"""
+Append-only, bit-packed shot archives read through memory maps.
+
+File layout:
+    8 bytes   magic b'SHOTARC1'
+    4 bytes   little-endian header length
+    header    JSON: layout kind and size, n_rounds, n_bits, row_bytes, bit_order and bit_map
+    rows      one row of `row_bytes` bytes per shot, classical bit j in byte j // 8, bit j % 8
+
+Bit j of a row is classical bit j (Qiskit's rightmost character), so no string reversing is
+needed anywhere downstream; `bit_map` holds the circuit's gather indices (see
+`circuits.circuit_bit_map`), which `gather_packed` applies straight to packed rows. The shot count is derived from the file size, so runners can keep
+appending batches and readers always see whole rows. Readers map the file read-only and unpack
+one chunk of rows at a time, so the number of shots is bounded by disk, not memory.
+"""
+import json
+import os
+import struct
+
+import numpy as np
+
+from decoder import decode_fired, observed_flips, readout_bit_map, rounds_detectors, shots_to_bits
+
+MAGIC = b'SHOTARC1'
+
+
+def archive_header(layout, n_rounds, n_bits, bit_map=None):
+    """
+    Header of an archive for shots of `n_bits` classical bits measured on `layout`.
+
+    `bit_map` defaults to `decoder.default_bit_map`, with the data readout if `n_bits` has room for it.
+    """
+    if bit_map is None:
+        bit_map = readout_bit_map(layout, n_rounds, n_bits)
+    return {
+        'layout': [layout['kind'], layout['size']],
+        'n_rounds': n_rounds,
+        'n_bits': n_bits,
+        'row_bytes': (n_bits + 7) // 8,
+        'bit_order': 'clbit-little',
+        'bit_map': {'syndrome': np.asarray(bit_map['syndrome']).tolist(),
+                    'data': np.asarray(bit_map['data']).tolist() if bit_map['data'] is not None else None},
+    }
+
+
+def create_archive(path, layout, n_rounds, n_bits, overwrite=False, bit_map=None):
+    """
+    Create an empty archive for shots of `n_bits` classical bits measured on `layout`.
+
+    Returns:
+        dict: The header (`archive_header`).
+    """
+    if os.path.exists(path) and not overwrite:
+        raise FileExistsError(f"Archive already exists: {path}")
+    header = archive_header(layout, n_rounds, n_bits, bit_map)
+    encoded = json.dumps(header).encode()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(encoded)) + encoded)
+    return header
+
+
+def read_header(path):
+    """Header of an archive and the byte offset of its first row."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a shot archive: {path}")
+        (length,) = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(length))
+    return header, len(MAGIC) + 4 + length
+
+
+def pack_bits(bits):
+    """Pack a (n_shots, n_bits) 0/1 matrix indexed by classical bit into archive rows."""
+    return np.packbits(np.asarray(bits, dtype=np.uint8), axis=1, bitorder='little')
+
+
+def check_header(header, expected, path=''):
+    """Raise ValueError unless an archive header describes the same shots as `expected` (`archive_header`)."""
+    for key in ('layout', 'n_rounds', 'n_bits'):
+        if header[key] != expected[key]:
+            raise ValueError(f"Archive {path} holds {key} {header[key]}, expected {expected[key]}")
+    stored, wanted = archive_bit_map(header), archive_bit_map(expected)
+    for key in ('syndrome', 'data'):
+        if (stored[key] is None) != (wanted[key] is None) or (
+                stored[key] is not None and not np.array_equal(stored[key], wanted[key])):
+            raise ValueError(f"Archive {path} has a different {key} bit map")
+
+
+def ensure_archive(path, layout, n_rounds, n_bits, bit_map=None):
+    """
+    Create an archive, or check that an existing one stores the same shots, before appending to it.
+
+    A partial row left by an interrupted append is cut off, so new rows start on a row boundary.
+
+    Returns:
+        dict: The header the appended shots must match.
+    """
+    expected = archive_header(layout, n_rounds, n_bits, bit_map)
+    if os.path.exists(path):
+        header, offset = read_header(path)
+        check_header(header, expected, path)
+        whole = offset + (os.path.getsize(path) - offset) // header['row_bytes'] * header['row_bytes']
+        if os.path.getsize(path) > whole:
+            os.truncate(path, whole)
+    else:
+        create_archive(path, layout, n_rounds, n_bits, bit_map=bit_map)
+    return expected
+
+
+def append_bits(path, bits, expected=None):
+    """
+    Append shots given as a (n_shots, n_bits) matrix indexed by classical bit.
+
+    Args:
+        expected (dict): Header of the circuit the shots come from (`ensure_archive`); the
+            archive must match it entirely, not only in the number of bits.
+    """
+    header, _ = read_header(path)
+    if expected is not None:
+        check_header(header, expected, path)
+    if bits.shape[1] != header['n_bits']:
+        raise ValueError(f"Expected {header['n_bits']} bits per shot, got {bits.shape[1]}")
+    with open(path, 'ab') as f:
+        f.write(pack_bits(bits).tobytes())
+
+
+def append_memory(path, memory, expected=None):
+    """Append a list of Qiskit bitstrings (Aer `memory=True` output)."""
+    append_bits(path, shots_to_bits(memory), expected)
+
+
+def open_archive(path):
+    """
+    Map an archive read-only.
+
+    Returns:
+        dict: 'header', 'n_shots' and 'rows', a (n_shots, row_bytes) uint8 memmap.
+    """
+    header, offset = read_header(path)
+    n_shots = (os.path.getsize(path) - offset) // header['row_bytes']
+    if n_shots == 0:
+        rows = np.zeros((0, header['row_bytes']), dtype=np.uint8)
+    else:
+        rows = np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=(n_shots, header['row_bytes']))
+    return {'header': header, 'n_shots': n_shots, 'rows': rows}
+
+
+def unpack_rows(rows, n_bits):
+    """Unpack archive rows (a memmap slice) into a (n, n_bits) uint8 matrix indexed by classical bit."""
+    return np.unpackbits(rows, axis=1, count=n_bits, bitorder='little')
+
+
+def gather_packed(rows, index):
+    """
+    Read the classical bits `index` (any shape) of packed archive rows without unpacking them.
+
+    Returns:
+        np.ndarray: (n, *index.shape) uint8 matrix.
+    """
+    index = np.asarray(index)
+    return (rows[:, index >> 3] >> (index & 7).astype(np.uint8)) & 1
+
+
+def archive_bit_map(header):
+    """Gather indices stored in an archive header, as arrays (the default map for older archives)."""
+    stored = header.get('bit_map')
+    if stored is None:
+        from layout import get_layout
+        return readout_bit_map(get_layout(*header['layout']), header['n_rounds'], header['n_bits'])
+    return {
+        'n_bits': header['n_bits'],
+        'syndrome': np.array(stored['syndrome'], dtype=np.intp),
+        'data': np.array(stored['data'], dtype=np.intp) if stored['data'] is not None else None,
+    }
+
+
+def iter_bit_chunks(archive, chunk_size=65536, start=0, stop=None):
+    """Yield (bits, freqs) chunks of an archive, each shot once, for `syndrome_history.accumulate_firing`."""
+    n_bits = archive['header']['n_bits']
+    stop = archive['n_shots'] if stop is None else min(stop, archive['n_shots'])
+    for i in range(start, stop, chunk_size):
+        bits = unpack_rows(archive['rows'][i:min(i + chunk_size, stop)], n_bits)
+        yield bits, np.ones(len(bits), dtype=np.int64)
+
+
+def iter_unique_chunks(archive, chunk_size=65536):
+    """Yield (bits, freqs) chunks with repeated shots of each chunk collapsed, as decoders want them."""
+    n_bits = archive['header']['n_bits']
+    for i in range(0, archive['n_shots'], chunk_size):
+        rows, freqs = np.unique(archive['rows'][i:i + chunk_size], axis=0, return_counts=True)
+        yield unpack_rows(rows, n_bits), freqs
+
+
+def decode_archive(path, chunk_size=65536, **decode_kwargs):
+    """
+    Decode every shot of an archive chunk by chunk against its data readout.
+
+    Returns:
+        dict: 'shots', and the number of shots whose Z correction disagrees with the readout
+            ('logical_z') or that fail in any measured sector ('logical').
+    """
+    from layout import get_layout
+
+    archive = open_archive(path)
+    layout = get_layout(*archive['header']['layout'])
+    n_rounds = archive['header']['n_rounds']
+    bit_map = archive_bit_map(archive['header'])
+    if bit_map['data'] is None:
+        raise ValueError(f"Archive {path} has no data readout to count logical errors against")
+    data_bits = np.asarray(bit_map['data'])[layout['data_qubits']]
+    totals = {'shots': 0, 'logical_z': 0, 'logical': 0}
+    for i in range(0, archive['n_shots'], chunk_size):
+        rows, freqs = np.unique(archive['rows'][i:i + chunk_size], axis=0, return_counts=True)
+        data = np.zeros((len(rows), layout['n_rows'] * layout['n_cols']), dtype=np.uint8)
+        data[:, layout['data_qubits']] = gather_packed(rows, data_bits)
+        fired = rounds_detectors(gather_packed(rows, bit_map['syndrome']), layout, data)
+        result = decode_fired(fired, freqs, layout, n_rounds, observed=observed_flips(data, layout), **decode_kwargs)
+        totals['shots'] += int(freqs.sum())
+        totals['logical_z'] += int(freqs @ result['logical_z_failed'])
+        totals['logical'] += int(freqs @ result['failed'])
+    return totals
+
+
+def simulate_to_archive(qc, path, layout, n_rounds, shots, batch_shots=100_000, backend='stim', noise=None,
+                        seed=None, noise_model=None):
+    """
+    Sample `qc` in batches straight into an archive, never holding more than one batch.
+
+    An existing archive is appended to only if its header matches the circuit. Appending to an
+    archive that already holds shots draws from its own seed stream (`seed`, shots held), so a
+    resumed run does not repeat the shots it already has.
+
+    Args:
+        backend (str): 'stim' (compiled sampler of the `circuit_export` text circuit, needs
+            `noise` as a noise dict) or 'aer' (memory mode, `noise` as a noise dict or None).
+        noise_model (NoiseModel): Aer noise model used instead of `noise` (e.g. from
+            `noise_models.noise_model`), 'aer' only.
+    """
+    from circuits import circuit_bit_map
+
+    expected = ensure_archive(path, layout, n_rounds, qc.num_clbits, circuit_bit_map(qc, layout, n_rounds))
+    held = open_archive(path)['n_shots']
+    rng = np.random.default_rng(seed if seed is None or held == 0 else [seed, held])
+
+    if backend == 'stim':
+        import stim
+        from circuit_export import circuit_operations, stim_text
+
+        circuit = circuit_operations(qc, layout, n_rounds, noise)
+        sampler = stim.Circuit(stim_text(circuit)).compile_sampler(seed=int(rng.integers(2 ** 32)))
+        for done in range(0, shots, batch_shots):
+            n = min(batch_shots, shots - done)
+            bits = np.zeros((n, qc.num_clbits), dtype=np.uint8)
+            bits[:, circuit['clbits']] = sampler.sample(n)
+            append_bits(path, bits, expected)
+    elif backend == 'aer':
+        from qiskit import transpile
+        from qiskit_aer import AerSimulator
+        from circuit_export import aer_noise_model
+
+        if noise_model is None and noise:
+            noise_model = aer_noise_model(noise)
+        simulator = AerSimulator(noise_model=noise_model)
+        compiled = transpile(qc, simulator)
+        for done in range(0, shots, batch_shots):
+            n = min(batch_shots, shots - done)
+            result = simulator.run(compiled, shots=n, memory=True, seed_simulator=int(rng.integers(2 ** 31))).result()
+            append_memory(path, result.get_memory(), expected)
+    else:
+        raise ValueError(f"Unknown backend: {backend}")
+    return open_archive(path)['n_shots']
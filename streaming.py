@@ -0,0 +1,215 @@
+"""
+Sliding-window decoding of syndrome rounds as they arrive.
+
+`StreamingDecoder` receives one round of syndrome bits at a time. The detector layers of each
+sector (`decoder.sector_events`: round pairs, plus the first Z round and the Z layer closed by
+the data readout) are kept and, once `window` of them are waiting, matched on a window-sized
+spacetime graph (`decoder.matching_tables`) whose time boundaries are only those of the
+experiment's own open ends (`decoder.memory_layers`). Matches inside the oldest `commit` layers are
+committed and those layers leave the window. A match that crosses into the newer layers is not
+committed: its old endpoint is moved forward along time-like edges, which flip no data qubit,
+to the first layer that stays, so the next window matches it with the newer information.
+`finish` matches whatever is left at the end of the shot, after the closing layer of its data
+readout when there is one.
+
+`replay_rounds` replays stored shots round by round at a fixed rate, so latency can be measured
+without hardware; `stream_decode` runs the two together and reports per-round latencies.
+"""
+import argparse
+import pickle
+import time
+
+import numpy as np
+
+from decoder import (decoded_result, logical_flip, match_detectors, matching_tables, memory_layers, observed_flips,
+                     readout_stabilizers, shots_readout)
+from layout import get_layout
+from windowed import split_commit
+
+
+class StreamingDecoder:
+    """
+    Sliding-window decoder of both stabilizer sectors of one shot at a time.
+
+    Args:
+        layout (dict): Layout returned by `layout.get_layout`.
+        window (int): Detector layers of a sector matched together.
+        commit (int): Oldest layers committed after every match, 1 <= commit <= window.
+        time_weight, space_weight, boundary_weight (float): Edge weights, as in `decoder`.
+    """
+
+    def __init__(self, layout, window=4, commit=2, time_weight=1.0, space_weight=1.0, boundary_weight=None):
+        if not 1 <= commit <= window:
+            raise ValueError("Need 1 <= commit <= window")
+        self.layout = layout
+        self.window = window
+        self.commit = commit
+        self.weights = (time_weight, space_weight, boundary_weight)
+        types = np.array([layout['stabilizer_type'][s] for s in layout['syndrome_qubits']])
+        self.columns = {stab_type: np.flatnonzero(types == stab_type) for stab_type in ('Z', 'X')}
+        self.reset()
+
+    def reset(self):
+        """Forget the current shot."""
+        self.previous = None
+        self.layers = {'Z': [], 'X': []}  # detection events (n_stab,) of the layers in the window
+        self.started = {'Z': False, 'X': False}  # layers already committed, the start is behind
+        self.flips = {'Z': 0, 'X': 0}
+        self.latencies = []
+
+    def _tables(self, stab_type, n_layers, time_boundaries=(False, False)):
+        return matching_tables(self.layout['kind'], self.layout['size'], stab_type, n_layers + 1, *self.weights,
+                               time_boundaries=time_boundaries)
+
+    def _match(self, stab_type, n_commit, last=False, closing=False):
+        """Match the window of one sector and commit its first `n_commit` layers (`last`: the shot ended)."""
+        layers = self.layers[stab_type]
+        open_first, open_last = memory_layers(stab_type, closing)['time_boundaries']
+        time_boundaries = (open_first and not self.started[stab_type], open_last and last)
+        tables = self._tables(stab_type, len(layers), time_boundaries)
+        pairs = match_detectors(np.flatnonzero(np.array(layers)), tables)
+
+        committed, moved = split_commit(pairs, len(self.columns[stab_type]), tables['boundary'], 0, n_commit)
+        for t, i in moved:
+            layers[t][i] ^= 1
+        self.flips[stab_type] ^= logical_flip(committed, tables)
+        del layers[:n_commit]
+        self.started[stab_type] = True
+
+    def _add_layer(self, stab_type, events):
+        self.layers[stab_type].append(events)
+        if len(self.layers[stab_type]) == self.window:
+            self._match(stab_type, self.commit)
+
+    def push(self, syndrome, arrival=None):
+        """
+        Add the next round of syndrome bits ((n_syndrome,) in `layout['syndrome_qubits']` order).
+
+        Args:
+            arrival (float): `time.perf_counter()` at which the round arrived, defaults to now.
+
+        Returns:
+            float: Latency of this round in seconds, from arrival until it is processed.
+        """
+        arrival = time.perf_counter() if arrival is None else arrival
+        syndrome = np.asarray(syndrome, dtype=np.uint8)
+        for stab_type, columns in self.columns.items():
+            if self.previous is not None:
+                self._add_layer(stab_type, syndrome[columns] ^ self.previous[columns])
+            elif memory_layers(stab_type)['opening']:
+                self._add_layer(stab_type, syndrome[columns].copy())
+        self.previous = syndrome
+        latency = time.perf_counter() - arrival
+        self.latencies.append(latency)
+        return latency
+
+    def finish(self, data=None):
+        """
+        Match the remaining layers and end the shot.
+
+        Args:
+            data (np.ndarray): (n_qubits,) data readout of the shot (`decoder.shots_readout`),
+                which adds the closing layer of the Z sector.
+
+        Returns:
+            dict: 'logical_z' and 'logical_x' flips of the committed corrections and the
+                per-round 'latencies' (the last one includes the final match).
+        """
+        start = time.perf_counter()
+        closing = data is not None
+        for stab_type, columns in self.columns.items():
+            if memory_layers(stab_type, closing)['closing'] and self.previous is not None:
+                final = readout_stabilizers(np.asarray(data)[None], self.layout, stab_type)[0]
+                self.layers[stab_type].append(final ^ self.previous[columns])
+            if self.layers[stab_type]:
+                self._match(stab_type, len(self.layers[stab_type]), last=True, closing=closing)
+        latencies = list(self.latencies)
+        if latencies:
+            latencies[-1] += time.perf_counter() - start
+        result = {'logical_z': self.flips['Z'], 'logical_x': self.flips['X'], 'latencies': latencies}
+        self.reset()
+        return result
+
+
+def replay_rounds(counts, layout, n_rounds, rate=None, bit_map=None):
+    """
+    Replay stored shots one syndrome round at a time.
+
+    Args:
+        counts (dict): Bitstring -> frequency; every distinct bitstring is replayed once.
+        rate (float): Rounds per second, None to replay as fast as they are consumed.
+        bit_map (dict): Classical bit gather indices, defaults to `decoder.default_bit_map`.
+
+    Yields:
+        tuple: (shot index, round, syndrome bits, arrival time)
+    """
+    rounds, _ = shots_readout(list(counts), layout, n_rounds, bit_map)
+    return _replay(rounds, n_rounds, rate)
+
+
+def _replay(rounds, n_rounds, rate):
+    interval = 1.0 / rate if rate else 0.0
+    due = time.perf_counter()
+    for n, shot in enumerate(rounds):
+        for t in range(n_rounds):
+            if interval:
+                due += interval
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            yield n, t, shot[t], time.perf_counter() if interval else None
+
+
+def stream_decode(counts, layout, n_rounds, window=4, commit=2, rate=None, bit_map=None, **weights):
+    """
+    Decode stored shots through `StreamingDecoder` as if they arrived at `rate` rounds per second.
+
+    Returns:
+        dict: As `decoder.decoded_result` (per-shot 'logical_z' and 'logical_x', their
+            'correction_flip_rate' and, when the shots carry the data readout, the
+            'logical_error_rate'), and 'latency' statistics over all rounds (seconds).
+    """
+    freqs = np.array(list(counts.values()))
+    rounds, data = shots_readout(list(counts), layout, n_rounds, bit_map)
+    decoder = StreamingDecoder(layout, window, commit, **weights)
+    logical_z = np.zeros(len(freqs), dtype=np.uint8)
+    logical_x = np.zeros(len(freqs), dtype=np.uint8)
+    latencies = []
+
+    for n, t, syndrome, arrival in _replay(rounds, n_rounds, rate):
+        decoder.push(syndrome, arrival)
+        if t == n_rounds - 1:
+            result = decoder.finish(data[n] if data is not None else None)
+            logical_z[n], logical_x[n] = result['logical_z'], result['logical_x']
+            latencies.extend(result['latencies'])
+
+    latencies = np.array(latencies)
+    return {
+        **decoded_result(freqs, logical_z, logical_x, observed_flips(data, layout)),
+        'latency': {
+            'mean': float(latencies.mean()),
+            'p99': float(np.percentile(latencies, 99)),
+            'max': float(latencies.max()),
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay stored counts through the streaming decoder.")
+    parser.add_argument('counts', help="Pickle of a counts dict")
+    parser.add_argument('--layout', choices=['square', 'strip'], default='square')
+    parser.add_argument('--size', type=int, required=True, help="Grid size (square) or distance (strip)")
+    parser.add_argument('--rounds', type=int, default=4)
+    parser.add_argument('--window', type=int, default=4)
+    parser.add_argument('--commit', type=int, default=2)
+    parser.add_argument('--rate', type=float, default=None, help="Rounds per second (default: as fast as possible)")
+    args = parser.parse_args()
+
+    with open(args.counts, 'rb') as f:
+        counts = pickle.load(f)
+    result = stream_decode(counts, get_layout(args.layout, args.size), args.rounds, args.window, args.commit,
+                           args.rate)
+    latency = result['latency']
+    rate = result.get('logical_error_rate', result['correction_flip_rate'])
+    print(f"LOG - logical error rate {rate:.4g}, latency mean "
+          f"{latency['mean'] * 1e3:.3f} ms, p99 {latency['p99'] * 1e3:.3f} ms, max {latency['max'] * 1e3:.3f} ms")
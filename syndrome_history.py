@@ -0,0 +1,139 @@
+"""
+Detector-firing heatmaps per (stabilizer, round), accumulated chunk by chunk.
+
+Shots are never expanded all at once: every chunk of distinct bitstrings is turned into a bit
+matrix, differenced between rounds and folded into a running (round, stabilizer) histogram
+weighted by shot frequency, so memory stays bounded by the chunk size.
+"""
+import os
+import pickle
+from itertools import islice
+
+import numpy as np
+
+from decoder import default_bit_map, shots_to_bits
+from layout import get_layout
+
+
+def iter_count_chunks(counts, chunk_size=4096):
+    """Yield (shots, freqs) chunks of a counts dict without copying the whole dict."""
+    items = iter(counts.items())
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        shots, freqs = zip(*chunk)
+        yield list(shots), np.array(freqs)
+
+
+def accumulate_firing(chunks, layout, n_rounds, bit_map=None):
+    """
+    Histogram detector firings over a stream of shot chunks.
+
+    Args:
+        chunks: Iterable of (shots, freqs); `shots` is a list of bitstrings or an already
+            unpacked (n, n_bits) bit matrix indexed by classical bit.
+        layout (dict): Layout returned by `layout.get_layout`.
+        n_rounds (int): Number of stabilizer measurement rounds.
+        bit_map (dict): Classical bit gather indices, defaults to `decoder.default_bit_map`.
+
+    Returns:
+        dict: 'firing' (n_rounds - 1, n_syndrome) weighted firing counts, columns in
+            `layout['syndrome_qubits']` order, and 'shots' the number of shots seen.
+    """
+    n_syndrome = len(layout['syndrome_qubits'])
+    syndrome = (bit_map or default_bit_map(layout, n_rounds))['syndrome']
+    firing = np.zeros((n_rounds - 1) * n_syndrome)
+    total_shots = 0
+
+    for shots, freqs in chunks:
+        rounds = shots[:, syndrome] if isinstance(shots, np.ndarray) else shots_to_bits(shots, syndrome)
+        events = (rounds[:, 1:] ^ rounds[:, :-1]).reshape(len(rounds), -1)
+        # weighted histogram over (round, stabilizer) bins
+        shot_index, bins = np.nonzero(events)
+        firing += np.bincount(bins, weights=freqs[shot_index], minlength=firing.size)
+        total_shots += int(np.sum(freqs))
+
+    return {'firing': firing.reshape(n_rounds - 1, n_syndrome), 'shots': total_shots}
+
+
+def firing_grid(history, layout):
+    """Firing rates laid out on the lattice: (n_rounds - 1, n_rows, n_cols), NaN on data qubits."""
+    rates = history['firing'] / max(history['shots'], 1)
+    grid = np.full((rates.shape[0], layout['n_rows'] * layout['n_cols']), np.nan)
+    grid[:, layout['syndrome_qubits']] = rates
+    return grid.reshape(rates.shape[0], layout['n_rows'], layout['n_cols'])
+
+
+def plot_heatmaps(history, layout, path, title=None):
+    """One lattice heatmap per round pair plus the (round, stabilizer) matrix, in one figure."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    grid = firing_grid(history, layout)
+    n_layers = grid.shape[0]
+    vmax = np.nanmax(grid) if np.isfinite(grid).any() else 1.0
+
+    fig = Figure(figsize=(3 * (n_layers + 1), 6), layout='constrained')
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(1, n_layers + 1)
+    for t in range(n_layers):
+        image = axes[t].imshow(grid[t], cmap='inferno', vmin=0, vmax=vmax)
+        axes[t].set_title(f"Rounds {t} → {t + 1}")
+        axes[t].set_xticks([])
+        axes[t].set_yticks([])
+
+    axes[-1].imshow(history['firing'].T / max(history['shots'], 1), aspect='auto', cmap='inferno',
+                    vmin=0, vmax=vmax)
+    axes[-1].set_xlabel('Round pair')
+    axes[-1].set_ylabel('Stabilizer (measurement order)')
+    fig.colorbar(image, ax=axes, label='Detector firing rate')
+    if title:
+        fig.suptitle(title)
+    fig.savefig(path, dpi=150)
+
+
+def animate_rounds(history, layout, path, interval=600):
+    """Animate the lattice heatmap over the round pairs (saved as a GIF with Pillow)."""
+    import matplotlib.pyplot as plt
+    from matplotlib.animation import FuncAnimation, PillowWriter
+
+    grid = firing_grid(history, layout)
+    vmax = np.nanmax(grid) if np.isfinite(grid).any() else 1.0
+
+    fig, ax = plt.subplots(figsize=(max(3, 0.3 * layout['n_cols']) + 1.5, max(3, 0.3 * layout['n_rows'])))
+    image = ax.imshow(grid[0], cmap='inferno', vmin=0, vmax=vmax)
+    fig.colorbar(image, ax=ax, label='Detector firing rate')
+    ax.set_xticks([])
+    ax.set_yticks([])
+
+    def update(t):
+        image.set_data(grid[t])
+        ax.set_title(f"Rounds {t} → {t + 1}")
+        return [image]
+
+    animation = FuncAnimation(fig, update, frames=grid.shape[0], interval=interval, blit=False)
+    animation.save(path, writer=PillowWriter(fps=max(1, round(1000 / interval))))
+    plt.close(fig)
+
+
+def iter_recovered_results(path):
+    """Yield (distance, counts) for every entry of a recovered results pickle (3-column layout)."""
+    with open(path, 'rb') as f:
+        results = pickle.load(f)
+    while results:
+        result = results.pop()
+        yield int(result['distance']), result['counts']
+
+
+if __name__ == "__main__":
+    output_dir = "stats/syndrome_history"
+    os.makedirs(output_dir, exist_ok=True)
+    n_rounds = 4
+
+    for d, counts in iter_recovered_results("stats/optimized/recovered_results.pkl"):
+        layout = get_layout('strip', d)
+        history = accumulate_firing(iter_count_chunks(counts), layout, n_rounds)
+        plot_heatmaps(history, layout, f"{output_dir}/heatmap_d{d}.png", title=f"Distance {d}")
+        animate_rounds(history, layout, f"{output_dir}/rounds_d{d}.gif")
+        print(f"Distance {d}: mean firing rate {history['firing'].sum() / history['shots'] / history['firing'].size:.3f}")
@@ -0,0 +1,84 @@
+import numpy as np
+
+
+def parity_check_matrix(layout, stab_type):
+    """(n_stab, n_qubits) 0/1 matrix of the stabilizers of one type, rows in measurement order."""
+    n_qubits = layout['n_rows'] * layout['n_cols']
+    stabs = [s for s in layout['syndrome_qubits'] if layout['stabilizer_type'][s] == stab_type]
+    H = np.zeros((len(stabs), n_qubits), dtype=np.uint8)
+    for i, s in enumerate(stabs):
+        H[i, list(layout['stabilizer_map'][s])] = 1
+    return H
+
+
+def synthetic_rounds(layout, n_rounds, shots, p, p_meas=None, seed=None):
+    """
+    Sample stabilizer measurement rounds under phenomenological noise, without any simulator.
+
+    Before every round each data qubit independently suffers an X and a Z error with probability
+    `p`; every stabilizer outcome is then flipped with probability `p_meas` (defaults to `p`).
+
+    Returns:
+        np.ndarray: (shots, n_rounds, n_syndrome) uint8, columns in `layout['syndrome_qubits']` order.
+    """
+    return synthetic_memory(layout, n_rounds, shots, p, p_meas, seed, measure_data=False)[0]
+
+
+def synthetic_memory(layout, n_rounds, shots, p, p_meas=None, seed=None, measure_data=True):
+    """
+    `synthetic_rounds` of a memory experiment, with the final Z-basis readout of the data qubits.
+
+    After the last round the data qubits suffer one more layer of errors and are read out, each
+    outcome flipped with probability `p_meas`, as the circuits of `circuits` measure them.
+
+    Returns:
+        tuple: (rounds as `synthetic_rounds`, data (shots, n_qubits) uint8 readout indexed by
+            qubit, zero on syndrome qubits, or None without `measure_data`)
+    """
+    if p_meas is None:
+        p_meas = p
+    rng = np.random.default_rng(seed)
+    n_qubits = layout['n_rows'] * layout['n_cols']
+    data_mask = np.zeros(n_qubits, dtype=bool)
+    data_mask[layout['data_qubits']] = True
+    n_layers = n_rounds + 1 if measure_data else n_rounds
+
+    order = layout['syndrome_qubits']
+    rounds = np.zeros((shots, n_rounds, len(order)), dtype=np.uint8)
+    for stab_type, error_type in (('Z', 'X'), ('X', 'Z')):
+        H = parity_check_matrix(layout, stab_type)
+        columns = [k for k, s in enumerate(order) if layout['stabilizer_type'][s] == stab_type]
+        errors = (rng.random((shots, n_layers, n_qubits)) < p) & data_mask
+        accumulated = np.bitwise_xor.accumulate(errors.astype(np.uint8), axis=1)
+        rounds[:, :, columns] = (accumulated[:, :n_rounds].astype(np.int64) @ H.T.astype(np.int64)) % 2
+        if error_type == 'X':
+            # only X errors flip a Z-basis readout
+            final = accumulated[:, -1]
+
+    rounds ^= (rng.random(rounds.shape) < p_meas).astype(np.uint8)
+    if not measure_data:
+        return rounds, None
+    data = final ^ ((rng.random((shots, n_qubits)) < p_meas) & data_mask).astype(np.uint8)
+    return rounds, data
+
+
+def rounds_to_counts(rounds, data=None):
+    """
+    Turn sampled rounds into a Qiskit-style counts dict (classical bit 0 is the rightmost character).
+
+    With `data`, the (shots, n_qubits) readout follows the rounds as in `decoder.default_bit_map`.
+    """
+    bits = rounds.reshape(rounds.shape[0], -1)
+    if data is not None:
+        bits = np.concatenate([bits, data], axis=1)
+    shots = bits[:, ::-1] + ord('0')
+    counts = {}
+    for row in shots:
+        key = row.astype(np.uint8).tobytes().decode()
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def synthetic_counts(layout, n_rounds, shots, p, p_meas=None, seed=None, measure_data=False):
+    """Counts dict of `synthetic_memory` (no readout by default), in the format returned by `get_counts()`."""
+    return rounds_to_counts(*synthetic_memory(layout, n_rounds, shots, p, p_meas, seed, measure_data))
@@ -1,11 +1,8 @@
-from qiskit_ibm_runtime import QiskitRuntimeService, Session, Sampler
-from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
-from qiskit_aer import AerSimulator
-from qiskit import transpile
-from qiskit_aer.noise import NoiseModel, depolarizing_error
-import networkx as nx
+# Qiskit runtime/Aer, networkx and matplotlib are imported inside the functions that need them,
+# so that offline analysis only pays for what it uses.
 from random import random
-import matplotlib.pyplot as plt
+
+from profiling import profiled
 
 def logical_x(grid, qc):
     # the available qubits will be those in an even number between 0 and grid**2
@@ -67,7 +64,10 @@ def apply_stabilizers(qc, grid, classical_bits=0, stabilizer_map=None):
     return classical_bits, stabilizer_map
 
 # Instead of AerSimulator, use IBM Quantum Provider
-def run_on_ibm(qc):
+def run_on_ibm(qc, shots=1024):
+    from qiskit_ibm_runtime import QiskitRuntimeService, Session, Sampler
+    from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+
     service = QiskitRuntimeService()
 
     backend = service.least_busy(operational=True, simulator=False)
@@ -76,46 +76,69 @@ def run_on_ibm(qc):
 
     with Session(backend=backend) as session:
         sampler = Sampler(mode=session)
-        job = sampler.run([surface_code], shots=1024)
+        job = sampler.run([surface_code], shots=shots)
         pub_result = job.result()
         print(f"Sampler job ID: {job.job_id()}")
         print(f"Counts: {pub_result[0].data.c.get_counts()}")
 
     return pub_result[0].data.c.get_counts()
 
-def run_on_simulator(qc):
-    # Use AerSimulator for simulation
-    noiseModel = NoiseModel()
-    #noiseModel.add_all_qubit_quantum_error(depolarizing_error(0.05, 1), 'x')
-    #simulator = AerSimulator(noise_model=noiseModel)
-    simulator = AerSimulator()
+def run_on_simulator(qc, shots=1024, noise_model=None, archive=None, layout=None, n_rounds=None):
+    """
+    Run on Aer; `noise_model` comes from `noise_models.noise_model` (None = noiseless).
+
+    With `archive` (a path), the shots are appended to a `shot_archive` instead of returned as
+    counts, and the number of shots it holds is returned. `layout` and `n_rounds` default to
+    those the circuit builder stored in `qc.metadata`.
+    """
+    if archive is not None:
+        from layout import get_layout
+        from shot_archive import simulate_to_archive
+
+        layout = layout or get_layout(*qc.metadata['layout'])
+        n_rounds = n_rounds or qc.metadata['n_rounds']
+        return simulate_to_archive(qc, archive, layout, n_rounds, shots, backend='aer', noise_model=noise_model)
+
+    from qiskit import transpile
+    from qiskit_aer import AerSimulator
+
+    simulator = AerSimulator(noise_model=noise_model)
     compiled_circuit = transpile(qc, simulator)
-    result = simulator.run(compiled_circuit, shots=1024).result()
+    result = simulator.run(compiled_circuit, shots=shots).result()
     counts = result.get_counts()
     return counts
 
+def data_readout(counts, grid):
+    """Final readout of every qubit, (n_shots, grid**2) indexed by qubit: the last grid**2 classical bits."""
+    import numpy as np
+    from decoder import shots_to_bits
+
+    n_bits = len(next(iter(counts)).replace(' ', ''))
+    return shots_to_bits(list(counts), np.arange(n_bits - grid ** 2, n_bits))
+
+@profiled(counter=lambda events: {'events': len(events)})
 def process_detection_events(counts, grid, n_rounds):
-    stabilizer_qubits = [i for i in range(grid ** 2) if i % 2 == 1]
-    n_syndrome = len(stabilizer_qubits)
+    import numpy as np
+    from decoder import default_bit_map, shots_to_bits
+    from layout import get_layout
+
+    layout = get_layout('square', grid)
+    stabilizer_qubits = layout['syndrome_qubits']
+    rounds = shots_to_bits(list(counts), default_bit_map(layout, n_rounds)['syndrome'])
     detection_events = []
 
-    for shot in counts.keys():
-        syndrome_part = shot[-(n_syndrome * n_rounds):]
-        syndrome_rounds = [syndrome_part[i * n_syndrome:(i + 1) * n_syndrome] for i in range(n_rounds)]
-
-        for t in range(1, n_rounds):
-            current = syndrome_rounds[t]
-            previous = syndrome_rounds[t - 1]
-            for s in range(n_syndrome):
-                if current[s] != previous[s]:
-                    qubit = stabilizer_qubits[s]
-                    row = qubit // grid
-                    col = qubit % grid
-                    stab_type = 'Z' if (row % 2 == 0) else 'X'
-                    detection_events.append((row, col, stab_type, t))
+    for _, t, s in np.argwhere(rounds[:, 1:] != rounds[:, :-1]):
+        qubit = stabilizer_qubits[s]
+        row = qubit // grid
+        col = qubit % grid
+        stab_type = 'Z' if (row % 2 == 0) else 'X'
+        detection_events.append((row, col, stab_type, int(t) + 1))
     return detection_events
 
+@profiled(counter=lambda G: {'nodes': G.number_of_nodes(), 'edges': G.number_of_edges()})
 def build_mwpm_graph(detection_events, grid):
+    import networkx as nx
+
     G = nx.Graph()
     G.add_node('boundary')
 
@@ -144,7 +167,10 @@ def build_mwpm_graph(detection_events, grid):
 
     return G
 
+@profiled(counter=lambda result: {'matched_pairs': len(result[0])})
 def apply_mwpm(G):
+    import networkx as nx
+
     # Invert weights for max weight matching
     inverted_G = nx.Graph()
     for u, v, data in G.edges(data=True):
@@ -155,6 +181,7 @@ def apply_mwpm(G):
 
     return list(matching), total_weight
 
+@profiled('calculate_logical_error')
 def calculate_logical_error_subrutine(counts, grid, matching, stabilizer_map, detection_events, logical_z_chain):
     logical_errors = 0
     total_shots = sum(counts.values())
@@ -167,8 +194,8 @@ def calculate_logical_error_subrutine(counts, grid, matching, stabilizer_map, de
         event_id = f"{row},{col},{t}"
         event_to_stabilizer[event_id] = qubit_idx
 
-    for shot, freq in counts.items():
-        data_bits = list(shot[:(grid ** 2)])
+    for readout, freq in zip(data_readout(counts, grid), counts.values()):
+        data_bits = readout.copy()
 
         # Apply corrections from matching
         for pair in matching:
@@ -185,15 +212,15 @@ def calculate_logical_error_subrutine(counts, grid, matching, stabilizer_map, de
 
                 # Flip all data qubits connected to this stabilizer
                 for q in stabilizer_map.get(real_stab, []):
-                    data_bits[q] = '1' if data_bits[q] == '0' else '0'
+                    data_bits[q] ^= 1
             else:
                 # Find common data qubits between stabilizer pair
                 common = set(stabilizer_map[stab1]) & set(stabilizer_map[stab2])
                 for q in common:
-                    data_bits[q] = '1' if data_bits[q] == '0' else '0'
+                    data_bits[q] ^= 1
 
         # Check logical Z parity
-        parity = sum(int(data_bits[q]) for q in logical_z_chain) % 2
+        parity = sum(data_bits[q] for q in logical_z_chain) % 2
         if parity != 0:
             logical_errors += freq
 
@@ -216,10 +243,9 @@ def calculate_error_statistics(G, counts, grid, matching, stabilizer_map, detect
         event_id = f"{row},{col},{t}"
         event_to_stabilizer[event_id] = qubit_idx
 
-    for shot, freq in counts.items():
+    for data_bits, freq in zip(data_readout(counts, grid), counts.values()):
         # Count physical errors (assuming ideal simulation)
-        data_bits = list(shot[-(grid ** 2):])
-        stats['total_errors'] += sum(int(bit) for bit in data_bits) * freq
+        stats['total_errors'] += int(data_bits.sum()) * freq
 
         # Track matching weights
         for pair in matching:
@@ -235,6 +261,7 @@ def calculate_error_statistics(G, counts, grid, matching, stabilizer_map, detect
     return stats
 
 def plot_error_stats(stats_history):
+    import matplotlib.pyplot as plt
 
     # print the stats history
     for stats in stats_history:
@@ -0,0 +1,171 @@
+"""
+Parallel window decoding of long memory experiments.
+
+The detector layers of each sector (`decoder.sector_events`) are split into alternating commit
+regions and gaps:
+
+    | commit | gap | commit | gap | ... | commit |
+      buffer>     <buffer
+
+Every commit region is matched together with `buffer` layers on each side, all of them at the
+same time in a process pool; only matches inside the commit region are committed. A match that
+leaves the commit region is not committed: its inside endpoint is moved along time-like edges,
+which flip no data qubit, into the neighbouring gap. Once both neighbours of a gap are
+committed, the gaps (with the defects moved into them) are matched in a second parallel pass.
+Each window has a bounded size, so the decoding time grows linearly with the number of rounds
+and spreads over the workers. Window graphs have time boundaries only where the window reaches
+an open end of the experiment itself (`decoder.memory_layers`).
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from decoder import (decoded_result, logical_flip, match_detectors, matching_tables, memory_layers, observed_flips,
+                     sector_events, shots_readout)
+
+
+def split_commit(pairs, n_stab, boundary, lo, hi):
+    """
+    Committed pairs and moved defects of a window matching.
+
+    Args:
+        pairs (list): Matched (node, node) pairs; node t * n_stab + i is stabilizer i of layer t.
+        boundary (int): Boundary node.
+        lo, hi (int): The committed layers are lo ... hi - 1.
+
+    Returns:
+        tuple: (committed pairs, moved defects as (layer, stabilizer) just outside the region)
+    """
+    committed = []
+    moved = []
+    for u, v in pairs:
+        u_inside = lo <= u // n_stab < hi
+        if v == boundary:
+            if u_inside:
+                committed.append((u, v))
+            continue
+        v_inside = lo <= v // n_stab < hi
+        if u_inside and v_inside:
+            committed.append((u, v))
+        elif u_inside or v_inside:
+            inside, outside = (u, v) if u_inside else (v, u)
+            moved.append((lo - 1 if outside // n_stab < lo else hi, inside % n_stab))
+    return committed, moved
+
+
+def window_plan(n_layers, commit, buffer):
+    """
+    Commit regions and gaps covering layers 0 ... n_layers - 1.
+
+    Returns:
+        tuple: (windows, gaps); every window is (start, stop, lo, hi), the layers it matches and
+            the layers it commits, every gap is (lo, hi).
+    """
+    windows = []
+    gaps = []
+    lo = 0
+    while lo < n_layers:
+        hi = min(lo + commit, n_layers)
+        if hi + buffer >= n_layers:
+            hi = n_layers
+        windows.append((max(lo - buffer, 0), min(hi + buffer, n_layers), lo, hi))
+        if hi < n_layers:
+            gaps.append((hi, hi + buffer))
+        lo = hi + buffer
+    return windows, gaps
+
+
+def _commit_window(kind, size, stab_type, weights, events, lo, hi, time_boundaries=(False, False)):
+    """
+    Match the (n_shots, n_layers, n_stab) detection events of one window and commit layers lo ... hi - 1.
+
+    Args:
+        time_boundaries (tuple): The window starts / ends at an open end of the experiment.
+
+    Returns:
+        tuple: (logical flips (n_shots,), moved defects per shot in window layers)
+    """
+    n_layers, n_stab = events.shape[1:]
+    tables = matching_tables(kind, size, stab_type, n_layers + 1, *weights, time_boundaries=time_boundaries)
+    flips = np.zeros(len(events), dtype=np.uint8)
+    moved = []
+    for n, shot in enumerate(events):
+        pairs = match_detectors(np.flatnonzero(shot), tables)
+        committed, shot_moved = split_commit(pairs, n_stab, tables['boundary'], lo, hi)
+        flips[n] = logical_flip(committed, tables)
+        moved.append(shot_moved)
+    return flips, moved
+
+
+def _run(jobs, pool):
+    if pool is None:
+        return [_commit_window(*job) for job in jobs]
+    futures = [pool.submit(_commit_window, *job) for job in jobs]
+    return [future.result() for future in futures]
+
+
+def decode_windowed(counts, layout, n_rounds, commit=None, buffer=None, time_weight=1.0, space_weight=1.0,
+                    boundary_weight=None, workers=1, chunk_size=1024, bit_map=None, pool=None):
+    """
+    Decode both sectors of long memory experiments window by window.
+
+    Args:
+        commit (int): Layers committed per window, defaults to `buffer`.
+        buffer (int): Layers matched on each side of a commit region and gap length, defaults to
+            the code distance.
+        workers (int): Processes started for the windows of this call, 1 decodes in-process.
+            Starting them costs more than small batches take to decode: repeated calls should
+            share a `pool` instead.
+        chunk_size (int): Shots per job.
+        pool (Executor): Caller-owned process pool for the windows, kept alive across calls;
+            overrides `workers`.
+
+    Returns:
+        dict: As `decoder.decoded_result`: 'freqs', per-shot 'logical_z' and 'logical_x', their
+            frequency-weighted 'correction_flip_rate' and, when the shots carry the data
+            readout, the 'logical_error_rate'.
+    """
+    if buffer is None:
+        buffer = (layout['size'] + 1) // 2 if layout['kind'] == 'square' else layout['size']
+    commit = commit or buffer
+    weights = (time_weight, space_weight, boundary_weight)
+    shots = list(counts.keys())
+    freqs = np.array([counts[shot] for shot in shots])
+    rounds, data = shots_readout(shots, layout, n_rounds, bit_map)
+    events = sector_events(rounds, layout, data)
+    chunks = [(a, min(a + chunk_size, len(shots))) for a in range(0, len(shots), chunk_size)]
+
+    result = {}
+    owned = ProcessPoolExecutor(max_workers=workers) if pool is None and workers > 1 else None
+    executor = pool if pool is not None else owned
+    try:
+        for stab_type, name in (('Z', 'logical_z'), ('X', 'logical_x')):
+            sector = events[stab_type]
+            n_layers = sector.shape[1]
+            open_first, open_last = memory_layers(stab_type, data is not None)['time_boundaries']
+            windows, gaps = window_plan(n_layers, commit, buffer)
+            base = (layout['kind'], layout['size'], stab_type, weights)
+            flips = np.zeros(len(shots), dtype=np.uint8)
+
+            # commit regions, all windows and shot chunks at once
+            keys = [(start, a, b) for start, _, _, _ in windows for a, b in chunks]
+            jobs = [(*base, sector[a:b, start:stop], lo - start, hi - start,
+                     (open_first and start == 0, open_last and stop == n_layers))
+                    for start, stop, lo, hi in windows for a, b in chunks]
+            for (start, a, b), (window_flips, moved) in zip(keys, _run(jobs, executor)):
+                flips[a:b] ^= window_flips
+                for n, shot_moved in enumerate(moved, a):
+                    for t, i in shot_moved:
+                        sector[n, start + t, i] ^= 1
+
+            # gaps, with the defects moved into them
+            keys = [(a, b) for _ in gaps for a, b in chunks]
+            jobs = [(*base, sector[a:b, lo:hi], 0, hi - lo) for lo, hi in gaps for a, b in chunks]
+            for (a, b), (window_flips, _) in zip(keys, _run(jobs, executor)):
+                flips[a:b] ^= window_flips
+            result[name] = flips
+    finally:
+        if owned is not None:
+            owned.shutdown()
+
+    return decoded_result(freqs, result['logical_z'], result['logical_x'], observed_flips(data, layout))